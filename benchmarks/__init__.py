@@ -0,0 +1,6 @@
+"""Benchmarks for the mgr.py hot paths
+
+    python -m benchmarks.generate 10000 -o config.yaml
+    python -m benchmarks.run --sizes 1000 10000 100000 -o results.json
+    python -m benchmarks.run --compare baseline.json
+"""
@@ -0,0 +1,127 @@
+"""Synthetic config.yaml files shaped like the real one
+
+Titles are RQONE ticket numbers, bodies carry a '[BCC : ...]' tag, take-over
+references and free text, and requests are spread over the project filters
+and states with the skew seen in practice (most requests open or done).
+The output depends only on the arguments and the seed.
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+
+import yaml
+
+BCC_COMPONENTS = ['IoSrv', 'IoExtDev', 'BswLib', 'EbOs', 'ESM', 'Rte', 'ComM', 'NvM',
+                  'Dem', 'Dcm', 'CanIf', 'PduR', 'WdgM', 'Fee', 'MemIf', 'Xcp']
+ACTIONS = ['Config Removal', 'Config Change', 'BCC Analysis and Creation', 'Signal rename',
+           'Correction of ISR Call', 'Enable register access', 'Timeout adaptation',
+           'Take over new release', 'Memory layout update', 'Callout stub update']
+WORDS = ['DMA', 'load', 'calculation', 'shutdown', 'task', 'scheduling', 'feedback',
+         'signal', 'buffer', 'mapping', 'variant', 'timing', 'diagnostic', 'event',
+         'window', 'watchdog', 'partition', 'routing', 'gateway', 'startup']
+PROJECT_NAMES = ['mHEV', 'pHEV', 'MQB27', 'BEV', 'MEB', 'PPE', 'MLBevo', 'SSP', 'CMP']
+STATES = [('open', 30), ('in_progress', 20), ('integrated', 45), ('fulfilled_prio', 5)]
+FIRST_DAY = date(2024, 1, 1)
+
+def make_projects(rng, count):
+    """Projects with start/freeze/end windows over two years"""
+    projects = []
+    for i in range(count):
+        name = PROJECT_NAMES[i] if i < len(PROJECT_NAMES) else f"P{i:03d}"
+        start = FIRST_DAY + timedelta(days=rng.randrange(0, 600))
+        end = start + timedelta(weeks=rng.randrange(8, 40))
+        freeze = start + (end - start) * rng.randrange(50, 90) // 100
+        projects.append({
+            'name': name,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'freeze_date': freeze.isoformat(),
+            'commonconfig': 'false',
+        })
+    projects.append({
+        'name': 'CC2.4.0',
+        'start_date': '2025-05-21',
+        'end_date': '2025-07-16',
+        'freeze_date': '2025-07-11',
+        'commonconfig': 'true',
+    })
+    return projects
+
+def make_body(rng, ticket):
+    """Request body with a BCC tag, a take-over reference and some prose"""
+    bcc = rng.choice(BCC_COMPONENTS)
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(4, 16)))
+    body = f"[BCC : {bcc}]  - {rng.choice(ACTIONS)} - {words}"
+    if rng.random() < 0.5:
+        other = rng.choice(BCC_COMPONENTS)
+        body += f". Take Over BCC : {other} / {rng.randrange(1, 20)}.{rng.randrange(0, 20)}.0_CS311_COMMON; 0"
+    if rng.random() < 0.6:
+        body += f" - Test integrated in CC : CONFIG / {ticket}_{bcc.upper()}_{rng.choice(WORDS).upper()}; 0"
+    return body
+
+def make_requests(rng, count, filters):
+    """Change requests with unique RQONE titles"""
+    states = [s for s, _ in STATES]
+    weights = [w for _, w in STATES]
+    tickets = rng.sample(range(4_000_000, 9_999_999), count)
+    requests = []
+    for ticket in tickets:
+        title = f"RQONE{ticket:08d}"
+        created = FIRST_DAY + timedelta(days=rng.randrange(0, 700))
+        requests.append({
+            'title': title,
+            'body': make_body(rng, title),
+            'project': rng.choice(filters),
+            'state': rng.choices(states, weights)[0],
+            'created': created.isoformat(),
+        })
+    return requests
+
+def make_divergences(rng, count, projects):
+    return [{
+        'project': rng.choice(projects)['name'],
+        'reason': f"Implemented unreported change in {rng.choice(BCC_COMPONENTS)} "
+                  f"{' '.join(rng.choice(WORDS) for _ in range(3))} #{i}",
+        'date': (FIRST_DAY + timedelta(days=rng.randrange(0, 700))).isoformat(),
+    } for i in range(count)]
+
+def generate_config(requests, projects=8, divergences=None, seed=0):
+    """Return a configuration with the given number of records"""
+    rng = random.Random(seed)
+    project_list = make_projects(rng, projects)
+    # Like the real file, 'HEV' and 'internal-request' have no project entry
+    filters = [p['name'] for p in project_list if p['commonconfig'] == 'false']
+    filters += ['HEV', 'internal-request']
+    if divergences is None:
+        divergences = max(1, requests // 100)
+    return {
+        'common_config_version': '2.4.0',
+        'projects': project_list,
+        'change_requests': make_requests(rng, requests, filters),
+        'project_filters': filters,
+        'background_text': 'Synthetic configuration for benchmarks.',
+        'divergences': make_divergences(rng, divergences, project_list),
+    }
+
+def write_config(path, requests, projects=8, divergences=None, seed=0):
+    """Write a generated configuration the way mgr.py dumps it"""
+    config = generate_config(requests, projects, divergences, seed)
+    dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+    with open(path, 'w', encoding='utf-8') as file:
+        yaml.dump(config, file, Dumper=dumper, sort_keys=False, allow_unicode=True)
+    return config
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic config.yaml")
+    parser.add_argument('requests', type=int, help="number of change requests")
+    parser.add_argument('--projects', type=int, default=8, help="number of projects (default: 8)")
+    parser.add_argument('--divergences', type=int, help="number of divergences (default: 1%% of requests)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='config.yaml')
+    args = parser.parse_args(argv)
+    write_config(args.output, args.requests, args.projects, args.divergences, args.seed)
+    print(f"Wrote {args.output} with {args.requests} change requests", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
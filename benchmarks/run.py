@@ -0,0 +1,291 @@
+"""Timing and peak-memory benchmarks for the mgr.py hot paths
+
+Every size gets a generated configuration in a scratch directory, since
+mgr.py reads and writes its files relative to the working directory. Each
+benchmark is a setup step, which is not measured, and the operation itself.
+Timings are the best, median and mean of --repeat runs. The peak memory
+allocated by the operation is measured in one extra run under tracemalloc,
+so tracing does not distort the timings.
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import yaml
+
+import mgr
+from benchmarks.generate import write_config
+from ccdb.changes import op_remove_requests
+from ccdb.dashboard import dashboard_json
+from ccdb.reports import export_report
+from ccdb.search import PICKER_TOP_K
+from ccdb.store import CONFIG_FILE, ConfigStore, SNAPSHOT_SUFFIX, YAML_LOADER
+from ccdb.timeline import load_numpy
+from ccdb.validation import ConfigValidator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [1000, 10000, 100000]
+REGRESSION_RATIO = 1.25
+MIN_TIMING_SECONDS = 0.02
+
+BENCHMARKS = {}
+# Operations without side effects are looped until a timing is long enough
+# to rise above timer noise
+REPEATABLE = set()
+
+def benchmark(name, repeatable=False):
+    """Register a benchmark; the function does the setup and returns the operation"""
+    def register(func):
+        BENCHMARKS[name] = func
+        if repeatable:
+            REPEATABLE.add(name)
+        return func
+    return register
+
+class Skip(Exception):
+    """A benchmark that cannot run here, e.g. without rich"""
+
+def fresh_store(loaded=True):
+    """New store over config.yaml, as a new mgr.py process would have"""
+    mgr.store = ConfigStore(CONFIG_FILE)
+    if loaded:
+        mgr.store.get()
+    return mgr.store
+
+@benchmark('load_yaml')
+def bench_load_yaml(config):
+    # Cold start: no parse snapshot, the YAML file is parsed
+    snapshot = CONFIG_FILE + SNAPSHOT_SUFFIX
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    store = fresh_store(loaded=False)
+    return store.get
+
+@benchmark('load_snapshot')
+def bench_load_snapshot(config):
+    fresh_store()
+    return fresh_store(loaded=False).get
+
+@benchmark('load_cached', repeatable=True)
+def bench_load_cached(config):
+    return fresh_store().get
+
+@benchmark('save')
+def bench_save(config):
+    store = fresh_store()
+    data = store.get()
+    return lambda: store.save(data)
+
+@benchmark('apply_journal')
+def bench_apply_journal(config):
+    store = fresh_store()
+    store.compact()
+    index = store.index
+    key = next(iter(index.requests))
+    state = 'open' if str(index.request(key).state) != 'open' else 'in_progress'
+    return lambda: store.apply('change_request_state', key=key, state=state)
+
+@benchmark('filter', repeatable=True)
+def bench_filter(config):
+    store = fresh_store()
+    project = config['project_filters'][0]
+    return lambda: store.query_requests(project=project, state='open')
+
+@benchmark('search', repeatable=True)
+def bench_search(config):
+    index = fresh_store().index
+    index.search_requests('bcc:EbOs')
+    return lambda: index.search_requests('bcc:EbOs dma')
+
+@benchmark('picker_build')
+def bench_picker_build(config):
+    index = fresh_store().index
+    return lambda: index.picker
+
+@benchmark('picker_query', repeatable=True)
+def bench_picker_query(config):
+    picker = fresh_store().index.picker
+    # One keystroke at a time, as typed into the picker
+    query = 'bcc:EbOs dma'
+    prefixes = [query[:end] for end in range(1, len(query) + 1)]
+    return lambda: [picker.search(prefix, PICKER_TOP_K) for prefix in prefixes]
+
+@benchmark('validate')
+def bench_validate(config):
+    # Cold: every record is checked
+    index = fresh_store().index
+    return lambda: ConfigValidator().validate(index)
+
+@benchmark('validate_cached', repeatable=True)
+def bench_validate_cached(config):
+    # Full pass with a warm cache: every record is fingerprinted, only
+    # records whose fingerprint changed would be checked again
+    index = fresh_store().index
+    validator = ConfigValidator()
+    validator.validate(index)
+    return lambda: validator.validate(index, errors_only=True)
+
+@benchmark('export_csv')
+def bench_export_csv(config):
+    store = fresh_store()
+    return lambda: export_report(store, 'requests', 'requests.csv', 'csv')
+
+@benchmark('list_page', repeatable=True)
+def bench_list_page(config):
+    try:
+        console_type = importlib.import_module('rich.console').Console
+    except ImportError:
+        raise Skip("rich is not installed")
+    mgr.console = console_type(file=io.StringIO(), width=160)
+    page = fresh_store().query_requests()[:mgr.PAGE_SIZE]
+    return lambda: mgr.list_requests(page)
+
+@benchmark('remove')
+def bench_remove(config):
+    # One percent of the requests, spread over the file
+    index = fresh_store().index
+    keys = [list(key) for key in list(index.requests)[::100]]
+    return lambda: op_remove_requests(index, keys)
+
+@benchmark('dashboard', repeatable=True)
+def bench_dashboard(config):
+    data = fresh_store().get()
+    return lambda: dashboard_json(data)
+
+def loops_needed(operation):
+    """Calls of a fast operation that take at least MIN_TIMING_SECONDS"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        if time.perf_counter() - started >= MIN_TIMING_SECONDS:
+            return loops
+        loops *= 10
+
+def measure(func, config, repeat, repeatable=False):
+    """Best/median/mean milliseconds and peak KiB of one benchmark"""
+    times = []
+    for _ in range(repeat):
+        operation = func(config)
+        loops = loops_needed(operation) if repeatable else 1
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        times.append((time.perf_counter() - started) * 1000 / loops)
+
+    operation = func(config)
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'best_ms': round(min(times), 4),
+        'median_ms': round(statistics.median(times), 4),
+        'mean_ms': round(statistics.fmean(times), 4),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+def run_size(size, names, repeat):
+    """Run the benchmarks against a generated configuration of the given size"""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='mgr-bench-') as scratch:
+        os.chdir(scratch)
+        try:
+            config = write_config(CONFIG_FILE, size)
+            for name in names:
+                try:
+                    result = measure(BENCHMARKS[name], config, repeat, name in REPEATABLE)
+                except Skip as reason:
+                    print(f"  {name:<14} skipped: {reason}", file=sys.stderr)
+                    continue
+                result = {'name': name, 'requests': size, 'repeat': repeat, **result}
+                print(f"  {name:<14} {result['best_ms']:>10.3f} {result['median_ms']:>10.3f} "
+                      f"{result['peak_kib']:>12.1f}", file=sys.stderr)
+                results.append(result)
+        finally:
+            os.chdir(cwd)
+    return results
+
+def environment():
+    """Where the results come from"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'libyaml': YAML_LOADER is not yaml.SafeLoader,
+        'numpy': load_numpy() is not None,
+    }
+
+def compare(baseline, results, threshold):
+    """Print best-time ratios against a baseline, returning the regressions"""
+    base = {(r['name'], r['requests']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'} "
+          f"(regression above {threshold:g}x):", file=sys.stderr)
+    for result in results:
+        old = base.get((result['name'], result['requests']))
+        if old is None or not old['best_ms']:
+            continue
+        ratio = result['best_ms'] / old['best_ms']
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"  {result['name']:<14} {result['requests']:>7} {old['best_ms']:>10.3f} -> "
+              f"{result['best_ms']:>10.3f} ms  {ratio:5.2f}x{flag}", file=sys.stderr)
+        if flag:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark mgr.py on generated configurations")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of change requests (default: 1000 10000 100000)")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark (default: 3)")
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="JSON results of an earlier run, exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_RATIO,
+                        help=f"best-time ratio counted as a regression (default: {REGRESSION_RATIO})")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        print(f"\n{size} requests{'':<4} {'best ms':>10} {'median ms':>10} {'peak KiB':>12}",
+              file=sys.stderr)
+        results += run_size(size, args.only, args.repeat)
+
+    report = {'meta': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+        print(f"\nWrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
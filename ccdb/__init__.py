@@ -0,0 +1 @@
+"""Library behind mgr.py: configuration stores, indexes, validation and servers"""
@@ -0,0 +1,399 @@
+"""Hash indexes over a configuration and the change operations that keep them current"""
+import bisect
+
+from .records import (
+    as_record, ChangeRequest, Divergence, divergence_key, Project, RECORD_TYPES, request_key,
+    State
+)
+from .search import PickerIndex, SEARCH_FIELDS, SearchIndex
+from .timeline import ProjectTimeline
+
+# ------------------ CHANGE OPERATIONS ------------------
+# Every modification goes through one of these functions so it can be
+# journaled and replayed. Arguments must stay JSON serialisable.
+
+class ConflictError(Exception):
+    """Changes that could not be merged with edits made by someone else"""
+
+    def __init__(self, conflicts):
+        super().__init__('\n'.join(conflicts))
+        self.conflicts = conflicts
+
+class ConfigIndex:
+    """Hash indexes over a loaded configuration
+
+    Maps request keys, project names and divergence keys to their records so
+    changes find their target in constant time. Keys map to lists in file
+    order: a duplicate key is reported by validation but its records stay
+    listed, and edits go to the first of them as they always did. Requests
+    are numbered by file position and bucketed by (project, state), giving
+    constant-time counts and filtered listings that cost only the size of
+    the result. The full-text search and the type-ahead pickers of requests,
+    projects and divergences are built on first use. The change operations
+    keep the indexes in sync with the underlying lists.
+    """
+    # Keyed sections besides the requests: key of a record and picker fields
+    KEYED = {
+        'projects': (lambda project: project['name'], ('name', 'start_date', 'end_date')),
+        'divergences': (divergence_key, ('project', 'reason', 'date')),
+    }
+
+    def __init__(self, config):
+        self.config = config
+        # request key -> requests with that key, and their positions, in file order
+        self.requests = {}
+        self._positions = {}
+        # position -> request, positions follow file order
+        self.records = {}
+        # (project, state) -> positions of its requests
+        self.buckets = {}
+        self._next_position = 0
+        self._search = None
+        self._picker = None
+        self._timeline = None
+        # section -> {key: picker ids of its records}, parallel to the key lists
+        self._ids = {section: {} for section in self.KEYED}
+        self._pickers = dict.fromkeys(self.KEYED)
+        self._next_id = 0
+        for section, record_type in RECORD_TYPES.items():
+            records = config.get(section)
+            if records:
+                records[:] = [as_record(record_type, r) for r in records]
+        for req in config.get('change_requests') or []:
+            self.index_request(req)
+        self.projects = {}
+        self.divergences = {}
+        for section in self.KEYED:
+            for record in config.get(section) or []:
+                self.index_record(section, record)
+
+    def bucket_key(self, req):
+        """(project, State) bucket of a request"""
+        return (getattr(req, 'project', None), getattr(req, 'state', None))
+
+    def index_request(self, req, position=None, text=True):
+        """Add a request to the key index and its (project, state) bucket"""
+        key = request_key(req)
+        if position is None:
+            position = self._next_position
+            self._next_position += 1
+        positions = self._positions.setdefault(key, [])
+        at = bisect.bisect(positions, position)
+        positions.insert(at, position)
+        self.requests.setdefault(key, []).insert(at, req)
+        self.records[position] = req
+        self.buckets.setdefault(self.bucket_key(req), set()).add(position)
+        if text and self._search is not None:
+            self._search.add(position, req)
+        if text and self._picker is not None:
+            self._picker.add(position, req, position)
+
+    def unindex_request(self, key, text=True):
+        """Drop the first request with a key from the indexes, returning it and its position"""
+        requests, positions = self.requests[key], self._positions[key]
+        req, position = requests.pop(0), positions.pop(0)
+        if not requests:
+            del self.requests[key], self._positions[key]
+        del self.records[position]
+        bucket_key = self.bucket_key(req)
+        bucket = self.buckets[bucket_key]
+        bucket.discard(position)
+        if not bucket:
+            del self.buckets[bucket_key]
+        if text and self._search is not None:
+            self._search.remove(position)
+        if text and self._picker is not None:
+            self._picker.remove(position)
+        return req, position
+
+    def index_record(self, section, record, item_id=None):
+        """Add a project or divergence to its key index and picker"""
+        key_of, _ = self.KEYED[section]
+        if item_id is None:
+            item_id = self._next_id
+            self._next_id += 1
+        key = key_of(record)
+        getattr(self, section).setdefault(key, []).append(record)
+        self._ids[section].setdefault(key, []).append(item_id)
+        if self._pickers[section] is not None:
+            self._pickers[section].add(item_id, record, item_id)
+
+    def unindex_record(self, section, key):
+        """Drop the first project or divergence with a key, returning it and its picker id"""
+        mapping, ids = getattr(self, section), self._ids[section]
+        record, item_id = mapping[key].pop(0), ids[key].pop(0)
+        if not mapping[key]:
+            del mapping[key], ids[key]
+        if self._pickers[section] is not None:
+            self._pickers[section].remove(item_id)
+        return record, item_id
+
+    def record_picker(self, section):
+        """Type-ahead index over the projects or divergences, in file order"""
+        if self._pickers[section] is None:
+            picker = self._pickers[section] = PickerIndex(self.KEYED[section][1])
+            for key, records in getattr(self, section).items():
+                for record, item_id in zip(records, self._ids[section][key]):
+                    picker.add(item_id, record, item_id)
+        return self._pickers[section]
+
+    def request(self, key):
+        """First request with a key, the one edits apply to, or None"""
+        requests = self.requests.get(tuple(key))
+        return requests[0] if requests else None
+
+    @property
+    def search(self):
+        """Inverted index over request titles and bodies"""
+        if self._search is None:
+            self._search = SearchIndex()
+            for position, req in self.records.items():
+                self._search.add(position, req)
+        return self._search
+
+    @property
+    def picker(self):
+        """Type-ahead index over request titles, projects and bodies"""
+        if self._picker is None:
+            self._picker = PickerIndex(('title', 'project', 'body'))
+            for position, req in self.records.items():
+                self._picker.add(position, req, position)
+        return self._picker
+
+    @property
+    def timeline(self):
+        """Date-interval index over the projects, rebuilt after project changes"""
+        if self._timeline is None:
+            self._timeline = ProjectTimeline(self.config.get('projects') or [])
+        return self._timeline
+
+    def search_requests(self, query):
+        """Requests matching every term of a search query, in file order"""
+        return [self.records[position] for position in sorted(self.search.lookup(query))]
+
+    def _matching_buckets(self, project, state):
+        state = State.parse(state)
+        if project is not None and state is not None:
+            bucket = self.buckets.get((project, state))
+            return [bucket] if bucket else []
+        return [
+            bucket for (p, s), bucket in self.buckets.items()
+            if (project is None or p == project) and (state is None or s == state)
+        ]
+
+    def count(self, project=None, state=None):
+        """Number of requests for a project and/or state"""
+        if project is None and state is None:
+            return len(self.records)
+        return sum(len(bucket) for bucket in self._matching_buckets(project, state))
+
+    def select(self, project=None, state=None):
+        """Requests for a project and/or state in file order"""
+        if project is None and state is None:
+            return list(self.config.get('change_requests') or [])
+        positions = [p for bucket in self._matching_buckets(project, state) for p in bucket]
+        return [self.records[position] for position in sorted(positions)]
+
+def op_add_project(index, project):
+    project = as_record(Project, project)
+    index.config.setdefault('projects', []).append(project)
+    index.index_record('projects', project)
+    index._timeline = None
+
+def op_edit_project(index, name, changes):
+    if name in index.projects:
+        project, item_id = index.unindex_record('projects', name)
+        project.update(changes)
+        index.index_record('projects', project, item_id)
+        index._timeline = None
+
+def op_remove_projects(index, names):
+    index._timeline = None
+    names = set(names)
+    for name in names:
+        while name in index.projects:
+            index.unindex_record('projects', name)
+    index.config['projects'] = [p for p in index.config['projects'] if p['name'] not in names]
+
+def op_add_request(index, request):
+    request = as_record(ChangeRequest, request)
+    index.config.setdefault('change_requests', []).append(request)
+    index.index_request(request)
+
+def op_edit_request(index, key, changes):
+    key = tuple(key)
+    if key in index.requests:
+        # State-only changes leave the search index untouched
+        text = not SEARCH_FIELDS.isdisjoint(changes)
+        req, position = index.unindex_request(key, text)
+        req.update(changes)
+        index.index_request(req, position, text)
+
+def op_change_request_state(index, key, state):
+    op_edit_request(index, key, {'state': state})
+
+def op_set_integration(index, key, target, status, pver=None):
+    req = index.request(key)
+    if req is not None:
+        entry = {'status': status}
+        if pver:
+            entry['pver'] = pver
+        integration = req.setdefault('integration', {})
+        integration.setdefault('targets', {})[target] = entry
+
+def op_remove_requests(index, keys):
+    keys = {tuple(k) for k in keys}
+    for key in keys:
+        while key in index.requests:
+            index.unindex_request(key)
+    index.config['change_requests'] = [
+        r for r in index.config['change_requests']
+        if request_key(r) not in keys
+    ]
+
+def op_add_divergence(index, divergence):
+    divergence = as_record(Divergence, divergence)
+    index.config.setdefault('divergences', []).append(divergence)
+    index.index_record('divergences', divergence)
+
+def op_edit_divergence(index, key, changes):
+    key = tuple(key)
+    if key in index.divergences:
+        div, item_id = index.unindex_record('divergences', key)
+        div.update(changes)
+        index.index_record('divergences', div, item_id)
+
+def op_remove_divergences(index, keys):
+    keys = {tuple(k) for k in keys}
+    for key in keys:
+        while key in index.divergences:
+            index.unindex_record('divergences', key)
+    index.config['divergences'] = [
+        d for d in index.config['divergences']
+        if divergence_key(d) not in keys
+    ]
+
+def match_requests(index, selectors):
+    """Yield the keys of requests matching (title, project) selectors"""
+    by_title = None
+    for title, project in selectors:
+        if project is not None:
+            if (title, project) in index.requests:
+                yield (title, project)
+            continue
+        # Title-only selectors need a title index, built on first use
+        if by_title is None:
+            by_title = {}
+            for key in index.requests:
+                by_title.setdefault(key[0], []).append(key)
+        yield from by_title.get(title, [])
+
+CHANGE_OPS = {
+    'add_project': op_add_project,
+    'edit_project': op_edit_project,
+    'remove_projects': op_remove_projects,
+    'add_request': op_add_request,
+    'edit_request': op_edit_request,
+    'change_request_state': op_change_request_state,
+    'set_integration': op_set_integration,
+    'remove_requests': op_remove_requests,
+    'add_divergence': op_add_divergence,
+    'edit_divergence': op_edit_divergence,
+    'remove_divergences': op_remove_divergences,
+}
+
+# Record each operation depends on: (index mapping, key, fields it changes).
+# None as fields means the record must not exist yet. Removals and new
+# divergences merge with anything and have no entry.
+CHANGE_TARGETS = {
+    'add_project': lambda a: ('projects', a['project']['name'], None),
+    'edit_project': lambda a: ('projects', a['name'], set(a['changes'])),
+    'add_request': lambda a: ('requests', request_key(a['request']), None),
+    'edit_request': lambda a: ('requests', tuple(a['key']), set(a['changes'])),
+    'change_request_state': lambda a: ('requests', tuple(a['key']), {'state'}),
+    'set_integration': lambda a: ('requests', tuple(a['key']), {'integration'}),
+    'edit_divergence': lambda a: ('divergences', tuple(a['key']), set(a['changes'])),
+}
+
+# Operations that can move their record to another key: (index mapping, old key, new key)
+CHANGE_RENAMES = {
+    'edit_project': lambda a: ('projects', a['name'], a['changes'].get('name', a['name'])),
+    'edit_request': lambda a: ('requests', tuple(a['key']),
+                               (a['changes'].get('title', a['key'][0]),
+                                a['changes'].get('project', a['key'][1]))),
+}
+
+def rename_conflict(index, op, args):
+    """Why a change would move its record onto a key another record holds, or None"""
+    rename = CHANGE_RENAMES.get(op)
+    if rename is None:
+        return None
+    mapping, old_key, new_key = rename(args)
+    if new_key != old_key and new_key in getattr(index, mapping):
+        return f"{describe_target((mapping, new_key, None))} already exists"
+    return None
+
+def lookup_target(index, target):
+    """Plain copy of the record a target points at, or None"""
+    mapping, key, _ = target
+    record = getattr(index, mapping).get(key)
+    if isinstance(record, list):
+        record = record[0] if record else None
+    return dict(record) if record is not None else None
+
+def describe_target(target):
+    mapping, key, _ = target
+    if mapping == 'projects':
+        return f"Project '{key}'"
+    if mapping == 'requests':
+        return f"Request '{key[0]}' ({key[1]})"
+    return f"Divergence of {key[0]} ({key[1].strip()})"
+
+def snapshot_target(index, op, args):
+    """The target of a change with its record as the user saw it, or None"""
+    target = CHANGE_TARGETS.get(op)
+    if target is None:
+        return None
+    target = target(args)
+    before = lookup_target(index, target)
+    if before is not None and 'changes' in args:
+        # Forms resubmit every field, only the edited ones can conflict
+        mapping, key, fields = target
+        target = (mapping, key, {f for f in fields if before.get(f) != args['changes'][f]})
+    return target, before
+
+def find_conflict(base, current):
+    """Why a change no longer applies to the current record, or None if it merges"""
+    target, before = base
+    fields = target[2]
+    if fields is None:
+        if current is not None and before is None:
+            return f"{describe_target(target)} was added by someone else"
+        return None
+    if current is None:
+        if before is not None:
+            return f"{describe_target(target)} was removed by someone else"
+        return None
+    changed = {f for f in before.keys() | current.keys() if before.get(f) != current.get(f)}
+    clash = changed & fields
+    if clash:
+        return f"{describe_target(target)}: {', '.join(sorted(clash))} changed by someone else"
+    return None
+
+def merge_changes(index, changes):
+    """Replay changes on a newer version of the configuration
+
+    A change merges unless someone else changed the same fields of its
+    record since it was made. Returns the applied changes and the conflicts.
+    """
+    applied, conflicts = [], []
+    for change in changes:
+        op, args, _, base = change
+        conflict = find_conflict(base, lookup_target(index, base[0])) if base else None
+        conflict = conflict or rename_conflict(index, op, args)
+        if conflict:
+            conflicts.append(conflict)
+            continue
+        CHANGE_OPS[op](index, **args)
+        applied.append(change)
+    return applied, conflicts
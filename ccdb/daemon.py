@@ -0,0 +1,305 @@
+"""Unix socket daemon answering requests from the in-memory configuration"""
+import os
+import contextlib
+import json
+import struct
+import sys
+from datetime import datetime
+
+from .changes import ConflictError, match_requests
+from .records import record_json, REQUEST_STATES, State
+from .sqlite_store import DB_FILE
+from .store import CONFIG_FILE, JOURNAL_SUFFIX, query_config
+from .validation import ValidationError, VALIDATOR
+
+# Unix socket of 'mgr.py serve', override with CCDB_SOCKET. The socket,
+# selectors, signal and traceback modules are imported where they are used,
+# so the argument parser of mgr.py can read the command table for free.
+DAEMON_SOCKET = os.environ.get('CCDB_SOCKET', 'mgr.sock')
+
+# ------------------ DAEMON ------------------
+# 'mgr.py serve' keeps the configuration in memory and answers newline-
+# delimited JSON requests on a Unix socket: {"cmd": "list", "state": "open"}
+# is answered with {"ok": true, "result": [...]} or {"ok": false, "error": ...}.
+# File changes are picked up through inotify, or by polling where it is missing.
+
+class DaemonError(Exception):
+    """Error reported by the daemon for a request"""
+
+def daemon_list(store, project=None, state=None):
+    if state is not None and state not in REQUEST_STATES:
+        raise ValueError(f"Unknown state '{state}'")
+    return store.query_requests(project=project, state=state)
+
+def daemon_search(store, query):
+    return store.index.search_requests(query)
+
+def daemon_get(store, path=''):
+    return query_config(store.get(), path)
+
+def daemon_set_state(store, state, titles, project=None):
+    if state not in REQUEST_STATES:
+        raise ValueError(f"Unknown state '{state}'")
+    if isinstance(titles, str):
+        titles = [titles]
+    index = store.index
+    keys = [key for key in match_requests(index, [(title, project) for title in titles])
+            if index.request(key).state != State.parse(state)]
+    with store.transaction():
+        for key in keys:
+            store.apply('change_request_state', key=key, state=state)
+    return {'changed': len(keys)}
+
+def daemon_add_divergence(store, project, reason, date=None):
+    if project not in store.index.projects:
+        raise ValueError(f"Unknown project '{project}'")
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    datetime.strptime(date, '%Y-%m-%d')
+    store.apply('add_divergence', divergence={'project': project, 'reason': reason, 'date': date})
+    return {'added': 1}
+
+DAEMON_COMMANDS = {
+    'ping': lambda store: 'pong',
+    'get': daemon_get,
+    'list': daemon_list,
+    'search': daemon_search,
+    'set_state': daemon_set_state,
+    'add_divergence': daemon_add_divergence,
+    'validate': lambda store: VALIDATOR.validate(store.index),
+}
+
+def handle_daemon_request(store, line):
+    """Answer one JSON request line from the configuration of store"""
+    try:
+        request = json.loads(line)
+        handler = DAEMON_COMMANDS[request.pop('cmd')]
+        result = handler(store, **request)
+    except ValidationError as error:
+        return {'ok': False, 'error': f"invalid: {error}"}
+    except ConflictError as error:
+        return {'ok': False, 'error': f"conflict: {error}"}
+    except KeyError as error:
+        return {'ok': False, 'error': f"unknown command or key {error}"}
+    except (ValueError, TypeError, AttributeError, IndexError) as error:
+        return {'ok': False, 'error': str(error)}
+    except (Exception, SystemExit) as error:
+        # Unreadable files or a store that gives up (SystemExit) fail only this request
+        import traceback
+        print(f"Error: request {line[:200]!r} failed", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return {'ok': False, 'error': f"{type(error).__name__}: {error}"}
+    return {'ok': True, 'result': result}
+
+class InotifyWatcher:
+    """Change notifications for files of one directory through Linux inotify"""
+    EVENTS = 0x2 | 0x8 | 0x80 | 0x100 | 0x200  # MODIFY, CLOSE_WRITE, MOVED_TO, CREATE, DELETE
+    HEADER = struct.Struct('iIII')
+
+    def __init__(self, paths):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.names = {os.path.basename(p).encode() for p in paths}
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(paths[0])).encode()
+        if libc.inotify_add_watch(self.fd, directory, self.EVENTS) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def fileno(self):
+        return self.fd
+
+    def changed(self):
+        """Drain pending events, True if one concerned a watched file"""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = self.HEADER.unpack_from(data, offset)
+                offset += self.HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                changed = changed or name in self.names
+
+def watch_files(paths):
+    """inotify watcher for the paths, or None where it is not available"""
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError):
+        return None
+
+class ConfigDaemon:
+    """Unix socket server answering requests from the in-memory configuration
+
+    Sockets never block: answers wait in a per-connection outbox until the
+    client reads them, and a client with a full outbox is not read from.
+    """
+    POLL_SECONDS = 1.0
+    FLUSH_SECONDS = 0.5   # idle time before journaled writes reach dashboard.json
+    OUTBOX_LIMIT = 1 << 20
+
+    def __init__(self, store, path, watched):
+        self.store = store
+        self.path = path
+        self.watcher = watch_files(watched)
+        self.buffers = {}
+        self.outboxes = {}
+
+    def listen(self):
+        if os.path.exists(self.path):
+            # Refuse to steal the socket of a daemon that is still running
+            try:
+                call_daemon({'cmd': 'ping'}, self.path)
+            except OSError:
+                os.remove(self.path)
+            else:
+                raise OSError(f"a daemon is already listening on {self.path}")
+        import socket
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.server.listen()
+        self.server.setblocking(False)
+
+    def serve_forever(self):
+        """Answer requests until interrupted"""
+        import selectors
+        selector = selectors.DefaultSelector()
+        selector.register(self.server, selectors.EVENT_READ, 'accept')
+        if self.watcher is not None:
+            selector.register(self.watcher, selectors.EVENT_READ, 'watch')
+        timeout = None if self.watcher is not None else self.POLL_SECONDS
+
+        store = self.store
+        store.get()
+        try:
+            while True:
+                events = selector.select(self.FLUSH_SECONDS if store.dashboard_stale else timeout)
+                if not events:
+                    # Polling fallback: get() re-reads only when the files changed
+                    self.refresh(store.flush_dashboard)
+                for key, mask in events:
+                    if key.data == 'accept':
+                        conn, _ = self.server.accept()
+                        conn.setblocking(False)
+                        self.buffers[conn] = b''
+                        self.outboxes[conn] = bytearray()
+                        selector.register(conn, selectors.EVENT_READ, 'client')
+                    elif key.data == 'watch':
+                        if self.watcher.changed() and store.pending is None:
+                            self.refresh()
+                    elif mask & selectors.EVENT_WRITE:
+                        self.flush(selector, key.fileobj)
+                    else:
+                        self.receive(selector, key.fileobj)
+        finally:
+            selector.close()
+            self.server.close()
+            with contextlib.suppress(OSError):
+                os.remove(self.path)
+
+    def refresh(self, then=None):
+        """Re-read changed files between requests, logging instead of stopping on errors"""
+        try:
+            self.store.get()
+            if then is not None:
+                then()
+        except (Exception, SystemExit):
+            import traceback
+            print("Error: reloading the configuration failed", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+
+    def receive(self, selector, conn):
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.close(selector, conn)
+            return
+        self.buffers[conn] += data
+        self.answer(conn)
+        self.flush(selector, conn)
+
+    def answer(self, conn):
+        """Answer complete request lines into the outbox until it is full"""
+        buffer, outbox = self.buffers[conn], self.outboxes[conn]
+        while b'\n' in buffer and len(outbox) < self.OUTBOX_LIMIT:
+            line, buffer = buffer.split(b'\n', 1)
+            if line.strip():
+                response = handle_daemon_request(self.store, line)
+                try:
+                    raw = json.dumps(response, ensure_ascii=False, default=record_json)
+                except (TypeError, ValueError) as error:
+                    raw = json.dumps({'ok': False, 'error': f"result not serialisable: {error}"})
+                outbox += raw.encode('utf-8') + b'\n'
+        self.buffers[conn] = buffer
+
+    def flush(self, selector, conn):
+        """Send what the socket takes now, then wait for it to drain or for more requests"""
+        outbox = self.outboxes[conn]
+        while True:
+            try:
+                while outbox:
+                    del outbox[:conn.send(outbox)]
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self.close(selector, conn)
+                return
+            if b'\n' not in self.buffers[conn]:
+                break
+            # Requests held back while the outbox was full
+            self.answer(conn)
+        # A client that does not read its answers is not read from either
+        import selectors
+        selector.modify(conn, selectors.EVENT_WRITE if outbox else selectors.EVENT_READ, 'client')
+
+    def close(self, selector, conn):
+        selector.unregister(conn)
+        del self.buffers[conn], self.outboxes[conn]
+        conn.close()
+
+def serve(store, backend):
+    """Run the daemon for store in the foreground"""
+    watched = [DB_FILE] if backend == 'sqlite' else [CONFIG_FILE, CONFIG_FILE + JOURNAL_SUFFIX]
+    daemon = ConfigDaemon(store, DAEMON_SOCKET, watched)
+    try:
+        daemon.listen()
+    except OSError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+    mode = "inotify" if daemon.watcher is not None else f"polling every {daemon.POLL_SECONDS:g}s"
+    print(f"Serving {CONFIG_FILE} on {DAEMON_SOCKET} ({mode}), Ctrl-C to stop", file=sys.stderr)
+    # SIGTERM stops like Ctrl-C; SystemExit is what a failing request raises
+    import signal
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.compact()
+
+def call_daemon(request, path=None):
+    """Send one request to a running 'mgr.py serve' and return its result"""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or DAEMON_SOCKET)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as stream:
+            line = stream.readline()
+    if not line:
+        raise DaemonError("the daemon closed the connection")
+    response = json.loads(line)
+    if not response['ok']:
+        raise DaemonError(response['error'])
+    return response['result']
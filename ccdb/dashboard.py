@@ -0,0 +1,123 @@
+"""Pre-built dashboard.json feed loaded by index.html"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from .files import write_atomic
+from .profiling import span
+from .records import record_json, REQUEST_STATES
+from .validation import checked_date
+
+# Pre-aggregated data feed loaded by index.html
+DASHBOARD_FILE = "dashboard.json"
+
+# ------------------ DASHBOARD EXPORT ------------------
+# index.html loads DASHBOARD_FILE instead of parsing the YAML itself, so
+# week spans, sort orders and state counts are computed here once per save.
+
+def weeks_between(start, end):
+    """Whole weeks between two dates, rounded like the dashboard does"""
+    return round((end - start).days / 7)
+
+def weekly_load(rows, origin, count):
+    """Active and frozen project counts for count weeks from origin
+
+    Counts like TimelineEngine.weekly_load() but without NumPy, so the feed
+    has the same keys wherever it is built.
+    """
+    starts = sorted(start for _, start, _, _ in rows)
+    ends = sorted(end for _, _, end, _ in rows)
+    freezes = sorted(freeze for _, _, _, freeze in rows if freeze)
+    frozen_ends = sorted(max(end, freeze) for _, _, end, freeze in rows if freeze)
+    load = []
+    for week in range(count):
+        week_start = origin + timedelta(weeks=week)
+        week_end = week_start + timedelta(days=6)
+        load.append({
+            'active': bisect_right(starts, week_end) - bisect_left(ends, week_start),
+            'frozen': bisect_right(freezes, week_end) - bisect_left(frozen_ends, week_start)
+        })
+    return load
+
+def build_timeline(projects):
+    """Precompute the Gantt chart layout for all projects with a date window
+
+    Projects with a missing or malformed start or end date are left out and a
+    malformed freeze date is dropped; validation reports both.
+    """
+    rows = []
+    for project in projects:
+        start, end = checked_date(project.get('start_date')), checked_date(project.get('end_date'))
+        if start is None or end is None:
+            continue
+        rows.append((project, start, end, checked_date(project.get('freeze_date'))))
+    if not rows:
+        return {'weeks': [], 'projects': [], 'order': {}, 'load': []}
+
+    dates = [d for _, start, end, freeze in rows for d in (start, end, freeze) if d]
+    min_date, max_date = min(dates), max(dates)
+    total_weeks = weeks_between(min_date, max_date)
+    scale = 100 / (total_weeks or 1)
+
+    timeline_projects = []
+    for project, start, end, freeze in rows:
+        timeline_projects.append({
+            'name': project['name'],
+            'start_date': project['start_date'],
+            'end_date': project['end_date'],
+            'freeze_date': project.get('freeze_date') if freeze else None,
+            'commonconfig': project.get('commonconfig') == "true",
+            'left': round(weeks_between(min_date, start) * scale, 3),
+            'width': round(weeks_between(start, end) * scale, 3),
+            'freeze_left': round(weeks_between(min_date, freeze) * scale, 3) if freeze else None
+        })
+
+    # Missing freeze dates sort by end date, as in the original chart
+    order = {}
+    for key, column in (('start_date', 1), ('end_date', 2), ('freeze_date', 3)):
+        order[key] = sorted(range(len(rows)), key=lambda i: rows[i][column] or rows[i][2])
+
+    return {
+        'min_date': min_date.isoformat(),
+        'max_date': max_date.isoformat(),
+        'weeks': [(min_date + timedelta(weeks=i)).isocalendar()[1] for i in range(total_weeks + 1)],
+        'projects': timeline_projects,
+        'order': order,
+        # Active/frozen project counts per Gantt column
+        'load': weekly_load(rows, min_date, total_weeks + 1)
+    }
+
+def build_dashboard(config):
+    """Build the compact data feed rendered by index.html"""
+    requests = config.get('change_requests') or []
+    state_counts = dict.fromkeys(REQUEST_STATES, 0)
+    for req in requests:
+        state_counts[req.get('state')] = state_counts.get(req.get('state'), 0) + 1
+
+    return {
+        'common_config_version': config.get('common_config_version'),
+        'project_filters': config.get('project_filters') or [],
+        'state_counts': state_counts,
+        'timeline': build_timeline(config.get('projects') or []),
+        'divergences': config.get('divergences') or [],
+        'change_requests': [
+            {
+                'title': req['title'],
+                'project': req.get('project'),
+                'state': req.get('state'),
+                'created': req.get('created'),
+                'body': req.get('body', '')
+            }
+            for req in requests
+        ]
+    }
+
+def dashboard_json(config):
+    """Serialised dashboard feed"""
+    return json.dumps(build_dashboard(config), ensure_ascii=False, separators=(',', ':'),
+                      default=record_json).encode('utf-8')
+
+def write_dashboard(config, path=DASHBOARD_FILE):
+    """Write the dashboard feed next to the configuration"""
+    with span('dashboard'):
+        write_atomic(path, dashboard_json(config))
@@ -0,0 +1,349 @@
+"""HTTP server for the dashboard with ETags, compression and live deltas"""
+import os
+import time
+import functools
+import hashlib
+import importlib
+import json
+import selectors
+import signal
+import sys
+import threading
+import traceback
+from collections import deque
+
+from .daemon import watch_files
+from .dashboard import DASHBOARD_FILE, dashboard_json
+from .hints import HINT_SECTION_PATTERN, HINTS_FILE
+from .records import divergence_key, request_key
+from .sqlite_store import DB_FILE
+from .store import CONFIG_FILE, JOURNAL_SUFFIX
+
+# ------------------ DASHBOARD SERVER ------------------
+# 'mgr.py dashboard' serves index.html and its data over HTTP. Every response
+# carries a strong ETag and is compressed once per version. dashboard.json is
+# built from the store, so journal-only saves show up as well, and open pages
+# subscribe to /events to receive only the records that changed since the
+# version they rendered.
+
+DASHBOARD_ASSETS = {
+    'index.html': 'text/html; charset=utf-8',
+    HINTS_FILE: 'text/markdown; charset=utf-8',
+    'common_config_methodology.md': 'text/markdown; charset=utf-8',
+    'favicon.png': 'image/png',
+    'icon.png': 'image/png',
+}
+DASHBOARD_DELTAS = 64         # deltas kept for clients that reconnect
+DASHBOARD_KEEPALIVE = 15.0    # seconds between SSE comments on an idle stream
+DASHBOARD_POLL_SECONDS = 1.0
+COMPRESS_MIN_BYTES = 256
+
+def load_brotli():
+    """Return the brotli module, or None if it is not installed"""
+    try:
+        return importlib.import_module('brotli')
+    except ImportError:
+        return None
+
+def content_tag(raw):
+    """Strong validator for a response body"""
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+@functools.lru_cache(maxsize=32)
+def compress_body(raw, encoding):
+    """Compressed representation of a body, computed once per version"""
+    if encoding == 'br':
+        return load_brotli().compress(raw)
+    import gzip
+    return gzip.compress(raw, compresslevel=6, mtime=0)
+
+def choose_encoding(accept, content_type, size):
+    """Content coding for a response: 'br', 'gzip' or None"""
+    if size < COMPRESS_MIN_BYTES or content_type.startswith('image/'):
+        return None
+    accepted = set()
+    for part in accept.split(','):
+        name, _, params = part.partition(';')
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 1.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    if 'br' in accepted and load_brotli() is not None:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+ASSET_CACHE = {}
+
+def read_asset(name):
+    """Body and tag of a static dashboard file, re-read only when it changed"""
+    stamp = file_stamp(name)
+    if stamp is None:
+        return None
+    cached = ASSET_CACHE.get(name)
+    if cached is None or cached[0] != stamp:
+        with open(name, 'rb') as file:
+            raw = file.read()
+        cached = ASSET_CACHE[name] = (stamp, raw, content_tag(raw))
+    return cached[1], cached[2]
+
+def read_hint_sections(path=HINTS_FILE):
+    """Raw hints file with its section ids in order and the text of each section"""
+    try:
+        with open(path, 'rb') as file:
+            raw = file.read()
+    except FileNotFoundError:
+        return b'', [], {}
+    text = raw.decode('utf-8')
+    sections = {m.group(1): m.group(0) for m in HINT_SECTION_PATTERN.finditer(text)}
+    if not sections:
+        # Hand-written file: one anonymous section, as index.html splits it
+        sections = {'': text}
+    return raw, list(sections), sections
+
+def record_delta(old, new, key):
+    """Upserted and removed records between two versions of a dashboard list"""
+    before = {key(r): r for r in old}
+    upsert = []
+    after = set()
+    for position, record in enumerate(new):
+        record_id = key(record)
+        after.add(record_id)
+        if before.get(record_id) != record:
+            upsert.append({'key': record_id, 'index': position, 'record': record})
+    remove = [record_id for record_id in before if record_id not in after]
+    if upsert or remove:
+        return {'upsert': upsert, 'remove': remove}
+    return None
+
+def dashboard_delta(old, new):
+    """Parts of the dashboard feed that differ between two versions"""
+    delta = {}
+    for section, key in (('change_requests', request_key), ('divergences', divergence_key)):
+        change = record_delta(old[section], new[section], key)
+        if change is not None:
+            delta[section] = change
+    for section in ('common_config_version', 'project_filters', 'state_counts', 'timeline'):
+        if old.get(section) != new.get(section):
+            delta[section] = new.get(section)
+    return delta
+
+class DashboardFeed:
+    """Current dashboard data and the deltas that led to it
+
+    The version is a hash of dashboard.json and the hints file, so a restarted
+    server hands out the same version for the same data.
+    """
+
+    def __init__(self, store, hints_path=HINTS_FILE):
+        self.store = store
+        self.hints_path = hints_path
+        self.changed = threading.Condition()
+        self.config = None
+        self.hints_stamp = None
+        self.body = b''
+        self.tag = None
+        self.dashboard = None
+        self.hints = (b'', [], {})
+        self.version = None
+        self.deltas = deque(maxlen=DASHBOARD_DELTAS)
+
+    def refresh(self):
+        """Pick up saves of the configuration or the hints, True if the version moved"""
+        with self.changed:
+            config = self.store.get()
+            hints_stamp = file_stamp(self.hints_path)
+            if config is self.config and hints_stamp == self.hints_stamp:
+                return False
+            self.config = config
+            body = dashboard_json(config)
+            dashboard = json.loads(body) if body != self.body else self.dashboard
+            hints = self.hints
+            if hints_stamp != self.hints_stamp:
+                self.hints_stamp = hints_stamp
+                hints = read_hint_sections(self.hints_path)
+            version = content_tag(body + b'\0' + hints[0])
+            if version == self.version:
+                return False
+
+            if self.version is not None:
+                delta = dashboard_delta(self.dashboard, dashboard)
+                _, old_order, old_sections = self.hints
+                _, order, sections = hints
+                changed = {s: sections[s] for s in order if old_sections.get(s) != sections[s]}
+                if changed or order != old_order:
+                    delta['hints'] = {'order': order, 'sections': changed}
+                delta['base'] = self.version
+                delta['version'] = version
+                self.deltas.append(delta)
+            self.body, self.tag, self.dashboard, self.hints = body, content_tag(body), dashboard, hints
+            self.version = version
+            self.changed.notify_all()
+            return True
+
+    def _since(self, version):
+        if version == self.version:
+            return []
+        chain = []
+        for delta in self.deltas:
+            if chain or delta['base'] == version:
+                chain.append(delta)
+        # None: the client is too far behind and has to reload
+        return chain or None
+
+    def wait(self, version, timeout):
+        """Wait up to timeout for a version other than the given one
+
+        Returns the current version and the deltas leading to it from the
+        given one, or None if they are no longer kept.
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version, self._since(version)
+
+def watch_dashboard(feed, watched):
+    """Refresh the feed whenever one of the watched files changes"""
+    watcher = watch_files(watched)
+    selector = selectors.DefaultSelector()
+    if watcher is not None:
+        selector.register(watcher, selectors.EVENT_READ)
+    while True:
+        if watcher is None:
+            time.sleep(DASHBOARD_POLL_SECONDS)
+        elif not selector.select() or not watcher.changed():
+            continue
+        try:
+            feed.refresh()
+        except (Exception, SystemExit):
+            # A bad write must not stop live updates; the next change retries
+            print("Error: refreshing the dashboard failed", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+
+def dashboard_handler(feed):
+    """Request handler class serving the dashboard from a feed"""
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlsplit
+
+    class DashboardHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = 'mgr.py'
+
+        def do_GET(self):
+            self.head_only = False
+            self.respond()
+
+        def do_HEAD(self):
+            self.head_only = True
+            self.respond()
+
+        def respond(self):
+            url = urlsplit(self.path)
+            if url.path == '/events' and not self.head_only:
+                version = (self.headers.get('Last-Event-ID')
+                           or parse_qs(url.query).get('version', [None])[0])
+                self.stream_events(version)
+                return
+            name = url.path.lstrip('/') or 'index.html'
+            if name == DASHBOARD_FILE:
+                feed.refresh()
+                with feed.changed:
+                    body, tag, version = feed.body, feed.tag, feed.version
+                self.send_cached(body, tag, 'application/json; charset=utf-8',
+                                 {'X-Dashboard-Version': version})
+                return
+            asset = read_asset(name) if name in DASHBOARD_ASSETS else None
+            if asset is None:
+                self.send_error(404)
+                return
+            self.send_cached(asset[0], asset[1], DASHBOARD_ASSETS[name])
+
+        def send_cached(self, body, tag, content_type, extra=None):
+            """Send a body, or 304 if the client's copy carries the same ETag"""
+            encoding = choose_encoding(self.headers.get('Accept-Encoding', ''), content_type, len(body))
+            # Each representation needs its own strong ETag
+            etag = f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+            headers.update(extra or {})
+            candidates = {t.strip().removeprefix('W/')
+                          for t in self.headers.get('If-None-Match', '').split(',')}
+            if etag in candidates or '*' in candidates:
+                self.send_response(304)
+                body = b''
+            else:
+                if encoding:
+                    body = compress_body(body, encoding)
+                    headers['Content-Encoding'] = encoding
+                self.send_response(200)
+                headers['Content-Type'] = content_type
+                headers['Content-Length'] = str(len(body))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if body and not self.head_only:
+                self.wfile.write(body)
+
+        def stream_events(self, version):
+            """Server-Sent Events: one 'delta' per version, 'reload' if the client is too far behind"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            feed.refresh()
+            try:
+                self.wfile.write(b'retry: 2000\n\n')
+                while True:
+                    current, deltas = feed.wait(version, DASHBOARD_KEEPALIVE)
+                    if deltas is None:
+                        message = f"event: reload\nid: {current}\ndata: {{}}\n\n"
+                    elif not deltas:
+                        message = ": keepalive\n\n"
+                    else:
+                        message = ''.join(
+                            f"event: delta\nid: {delta['version']}\ndata: "
+                            f"{json.dumps(delta, ensure_ascii=False, separators=(',', ':'))}\n\n"
+                            for delta in deltas)
+                    self.wfile.write(message.encode('utf-8'))
+                    version = current
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return DashboardHandler
+
+def serve_dashboard(store, backend, host, port):
+    """Serve the dashboard of store in the foreground"""
+    from http.server import ThreadingHTTPServer
+
+    feed = DashboardFeed(store)
+    feed.refresh()
+    watched = [DB_FILE] if backend == 'sqlite' else [CONFIG_FILE, CONFIG_FILE + JOURNAL_SUFFIX]
+    threading.Thread(target=watch_dashboard, args=(feed, watched + [HINTS_FILE]),
+                     daemon=True).start()
+    try:
+        server = ThreadingHTTPServer((host, port), dashboard_handler(feed))
+    except OSError as error:
+        print(f"Error: cannot listen on {host}:{port} ({error})", file=sys.stderr)
+        sys.exit(1)
+    server.daemon_threads = True
+    encodings = "br, gzip" if load_brotli() is not None else "gzip"
+    print(f"Dashboard on http://{host}:{server.server_port}/ ({encodings}), Ctrl-C to stop",
+          file=sys.stderr)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
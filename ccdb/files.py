@@ -0,0 +1,69 @@
+"""File helpers: atomic replacement and the advisory writer lock"""
+import os
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: byte-range locks through msvcrt instead
+    fcntl = None
+    import msvcrt
+
+def write_atomic(path, raw):
+    """Replace a file through an fsync'd temporary file and a rename
+
+    Readers see either the old or the new content, never a partial write.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(raw)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    # Persist the rename itself
+    with contextlib.suppress(OSError):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class FileLock:
+    """Re-entrant advisory lock on a file, shared between processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        if not self._depth:
+            file = open(self.path, 'a')
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(file, fcntl.LOCK_EX)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                file.close()
+                raise
+            self._file = file
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if not self._depth:
+            if fcntl is not None:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
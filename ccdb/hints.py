@@ -0,0 +1,108 @@
+"""integration_hints.md generated from change request data"""
+import hashlib
+import json
+import re
+from datetime import datetime
+
+from .files import write_atomic
+from .records import tag_dates
+
+# Generated from the 'integration' data of config.yaml
+HINTS_FILE = "integration_hints.md"
+
+# ------------------ INTEGRATION HINTS ------------------
+# HINTS_FILE is generated from change requests that carry an 'integration'
+# block and from the top-level 'integration' targets. Each section is wrapped
+# in a marker holding a hash of its inputs; regeneration only renders sections
+# whose inputs changed and leaves the file untouched when nothing did.
+
+HINT_SECTION_PATTERN = re.compile(
+    r'<!-- section:(\S+) hash:(\w+) -->\n(.*?)<!-- /section -->\n', re.DOTALL)
+
+def hint_hash(inputs):
+    """Short content hash of a section's inputs"""
+    # Dates in the integration data are hashed in their tagged form
+    return hashlib.sha1(json.dumps(tag_dates(inputs), sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def render_hint_header(version, owner, today):
+    return (f"## ⚙️ Common Config Test Integrations\n"
+            f"📅 Last Updated: {today}  \n"
+            f"🔄 Version: Common Config {version}  \n"
+            f"👤 Owner: {owner}  \n"
+            f"---\n\n")
+
+def render_hint_summary(version, targets, tickets):
+    lines = [f"### 🎯 **Integrated All Changes (Common Config {version})**  ",
+             "**Projects:**  "]
+    lines += [f"- **{t['name']}:** `Branch: {t.get('branch', '')} `  " for t in targets]
+    lines += ["", "**Tickets:**  ", ""]
+    lines += [f"✅ {title} | {summary}  " for title, summary in tickets]
+    lines += ["", "---", "", f"### 🔧 Detailed Common Config {version} - Integrated Changes", "", ""]
+    return '\n'.join(lines) + '\n'
+
+def render_hint_ticket(title, integration, targets):
+    statuses = integration.get('targets') or {}
+    done = all(statuses.get(t['name'], {}).get('status') == 'integrated' for t in targets)
+    lines = [f"{'✅' if done else '🔄'} **{title}** — {integration.get('description', title)}  "]
+    if integration.get('note'):
+        lines.append(f"*({integration['note']})*  ")
+    for target in targets:
+        entry = statuses.get(target['name'], {})
+        if entry.get('status') == 'integrated':
+            detail = f"✅ PVER: {entry['pver']}" if entry.get('pver') else "✅ (Integrated)"
+        else:
+            detail = "⚠️ (Pending)"
+        lines.append(f"- **{target['name']}:** {detail}  ")
+    return '\n'.join(lines) + '\n\n\n'
+
+def generate_integration_hints(config, path=HINTS_FILE):
+    """Regenerate changed sections of the integration hints, returning how many changed"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            existing = {m.group(1): (m.group(2), m.group(3)) for m in HINT_SECTION_PATTERN.finditer(file.read())}
+    except FileNotFoundError:
+        existing = {}
+
+    settings = config.get('integration') or {}
+    targets = settings.get('targets') or []
+    version = config.get('common_config_version', '')
+    # Most recent requests first
+    requests = [r for r in reversed(config.get('change_requests') or []) if r.get('integration')]
+
+    sections = []
+    changed = 0
+
+    def add_section(section_id, inputs, render):
+        nonlocal changed
+        digest = hint_hash(inputs)
+        old = existing.get(section_id)
+        if old is not None and old[0] == digest:
+            body = old[1]
+        else:
+            body = render()
+            changed += 1
+        sections.append((section_id, digest, body))
+
+    tickets = [(r['title'], r['integration'].get('summary', r['title'])) for r in requests]
+    add_section('summary', [version, targets, tickets],
+                lambda: render_hint_summary(version, targets, tickets))
+    for req in requests:
+        add_section(f"ticket:{req['title']}", [req['title'], req['integration'], targets],
+                    lambda req=req: render_hint_ticket(req['title'], req['integration'], targets))
+
+    # The header date moves whenever any other section changes
+    header_inputs = [version, settings.get('owner', ''), [digest for _, digest, _ in sections]]
+    today = datetime.now().strftime('%Y-%m-%d')
+    sections.insert(0, None)
+    add_section('header', header_inputs,
+                lambda: render_hint_header(version, settings.get('owner', ''), today))
+    sections[0] = sections.pop()
+
+    if not changed and len(existing) == len(sections):
+        return 0
+
+    write_atomic(path, ''.join(
+        f"<!-- section:{section_id} hash:{digest} -->\n{body}<!-- /section -->\n"
+        for section_id, digest, body in sections
+    ).encode('utf-8'))
+    return changed
@@ -0,0 +1,277 @@
+"""Binary log of request state transitions and the analytics over it"""
+import time
+import json
+import struct
+from datetime import date
+
+from .records import request_key, REQUEST_STATES, State
+from .timeline import load_numpy, TimelineEngine
+from .validation import checked_date
+
+# ------------------ STATE HISTORY ------------------
+# Every state a request enters is appended to a binary log next to the YAML
+# file as a fixed-size (request id, state code, epoch seconds) record. Request
+# ids are assigned once per (title, project) key and follow renames. Removing
+# a request appends a REMOVED_CODE tombstone that ends its last state. The
+# analytics load the log as NumPy columns and work on whole arrays at once.
+
+HISTORY_RECORD = struct.Struct('<IBq')
+HISTORY_DTYPE = [('id', '<u4'), ('state', 'u1'), ('time', '<i8')]
+REMOVED_CODE = 0xFF
+DONE_STATES = ('integrated', 'fulfilled_prio')
+SECONDS_PER_WEEK = 7 * 86400
+
+class StateHistory:
+    """Append-only log of request state transitions"""
+
+    def __init__(self, path):
+        self.path = path
+        self.keys_path = path + '.keys'
+        self._ids = None
+        self._keys = None
+        self._keys_read = 0
+
+    def _bind(self, request_id, title, project):
+        if request_id >= len(self._keys):
+            self._keys.extend([None] * (request_id + 1 - len(self._keys)))
+        old = self._keys[request_id]
+        if old is not None:
+            self._ids.pop(old, None)
+        self._keys[request_id] = (title, project)
+        self._ids[(title, project)] = request_id
+
+    def _load_keys(self):
+        if self._ids is None:
+            self._ids, self._keys = {}, []
+        # Pick up ids that other processes appended since the last read
+        try:
+            with open(self.keys_path, 'rb') as file:
+                file.seek(self._keys_read)
+                tail = file.read()
+        except FileNotFoundError:
+            tail = b''
+        complete = tail[:tail.rfind(b'\n') + 1]
+        for line in complete.decode('utf-8').splitlines():
+            self._bind(*json.loads(line))
+        self._keys_read += len(complete)
+        return self._ids
+
+    def _append_keys(self, lines):
+        raw = ''.join(lines).encode('utf-8')
+        with open(self.keys_path, 'ab') as file:
+            file.write(raw)
+        self._keys_read += len(raw)
+
+    def keys(self):
+        """Current (title, project) key of every request id, None for unused ids"""
+        self._load_keys()
+        return self._keys
+
+    def record(self, transitions, when=None):
+        """Append (key, state) transitions, all stamped with the same time
+
+        States outside REQUEST_STATES have no code and are not logged; they
+        are written before this runs, so raising would only hide the write.
+        """
+        ids = self._load_keys()
+        when = int(time.time()) if when is None else int(when)
+        new_keys, records = [], []
+        for key, state in transitions:
+            state = State.parse(state)
+            if not isinstance(state, State):
+                continue
+            key = tuple(key)
+            if key not in ids:
+                self._bind(len(self._keys), *key)
+                new_keys.append(json.dumps([ids[key], *key]) + '\n')
+            records.append(HISTORY_RECORD.pack(ids[key], state, when))
+
+        if new_keys:
+            self._append_keys(new_keys)
+        self._append(records)
+
+    def remove(self, keys, when=None):
+        """Append a tombstone for each removed request that has an id"""
+        ids = self._load_keys()
+        when = int(time.time()) if when is None else int(when)
+        self._append([HISTORY_RECORD.pack(ids[tuple(key)], REMOVED_CODE, when)
+                      for key in keys if tuple(key) in ids])
+
+    def _append(self, records):
+        if records:
+            with open(self.path, 'ab') as file:
+                file.write(b''.join(records))
+
+    def rename(self, old_key, new_key):
+        """Keep the request id of a request whose title or project changed"""
+        ids = self._load_keys()
+        old_key, new_key = tuple(old_key), tuple(new_key)
+        if old_key in ids and old_key != new_key:
+            request_id = ids[old_key]
+            self._bind(request_id, *new_key)
+            self._append_keys([json.dumps([request_id, *new_key]) + '\n'])
+
+    def columns(self, np):
+        """Request id, state code and epoch second columns of the whole log"""
+        try:
+            with open(self.path, 'rb') as file:
+                raw = file.read()
+        except FileNotFoundError:
+            raw = b''
+        # Ignore a record torn by an interrupted append
+        raw = raw[:len(raw) - len(raw) % HISTORY_RECORD.size]
+        records = np.frombuffer(raw, dtype=np.dtype(HISTORY_DTYPE))
+        return records['id'], records['state'], records['time']
+
+def record_transition(history, op, args, when=None):
+    """Log the state a change operation moves a request into"""
+    if op == 'add_request':
+        request = args['request']
+        history.record([(request_key(request), request['state'])], when)
+    elif op == 'change_request_state':
+        history.record([(args['key'], args['state'])], when)
+    elif op == 'edit_request':
+        key, changes = tuple(args['key']), args['changes']
+        new_key = (changes.get('title', key[0]), changes.get('project', key[1]))
+        history.rename(key, new_key)
+        if 'state' in changes:
+            history.record([(new_key, changes['state'])], when)
+    elif op == 'remove_requests':
+        history.remove(args['keys'], when)
+
+class HistoryAnalytics:
+    """Cycle time, WIP and throughput computed over the whole transition log
+
+    requests are the current change request records; their created dates
+    stand in for the start of requests whose log begins in a done state.
+    """
+
+    def __init__(self, np, history, requests=()):
+        self.np = np
+        ids, states, times = history.columns(np)
+        order = np.lexsort((times, ids))
+        self.ids, self.states, self.times = ids[order], states[order], times[order]
+
+        keys = history.keys()
+        self.projects = sorted({key[1] for key in keys if key is not None and key[1] is not None})
+        codes = {name: i for i, name in enumerate(self.projects)}
+        # Project code per request id, -1 for ids without a project
+        self.project_of = np.array([codes.get(key[1], -1) if key is not None else -1 for key in keys],
+                                   dtype='int64')
+        # Epoch second of the created date per request id, -1 where it is unknown
+        created = {request_key(r): checked_date(r.get('created')) for r in requests}
+        epoch = date(1970, 1, 1)
+        self.created_at = np.array([(created[key] - epoch).days * 86400 if created.get(key) else -1
+                                    for key in keys], dtype='int64')
+
+        self.done_codes = [REQUEST_STATES.index(state) for state in DONE_STATES]
+
+    @classmethod
+    def create(cls, history, requests=()):
+        """Analytics for the log, or None when NumPy is not installed"""
+        np = load_numpy()
+        return cls(np, history, requests) if np is not None else None
+
+    def _in_project(self, ids, project):
+        if project is None:
+            return self.np.ones(len(ids), dtype=bool)
+        code = self.projects.index(project) if project in self.projects else -2
+        return self.project_of[ids] == code
+
+    def _first_rows(self, mask):
+        """Index of the first row of every request id among the masked rows"""
+        np = self.np
+        rows = np.flatnonzero(mask)
+        ids = self.ids[rows]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        return rows[first]
+
+    def completions(self):
+        """Request ids with their start and completion times
+
+        A request starts with its first logged state and completes the first
+        time it reaches a done state. Requests first seen already done have no
+        earlier row and start at their created date instead; without one they
+        are left out.
+        """
+        np = self.np
+        starts = self._first_rows(self.states != REMOVED_CODE)
+        done = np.isin(self.states, self.done_codes)
+        finishes = self._first_rows(done)
+
+        ids, finish = self.ids[finishes], self.times[finishes]
+        started = starts[np.searchsorted(self.ids[starts], ids)]
+        start = np.where(np.isin(self.states[started], self.done_codes), self.created_at[ids],
+                         self.times[started])
+        keep = (start >= 0) & (start <= finish)
+        return ids[keep], start[keep], finish[keep]
+
+    def cycle_times(self):
+        """Completed count and mean/median/90th percentile cycle days per project"""
+        np = self.np
+        ids, start, finish = self.completions()
+        if not len(ids):
+            return []
+        days = (finish - start) / 86400.0
+        projects = self.project_of[ids]
+
+        order = np.argsort(projects, kind='stable')
+        projects, days = projects[order], days[order]
+        codes, bounds = np.unique(projects, return_index=True)
+
+        stats = []
+        for code, group in zip(codes, np.split(days, bounds[1:])):
+            p50, p90 = np.percentile(group, [50, 90])
+            stats.append({
+                'project': self.projects[code] if code >= 0 else None,
+                'completed': int(len(group)),
+                'mean_days': round(float(group.mean()), 1),
+                'p50_days': round(float(p50), 1),
+                'p90_days': round(float(p90), 1)
+            })
+        return stats
+
+    def weekly(self, project=None):
+        """Requests open and in progress at each week end, and completions per week"""
+        np = self.np
+        mask = self._in_project(self.ids, project)
+        if not mask.any():
+            return []
+
+        # Weeks run Monday to Sunday in UTC; 1970-01-01 was a Thursday
+        first_day = self.times[mask].min() // 86400
+        origin = (first_day - (first_day + 3) % 7) * 86400
+        count = int((max(int(time.time()), self.times[mask].max()) - origin) // SECONDS_PER_WEEK) + 1
+        week_start = origin + SECONDS_PER_WEEK * np.arange(count)
+        week_end = week_start + SECONDS_PER_WEEK
+
+        # Each row holds its state until the next row of the same request
+        same = np.zeros(len(self.ids), dtype=bool)
+        same[:-1] = self.ids[1:] == self.ids[:-1]
+        until = np.full(len(self.ids), np.iinfo('int64').max, dtype='int64')
+        until[:-1] = np.where(same[:-1], self.times[1:], until[:-1])
+
+        def in_state(state):
+            rows = mask & (self.states == REQUEST_STATES.index(state))
+            entered, left = np.sort(self.times[rows]), np.sort(until[rows])
+            return np.searchsorted(entered, week_end, 'left') - np.searchsorted(left, week_end, 'left')
+
+        wip, backlog = in_state('in_progress'), in_state('open')
+
+        ids, _, finish = self.completions()
+        finish = finish[self._in_project(ids, project)]
+        completed = np.bincount((finish - origin) // SECONDS_PER_WEEK, minlength=count)
+
+        days = (week_start // 86400).astype('datetime64[D]')
+        years, weeks = TimelineEngine(np, []).iso_weeks(days)
+        return [
+            {
+                'week_start': str(days[i]),
+                'iso_week': f"{years[i]}-W{weeks[i]:02d}",
+                'open': int(backlog[i]),
+                'in_progress': int(wip[i]),
+                'completed': int(completed[i])
+            }
+            for i in range(count)
+        ]
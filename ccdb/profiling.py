@@ -0,0 +1,222 @@
+"""Timing spans and counters recorded by --profile"""
+import os
+import time
+import contextlib
+import importlib
+import json
+import math
+import sys
+import threading
+
+# ------------------ PROFILING ------------------
+# '--profile' (or CCDB_PROFILE=1) records timing spans around loads, saves,
+# table building and prompts, plus a few counters, and prints a summary at
+# exit. '--profile-export' also writes the spans as a Chrome trace
+# (chrome://tracing, Perfetto) or a speedscope file. Disabled, span() hands
+# out one shared no-op context manager and prompts are not wrapped at all.
+
+PROFILER = None
+NULL_SPAN = contextlib.nullcontext()
+# Per-module statistics dicts shown with the counters, by name prefix
+COUNTER_SOURCES = {}
+
+class Span:
+    """One timed block, recorded when it exits"""
+    __slots__ = ('profiler', 'name', 'args', 'start')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler.events.append(
+            (self.name, self.start, end - self.start, threading.get_ident(), self.args))
+
+class Profiler:
+    """Spans and counters of one run"""
+
+    def __init__(self, started):
+        self.origin = int(started * 1e9)
+        self.events = []
+        self.counters = {}
+        # Interpreter start up to argument parsing
+        self.events.append(('startup', self.origin, time.perf_counter_ns() - self.origin,
+                            threading.get_ident(), {}))
+
+    def span(self, name, args):
+        return Span(self, name, args)
+
+    def durations(self):
+        """Span durations in milliseconds, grouped by name in first-seen order"""
+        groups = {}
+        for name, _, duration, _, _ in self.events:
+            groups.setdefault(name, []).append(duration / 1e6)
+        return groups
+
+    def summary(self):
+        """Per-span statistics and a power-of-two histogram, then the counters"""
+        lines = [f"{'span':<24} {'count':>6} {'total ms':>10} {'mean':>9} {'p50':>9} "
+                 f"{'p95':>9} {'max':>9}  histogram (ms)"]
+        for name, values in self.durations().items():
+            values.sort()
+            n = len(values)
+            buckets = {}
+            for value in values:
+                bound = 2 ** max(0, math.ceil(math.log2(value))) if value > 1 else 1
+                buckets[bound] = buckets.get(bound, 0) + 1
+            histogram = ' '.join(f"≤{bound:g}:{hits}" for bound, hits in sorted(buckets.items()))
+            lines.append(f"{name:<24} {n:>6} {sum(values):>10.2f} {sum(values) / n:>9.2f} "
+                         f"{values[n // 2]:>9.2f} {values[min(n - 1, n * 95 // 100)]:>9.2f} "
+                         f"{values[-1]:>9.2f}  {histogram}")
+        counters = dict(self.counters)
+        for prefix, stats in COUNTER_SOURCES.items():
+            counters.update((f"{prefix}.{k}", v) for k, v in stats.items() if v)
+        if counters:
+            lines.append("counters  " + ", ".join(
+                f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+                for name, value in counters.items()))
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """Trace Event Format, for chrome://tracing and Perfetto"""
+        pid = os.getpid()
+        events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin) / 1000, 'dur': duration / 1000, 'args': args}
+                  for name, start, duration, tid, args in self.events]
+        end = max((e['ts'] + e['dur'] for e in events), default=0)
+        events += [{'name': name, 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': end,
+                    'args': {'value': value}} for name, value in self.counters.items()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def speedscope(self):
+        """speedscope evented profile, one per thread"""
+        frames = []
+        frame_ids = {}
+        profiles = []
+        threads = {}
+        for name, start, duration, tid, _ in self.events:
+            if name not in frame_ids:
+                frame_ids[name] = len(frames)
+                frames.append({'name': name})
+            threads.setdefault(tid, []).append((name, start - self.origin, duration))
+        for number, (tid, spans) in enumerate(threads.items()):
+            # Closes before opens at the same instant; inner spans close first
+            # and outer spans open first
+            marks = []
+            for name, start, duration in spans:
+                marks.append((start, 1, -duration, 'O', frame_ids[name]))
+                marks.append((start + duration, 0, -start, 'C', frame_ids[name]))
+            marks.sort()
+            profiles.append({
+                'type': 'evented',
+                'name': 'main' if number == 0 else f"thread {tid}",
+                'unit': 'nanoseconds',
+                'startValue': marks[0][0] if marks else 0,
+                'endValue': marks[-1][0] if marks else 0,
+                'events': [{'type': kind, 'frame': frame, 'at': at}
+                           for at, _, _, kind, frame in marks],
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': profiles,
+            'name': 'mgr.py',
+            'exporter': 'mgr.py --profile',
+        }
+
+    def report(self, export=None, export_format='chrome'):
+        """Print the summary and write the export file, at exit"""
+        print(self.summary(), file=sys.stderr)
+        if export:
+            data = self.speedscope() if export_format == 'speedscope' else self.chrome_trace()
+            with open(export, 'w', encoding='utf-8') as file:
+                json.dump(data, file, default=str)
+            print(f"profile      {export} ({export_format})", file=sys.stderr)
+
+class FirstKeyTimer:
+    """inquirer key event source that ends a span when the first key is read"""
+
+    def __init__(self, timer):
+        self._timer = timer
+        self.events = None
+        timer.__enter__()
+
+    def stop(self):
+        if self._timer is not None:
+            timer, self._timer = self._timer, None
+            timer.__exit__(None, None, None)
+
+    def next(self):
+        self.stop()
+        return self.events.next()
+
+def first_key_render(keys, theme):
+    """inquirer ConsoleRender that reads its keys through a FirstKeyTimer
+
+    ConsoleRender(event_generator=...) and inquirer.events.KeyEventGenerator
+    are inquirer internals, used here as inquirer 3.4 has them. Returns None
+    if they are missing or take other arguments.
+    """
+    try:
+        keys.events = importlib.import_module('inquirer.events').KeyEventGenerator()
+        return importlib.import_module('inquirer.render.console').ConsoleRender(
+            event_generator=keys, theme=theme)
+    except (ImportError, AttributeError, TypeError):
+        return None
+
+class ProfiledPrompts:
+    """inquirer stand-in that times every prompt, installed only while profiling
+
+    A prompt is timed from the call until it first waits for a key, so the
+    span covers drawing the question and its choices but not the time the
+    user takes to answer. Prompts given their own render, or run on an
+    inquirer without the internals first_key_render() needs, are timed up to
+    the answer instead.
+    """
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def prompt(self, questions, render=None, answers=None, theme=None, **kwargs):
+        # Large choice lists are what makes a prompt slow to draw
+        choices = sum(len(q._choices) for q in questions
+                      if isinstance(getattr(q, '_choices', None), list))
+        name = getattr(questions[0], 'name', None) if questions else None
+        keys = FirstKeyTimer(span(f"prompt.{name}", choices=choices))
+        try:
+            if render is None:
+                render = first_key_render(keys, theme)
+            return self._module.prompt(questions, render, answers, theme, **kwargs)
+        finally:
+            # Prompts that never read a key, such as an external editor
+            keys.stop()
+
+def span(name, **args):
+    """Context manager timing a block while profiling is enabled"""
+    if PROFILER is None:
+        return NULL_SPAN
+    return PROFILER.span(name, args)
+
+def tally(name, amount=1):
+    """Add to a profiling counter"""
+    if PROFILER is not None:
+        PROFILER.counters[name] = PROFILER.counters.get(name, 0) + amount
+
+def enable_profiling(started, export=None, export_format='chrome'):
+    """Start recording spans and report them when the process exits
+
+    started is the perf_counter() value at interpreter start-up.
+    """
+    global PROFILER
+    import atexit
+    PROFILER = Profiler(started)
+    atexit.register(PROFILER.report, export, export_format)
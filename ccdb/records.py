@@ -0,0 +1,235 @@
+"""Typed records for projects, change requests and divergences"""
+import enum
+import sys
+from collections.abc import MutableMapping
+from datetime import date, datetime
+
+REQUEST_STATES = ['open', 'in_progress', 'integrated', 'fulfilled_prio']
+INTEGRATION_STATES = ['pending', 'integrated']
+
+# ------------------ RECORD MODEL ------------------
+# Projects, requests and divergences are held as __slots__ records instead of
+# dicts. Fields carry native values (State, date, bool, interned project
+# names) while item access reads and writes the YAML representation, so the
+# journal, SQLite tables and exports see exactly what was loaded.
+
+class State(enum.IntEnum):
+    """Change request state, written to YAML as its lower-case name"""
+    OPEN = 0
+    IN_PROGRESS = 1
+    INTEGRATED = 2
+    FULFILLED_PRIO = 3
+
+    def __str__(self):
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value):
+        """State for a name such as 'in_progress', unknown values are kept as given"""
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls[value.upper()]
+        except (KeyError, AttributeError):
+            return value
+
+STATE_NAMES = {
+    State.IN_PROGRESS: 'in progress',
+    State.FULFILLED_PRIO: 'fulfilled (in prio version)'
+}
+
+def decode_date(value):
+    if isinstance(value, str) and len(value) == 10:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+def encode_date(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def decode_flag(value):
+    return {'true': True, 'false': False}.get(value, value) if isinstance(value, str) else value
+
+def encode_flag(value):
+    return ('true' if value else 'false') if isinstance(value, bool) else value
+
+def decode_name(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def encode_state(value):
+    return str(value) if isinstance(value, State) else value
+
+class Record(MutableMapping):
+    """Typed record that reads and writes like the dict it was loaded from
+
+    Values that do not parse (an unknown state, a malformed date) are kept
+    as given, and keys without a field are kept in 'extra' in file order.
+    """
+    __slots__ = ('extra',)
+    FIELDS = ()
+    # Conversions from the YAML value to the attribute and back
+    DECODERS = {}
+    ENCODERS = {}
+
+    def __init__(self, data=()):
+        self.extra = None
+        self.update(data)
+
+    def __getitem__(self, name):
+        if name in self.FIELDS:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                raise KeyError(name) from None
+            encode = self.ENCODERS.get(name)
+            return encode(value) if encode else value
+        if self.extra is not None and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        if name in self.FIELDS:
+            decode = self.DECODERS.get(name)
+            setattr(self, name, decode(value) if decode else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def __delitem__(self, name):
+        try:
+            if name in self.FIELDS:
+                delattr(self, name)
+            else:
+                del self.extra[name]
+        except (AttributeError, KeyError, TypeError):
+            raise KeyError(name) from None
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def to_dict(self):
+        """The YAML mapping of the record as a plain dict"""
+        data = {}
+        for name in self.FIELDS:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            encode = self.ENCODERS.get(name)
+            data[name] = encode(value) if encode else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+class Project(Record):
+    __slots__ = ('name', 'start_date', 'end_date', 'freeze_date', 'commonconfig')
+    FIELDS = __slots__
+    DECODERS = {
+        'name': decode_name,
+        'start_date': decode_date,
+        'end_date': decode_date,
+        'freeze_date': decode_date,
+        'commonconfig': decode_flag
+    }
+    ENCODERS = {
+        'start_date': encode_date,
+        'end_date': encode_date,
+        'freeze_date': encode_date,
+        'commonconfig': encode_flag
+    }
+
+class ChangeRequest(Record):
+    __slots__ = ('title', 'body', 'project', 'state', 'created')
+    FIELDS = __slots__
+    DECODERS = {'project': decode_name, 'state': State.parse, 'created': decode_date}
+    ENCODERS = {'state': encode_state, 'created': encode_date}
+
+class Divergence(Record):
+    __slots__ = ('project', 'reason', 'date')
+    FIELDS = __slots__
+    DECODERS = {'project': decode_name, 'date': decode_date}
+    ENCODERS = {'date': encode_date}
+
+RECORD_TYPES = {'projects': Project, 'change_requests': ChangeRequest, 'divergences': Divergence}
+
+def as_record(record_type, value):
+    """Wrap a loaded mapping in its record type"""
+    return value if isinstance(value, record_type) else record_type(value)
+
+def record_json(value):
+    """json.dumps default that writes records as their YAML mapping and dates as ISO strings"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# JSON written and read back by the stores keeps dates as {'!date': ISO string},
+# after their YAML tags, so loading it restores the type
+JSON_DATE_TAGS = {'!date': date.fromisoformat, '!datetime': datetime.fromisoformat}
+
+def tagged_json(value):
+    """json.dumps default for JSON read back with untag_json()"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, datetime):
+        return {'!datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'!date': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def untag_json(obj):
+    """json.loads object_hook, inverse of tagged_json()"""
+    if len(obj) == 1:
+        (tag, text), = obj.items()
+        parse = JSON_DATE_TAGS.get(tag)
+        if parse is not None and isinstance(text, str):
+            return parse(text)
+    return obj
+
+def request_key(req):
+    """Identity of a change request"""
+    return (req['title'], req.get('project'))
+
+def divergence_key(div):
+    """Identity of a divergence"""
+    return (div['project'], div['reason'], div.get('date'))
+
+def tag_dates(value):
+    """Copy of a parsed YAML value with its dates as ('date', ISO string) tuples
+
+    Safe-loaded YAML has no tuples, so the tags cannot clash with data.
+    """
+    if isinstance(value, dict):
+        return {key: tag_dates(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [tag_dates(item) for item in value]
+    if isinstance(value, datetime):
+        return ('datetime', value.isoformat())
+    if isinstance(value, date):
+        return ('date', value.isoformat())
+    return value
+
+def untag_dates(value):
+    """Inverse of tag_dates()"""
+    if isinstance(value, dict):
+        return {key: untag_dates(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [untag_dates(item) for item in value]
+    if isinstance(value, tuple):
+        kind, text = value
+        return datetime.fromisoformat(text) if kind == 'datetime' else date.fromisoformat(text)
+    return value
@@ -0,0 +1,252 @@
+"""Streaming report export to CSV, JSONL, Parquet, Arrow and Excel"""
+import os
+import contextlib
+import csv
+import functools
+import importlib
+import itertools
+import json
+import operator
+import sys
+from datetime import datetime, timedelta
+
+from .dashboard import weeks_between
+from .history import HISTORY_RECORD, REMOVED_CODE
+from .profiling import span
+from .records import encode_flag, REQUEST_STATES
+from .validation import checked_date
+
+# ------------------ REPORT EXPORT ------------------
+# 'mgr.py export' streams requests, project timelines, divergences or the
+# state history into CSV, JSONL, Parquet, Arrow or Excel files. Rows come
+# from generators and are written EXPORT_CHUNK at a time, so memory stays
+# flat however many rows are exported. Parquet and Arrow need pyarrow,
+# Excel needs openpyxl; both are optional.
+
+EXPORT_CHUNK = 10000
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet', 'arrow', 'xlsx']
+EXPORT_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet',
+                     '.arrow': 'arrow', '.feather': 'arrow', '.xlsx': 'xlsx'}
+XLSX_MAX_ROWS = 1048576   # rows per worksheet, including the header
+HISTORY_EPOCH = datetime(1970, 1, 1)
+
+# Columns of each dataset with their types, in the default order
+EXPORT_COLUMNS = {
+    'requests': {'title': 'string', 'project': 'string', 'state': 'string', 'created': 'date',
+                 'body': 'string', 'integration': 'string'},
+    'timelines': {'name': 'string', 'start_date': 'date', 'end_date': 'date', 'freeze_date': 'date',
+                  'commonconfig': 'bool', 'weeks': 'int', 'freeze_weeks': 'int',
+                  **{state: 'int' for state in REQUEST_STATES}, 'divergences': 'int'},
+    'divergences': {'project': 'string', 'reason': 'string', 'date': 'date'},
+    'history': {'title': 'string', 'project': 'string', 'state': 'string', 'time_utc': 'timestamp'},
+}
+
+ARROW_TYPES = {
+    'string': lambda pa: pa.string(),
+    'int': lambda pa: pa.int64(),
+    'bool': lambda pa: pa.bool_(),
+    'date': lambda pa: pa.date32(),
+    'timestamp': lambda pa: pa.timestamp('s'),
+}
+
+def request_rows(requests):
+    """Export rows of change requests"""
+    for req in requests:
+        targets = (req.get('integration') or {}).get('targets') or {}
+        yield {
+            'title': req.get('title'),
+            'project': req.get('project'),
+            'state': req.get('state'),
+            'created': checked_date(req.get('created')),
+            'body': req.get('body'),
+            'integration': ', '.join(f"{target}: {(status or {}).get('status')}"
+                                     for target, status in targets.items()) or None
+        }
+
+def timeline_rows(index, project=None):
+    """Export rows of project windows with request counts per state"""
+    divergences = {}
+    for div in index.config.get('divergences') or []:
+        divergences[div.get('project')] = divergences.get(div.get('project'), 0) + 1
+
+    for p in index.config.get('projects') or []:
+        name = p.get('name')
+        if project is not None and name != project:
+            continue
+        start, end, freeze = (checked_date(p.get(field)) for field in ('start_date', 'end_date', 'freeze_date'))
+        row = {
+            'name': name,
+            'start_date': start,
+            'end_date': end,
+            'freeze_date': freeze,
+            'commonconfig': p.get('commonconfig') == 'true',
+            'weeks': weeks_between(start, end) if start and end else None,
+            'freeze_weeks': weeks_between(freeze, end) if freeze and end else None,
+            'divergences': divergences.get(name, 0)
+        }
+        for state in REQUEST_STATES:
+            row[state] = index.count(name, state)
+        yield row
+
+def divergence_rows(divergences, project=None):
+    """Export rows of divergences"""
+    for div in divergences:
+        if project is None or div.get('project') == project:
+            yield {'project': div.get('project'), 'reason': div.get('reason'),
+                   'date': checked_date(div.get('date'))}
+
+def history_rows(history, project=None, state=None):
+    """Export rows of the state transition log, read EXPORT_CHUNK records at a time"""
+    keys = history.keys()
+    code = REQUEST_STATES.index(state) if state is not None else None
+    try:
+        file = open(history.path, 'rb')
+    except FileNotFoundError:
+        return
+    with file:
+        while True:
+            raw = file.read(HISTORY_RECORD.size * EXPORT_CHUNK)
+            # Ignore a record torn by an interrupted append
+            raw = raw[:len(raw) - len(raw) % HISTORY_RECORD.size]
+            if not raw:
+                return
+            for request_id, state_code, when in HISTORY_RECORD.iter_unpack(raw):
+                if code is not None and state_code != code:
+                    continue
+                title, key_project = (keys[request_id] if request_id < len(keys) else None) or (None, None)
+                if project is not None and key_project != project:
+                    continue
+                state_name = REQUEST_STATES[state_code] if state_code != REMOVED_CODE else 'removed'
+                yield {'title': title, 'project': key_project, 'state': state_name,
+                       'time_utc': HISTORY_EPOCH + timedelta(seconds=when)}
+
+def export_dataset(store, dataset, project=None, state=None):
+    """Rows of a dataset of store, filtered like filter_requests where the filter applies"""
+    if dataset == 'requests':
+        return request_rows(store.query_requests(project=project, state=state))
+    elif dataset == 'timelines':
+        return timeline_rows(store.index, project)
+    elif dataset == 'divergences':
+        return divergence_rows(store.get().get('divergences') or [], project)
+    return history_rows(store.history, project, state)
+
+def open_output(path, newline=None):
+    """Open a file argument for writing, '-' meaning stdout"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdout)
+    return open(path, 'w', encoding='utf-8', newline=newline)
+
+def chunked(rows, columns):
+    """Lists of up to EXPORT_CHUNK rows as tuples of the selected columns"""
+    select = operator.itemgetter(*columns)
+    if len(columns) == 1:
+        column = columns[0]
+        select = lambda row: (row[column],)
+    rows = iter(rows)
+    while True:
+        chunk = [select(row) for row in itertools.islice(rows, EXPORT_CHUNK)]
+        if not chunk:
+            return
+        yield chunk
+
+def write_csv(path, columns, types, chunks):
+    flags = [n for n, column in enumerate(columns) if types[column] == 'bool']
+    with open_output(path, newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        count = 0
+        for chunk in chunks:
+            # Flags are written as in the YAML file
+            for n in flags:
+                chunk = [row[:n] + (encode_flag(row[n]),) + row[n + 1:] for row in chunk]
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+def write_jsonl(path, columns, types, chunks):
+    with open_output(path) as stream:
+        count = 0
+        for chunk in chunks:
+            stream.write(''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n'
+                                 for row in chunk))
+            count += len(chunk)
+    return count
+
+def write_arrow(path, columns, types, chunks, parquet=True):
+    pa = importlib.import_module('pyarrow')
+    schema = pa.schema([(column, ARROW_TYPES[types[column]](pa)) for column in columns])
+    if parquet:
+        writer = importlib.import_module('pyarrow.parquet').ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    count = 0
+    with writer:
+        for chunk in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            count += len(chunk)
+    return count
+
+def write_xlsx(path, columns, types, chunks, title='export'):
+    # Write-only workbooks stream rows to a temporary file instead of keeping cells
+    book = importlib.import_module('openpyxl').Workbook(write_only=True)
+    sheet = None
+    # A full sheet, so the first row opens one
+    sheet_rows = XLSX_MAX_ROWS
+    count = 0
+    for chunk in chunks:
+        for row in chunk:
+            if sheet_rows == XLSX_MAX_ROWS:
+                sheet = book.create_sheet(title if sheet is None else f"{title} {len(book.worksheets) + 1}")
+                sheet.append(columns)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+        count += len(chunk)
+    if sheet is None:
+        book.create_sheet(title).append(columns)
+    book.save(path)
+    return count
+
+EXPORT_WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_arrow,
+    'arrow': functools.partial(write_arrow, parquet=False),
+    'xlsx': write_xlsx,
+}
+# Optional module each format needs, with its pip package
+EXPORT_MODULES = {'parquet': 'pyarrow', 'arrow': 'pyarrow', 'xlsx': 'openpyxl'}
+
+def export_format(path, fmt=None):
+    """Format given, or the one implied by the file extension, CSV otherwise"""
+    return fmt or EXPORT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+def export_available(fmt):
+    """Whether the library a format needs is installed"""
+    if fmt not in EXPORT_MODULES:
+        return True
+    try:
+        importlib.import_module(EXPORT_MODULES[fmt])
+    except ImportError:
+        return False
+    return True
+
+def export_report(store, dataset, path, fmt, columns=None, project=None, state=None):
+    """Stream a dataset into a file, returning the number of rows written"""
+    types = EXPORT_COLUMNS[dataset]
+    columns = list(columns or types)
+    unknown = [column for column in columns if column not in types]
+    if unknown:
+        raise ValueError(f"Unknown column(s) {', '.join(unknown)} for {dataset}, "
+                         f"choose from {', '.join(types)}")
+    if not export_available(fmt):
+        raise ValueError(f"{fmt} export needs {EXPORT_MODULES[fmt]} (pip install {EXPORT_MODULES[fmt]})")
+    if path == '-' and fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"{fmt} export needs an output file")
+
+    writer = EXPORT_WRITERS[fmt]
+    if fmt == 'xlsx':
+        writer = functools.partial(writer, title=dataset)
+    with span('export', dataset=dataset, format=fmt):
+        return writer(path, columns, types, chunked(export_dataset(store, dataset, project, state), columns))
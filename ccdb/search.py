@@ -0,0 +1,267 @@
+"""Full-text search and type-ahead picker indexes over change requests"""
+import os
+import bisect
+import heapq
+import math
+import re
+
+# ------------------ SEARCH ------------------
+# Request bodies carry structured tags such as "[BCC : BswLib, Rte, EbOs]",
+# ticket ids ("RQONE04630550") and references like "CC : CONFIG / <branch>; 0".
+# These are indexed as bcc:, ticket: and ref: terms next to the plain words.
+
+SEARCH_FIELDS = {'title', 'body', 'project'}
+BCC_TAG_PATTERN = re.compile(r'\[\s*BCC\s*:([^\]]*)\]', re.IGNORECASE)
+BCC_TAKEOVER_PATTERN = re.compile(r'\bBCC?\s*:\s*([A-Za-z]\w*)', re.IGNORECASE)
+TICKET_PATTERN = re.compile(r'\bRQONE\d+', re.IGNORECASE)
+REFERENCE_PATTERN = re.compile(r'([\w.\-]+)\s*/\s*([\w.\-]+)')
+WORD_PATTERN = re.compile(r'\w[\w.\-]*\w|\w')
+
+def search_terms(req):
+    """Extract the searchable terms of a change request"""
+    text = f"{req.get('title', '')} {req.get('body', '')}"
+    terms = {w for w in WORD_PATTERN.findall(text.lower()) if len(w) > 1}
+
+    for tag in BCC_TAG_PATTERN.findall(text):
+        for part in tag.split(','):
+            name = re.search(r'[A-Za-z]\w*', part)
+            if name:
+                terms.add('bcc:' + name.group().lower())
+    for name in BCC_TAKEOVER_PATTERN.findall(text):
+        terms.add('bcc:' + name.lower())
+    for ticket in TICKET_PATTERN.findall(text):
+        terms.add('ticket:' + ticket.lower())
+    for element, version in REFERENCE_PATTERN.findall(text):
+        terms.add('ref:' + element.lower())
+        terms.add('ref:' + version.lower())
+    return terms
+
+class SearchIndex:
+    """Inverted index from search terms to request keys"""
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+
+    def add(self, key, req):
+        terms = search_terms(req)
+        self.documents[key] = terms
+        for term in terms:
+            self.postings.setdefault(term, set()).add(key)
+
+    def remove(self, key):
+        for term in self.documents.pop(key, ()):
+            keys = self.postings[term]
+            keys.discard(key)
+            if not keys:
+                del self.postings[term]
+
+    def lookup(self, query):
+        """Keys of requests containing all query terms
+
+        Terms are plain words or field:value pairs with field bcc, ticket or ref.
+        """
+        terms = []
+        for part in query.split():
+            field, sep, value = part.partition(':')
+            if sep and field.lower() in ('bcc', 'ticket', 'ref'):
+                terms.append(f"{field.lower()}:{value.lower()}")
+            else:
+                terms.extend(w for w in WORD_PATTERN.findall(part.lower()))
+        if not terms:
+            return set()
+
+        postings = sorted((self.postings.get(term, set()) for term in terms), key=len)
+        result = set(postings[0])
+        for keys in postings[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+# ------------------ TYPE-AHEAD PICKER ------------------
+# Record selection for long lists: the user types and only the best
+# PICKER_TOP_K matches are drawn. Typed terms are looked up in the vocabulary
+# (exact word, prefix, substring, then trigram similarity for typos), so a
+# keystroke costs the size of the matching vocabulary, not of the list.
+
+PICKER_TOP_K = max(1, int(os.environ.get('CCDB_PICKER_TOP_K', '10')))
+PICKER_FALLBACK_LIMIT = 50     # choices offered when no raw terminal is available
+PICKER_SCAN_THRESHOLD = 2000   # terms in more records than this are matched by scanning
+PICKER_RANK_LIMIT = 5000       # above this, candidates are ranked by the first term only
+PICKER_SIMILARITY = 0.6        # Dice coefficient of trigrams for a similar word
+
+def word_grams(word):
+    """Trigrams of a word"""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+class PickerIndex:
+    """Postings of the words of each record and a trigram index of the vocabulary
+
+    Selective terms are resolved through the vocabulary. Terms found in many
+    records are matched by scanning the records in order, which stops after
+    a screenful since nearly every record matches.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.records = {}
+        self.order = {}
+        self.texts = {}
+        self.postings = {}
+        self.grams = {}
+        self._vocabulary = None
+        self._ordered = None
+
+    @classmethod
+    def build(cls, fields, records):
+        """Index a list, records are identified by their position"""
+        picker = cls(fields)
+        for position, record in enumerate(records):
+            picker.add(position, record, position)
+        return picker
+
+    def add(self, item_id, record, order):
+        text = ' '.join(str(record.get(field) or '') for field in self.fields).lower()
+        self.records[item_id] = record
+        self.order[item_id] = order
+        self.texts[item_id] = text
+        self._ordered = None
+        for word in set(WORD_PATTERN.findall(text)):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                for gram in word_grams(word):
+                    self.grams.setdefault(gram, set()).add(word)
+                self._vocabulary = None
+            ids.add(item_id)
+
+    def remove(self, item_id):
+        if item_id not in self.records:
+            return
+        del self.records[item_id], self.order[item_id]
+        self._ordered = None
+        for word in set(WORD_PATTERN.findall(self.texts.pop(item_id))):
+            ids = self.postings[word]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[word]
+                for gram in word_grams(word):
+                    words = self.grams[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.grams[gram]
+                self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        """Sorted words for prefix lookups, rebuilt after the vocabulary changed"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    @property
+    def ordered(self):
+        """Record ids in list order, rebuilt after changes"""
+        if self._ordered is None:
+            self._ordered = sorted(self.records, key=self.order.__getitem__)
+        return self._ordered
+
+    def _prefixed(self, term):
+        """Vocabulary words starting with a typed term, lazily"""
+        vocabulary = self.vocabulary
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + '\uffff', start)
+        return (vocabulary[i] for i in range(start, end))
+
+    def _containing(self, term):
+        """Vocabulary words containing a term other than at their start"""
+        grams = word_grams(term)
+        if not grams:
+            return []
+        # Only words holding the rarest trigram can contain the term
+        rarest = min((self.grams.get(gram, ()) for gram in grams), key=len)
+        return [word for word in rarest if term in word and not word.startswith(term)]
+
+    def _similar_words(self, term):
+        """Words sharing most trigrams with a term, for typos"""
+        grams = word_grams(term)
+        # A similar word shares at least `needed` trigrams, so it holds one
+        # of any len(grams) - needed + 1 of them: take the rarest
+        needed = max(1, math.ceil(PICKER_SIMILARITY * len(grams) / (2 - PICKER_SIMILARITY)))
+        pool = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+        candidates = set().union(*pool[:len(grams) - needed + 1])
+        # Much longer words cannot reach the similarity
+        longest = len(grams) * (2 - PICKER_SIMILARITY) / PICKER_SIMILARITY + 2
+        return [word for word in candidates if len(word) <= longest and
+                2 * len(grams & word_grams(word)) / (len(grams) + len(word) - 2) >= PICKER_SIMILARITY]
+
+    def _records_of(self, words):
+        return set().union(*(self.postings[word] for word in words))
+
+    def _is_common(self, words):
+        total = 0
+        for word in words:
+            total += len(self.postings[word])
+            if total > PICKER_SCAN_THRESHOLD:
+                return True
+        return False
+
+    def _scan(self, terms, limit):
+        """First records in list order containing every term"""
+        result = []
+        texts = self.texts
+        for item_id in self.ordered:
+            text = texts[item_id]
+            if all(term in text for term in terms):
+                result.append(item_id)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def search(self, query, limit):
+        """Ids of the best matches for all terms of a query, ties in list order
+
+        Per term, records with the exact word rank before those with a word
+        starting with it, then those containing it, then similar words.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return self.ordered[:limit]
+
+        if all(self._is_common(self._prefixed(term)) or self._is_common(self._containing(term))
+               for term in terms):
+            result = self._scan(terms, limit)
+            if len(result) >= limit:
+                return result
+
+        term_tiers = []
+        candidates = None
+        for term in terms:
+            exact = set(self.postings.get(term, ()))
+            found = self._records_of(self._prefixed(term))
+            tiers = [exact, found - exact, self._records_of(self._containing(term)) - found]
+            found |= tiers[2]
+            if len(found) < limit and len(term) >= 4:
+                tiers.append(self._records_of(self._similar_words(term)) - found)
+            term_tiers.append(tiers)
+            matched = set().union(*tiers)
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        if len(candidates) <= PICKER_RANK_LIMIT:
+            def rank(item_id):
+                tier_sum = sum(next(n for n, tier in enumerate(tiers) if item_id in tier)
+                               for tiers in term_tiers)
+                return (tier_sum, self.order[item_id])
+            return heapq.nsmallest(limit, candidates, key=rank)
+
+        # Unselective query: the tiers of the first term decide
+        result = []
+        for tier in term_tiers[0]:
+            result += heapq.nsmallest(limit - len(result), tier & candidates,
+                                      key=self.order.__getitem__)
+            if len(result) >= limit:
+                break
+        return result
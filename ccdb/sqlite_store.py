@@ -0,0 +1,425 @@
+"""Optional SQLite storage backend with the ConfigStore interface"""
+import os
+import json
+import yaml
+import sys
+from collections import deque
+
+from .changes import ConfigIndex, ConflictError, find_conflict, op_set_integration
+from .dashboard import write_dashboard
+from .files import FileLock, write_atomic
+from .history import StateHistory
+from .profiling import span, tally
+from .records import RECORD_TYPES, tagged_json, untag_json
+from .store import BatchSession, CONFIG_FILE, ConfigStore, HISTORY_SUFFIX, LOCK_SUFFIX, RecordDumper
+from .terminal import console
+from .validation import check_before_write
+
+# Optional SQLite backend, selected with --backend sqlite or CCDB_BACKEND=sqlite
+DB_FILE = "config.db"
+
+# ------------------ SQLITE STORAGE ------------------
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    pos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT,
+    freeze_date TEXT,
+    commonconfig TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS change_requests (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    body TEXT,
+    project TEXT,
+    state TEXT,
+    created TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS divergences (
+    id INTEGER PRIMARY KEY,
+    project TEXT,
+    reason TEXT,
+    date TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS project_filters (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name);
+CREATE INDEX IF NOT EXISTS idx_requests_project_state ON change_requests(project, state);
+CREATE INDEX IF NOT EXISTS idx_requests_created ON change_requests(created);
+CREATE INDEX IF NOT EXISTS idx_requests_title ON change_requests(title);
+CREATE INDEX IF NOT EXISTS idx_divergences_project ON divergences(project);
+"""
+
+# Record sections with their columns; any other key is kept in 'extra'
+SQLITE_TABLES = {
+    'projects': ('name', 'start_date', 'end_date', 'freeze_date', 'commonconfig'),
+    'change_requests': ('title', 'body', 'project', 'state', 'created'),
+    'divergences': ('project', 'reason', 'date'),
+}
+
+# Columns identifying a record, matched by save() to find the rows it changed
+SQLITE_KEYS = {
+    'projects': ('name',),
+    'change_requests': ('title', 'project'),
+    'divergences': ('project', 'reason', 'date'),
+}
+
+# Change target mapping -> (table, key condition)
+SQLITE_TARGETS = {
+    'projects': ('projects', "name = ?"),
+    'requests': ('change_requests', "title = ? AND project IS ?"),
+    'divergences': ('divergences', "project = ? AND reason = ? AND date IS ?"),
+}
+
+class SqliteStore(BatchSession):
+    """Configuration kept in a local SQLite file with the ConfigStore interface
+
+    Records live in indexed tables so filters and edits are single queries.
+    compact() exports the database back to the YAML file read by index.html.
+    Each write is one short IMMEDIATE transaction; when another connection
+    committed since our copy was loaded (PRAGMA data_version), changed
+    records are checked for conflicts before our changes are applied.
+    """
+
+    def __init__(self, path, yaml_path):
+        import sqlite3
+        self.path = path
+        self.yaml_path = yaml_path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SQLITE_SCHEMA)
+        self._data = None
+        self._index = None
+        self._version = None
+        self.lock = FileLock(path + LOCK_SUFFIX)
+        self.history = StateHistory(yaml_path + HISTORY_SUFFIX)
+
+    # Row <-> record conversion
+
+    def _row_to_record(self, table, row):
+        record = {}
+        for column in SQLITE_TABLES[table]:
+            if row[column] is not None:
+                record[column] = row[column]
+        if row['extra']:
+            record.update(json.loads(row['extra'], object_hook=untag_json))
+        return RECORD_TYPES[table](record)
+
+    def _record_values(self, table, record):
+        columns = SQLITE_TABLES[table]
+        extra = {k: v for k, v in record.items() if k not in columns}
+        return [record.get(c) for c in columns] + [json.dumps(extra, default=tagged_json) if extra else None]
+
+    def _insert(self, table, records):
+        columns = SQLITE_TABLES[table] + ('extra',)
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        self.db.executemany(sql, (self._record_values(table, r) for r in records))
+
+    def _update(self, table, where, params, changes):
+        columns = SQLITE_TABLES[table]
+        row = self.db.execute(f"SELECT * FROM {table} WHERE {where} ORDER BY id LIMIT 1",
+                              params).fetchone()
+        if row is None:
+            return
+        record = self._row_to_record(table, row)
+        record.update(changes)
+        assignments = ', '.join(f"{c} = ?" for c in columns + ('extra',))
+        self.db.execute(f"UPDATE {table} SET {assignments} WHERE id = ?",
+                        self._record_values(table, record) + [row['id']])
+
+    # Whole-document access
+
+    def import_config(self, config):
+        """Replace the database content with a parsed configuration"""
+        with self.db:
+            self._import(config)
+        self._data = None
+
+    def _import(self, config):
+        for table in ('meta', 'project_filters', *SQLITE_TABLES):
+            self.db.execute(f"DELETE FROM {table}")
+        for pos, (key, value) in enumerate(config.items()):
+            if key in SQLITE_TABLES or key == 'project_filters':
+                # Section placeholder keeps the key order for export
+                self.db.execute("INSERT INTO meta VALUES (?, NULL, ?)", (key, pos))
+            else:
+                self.db.execute("INSERT INTO meta VALUES (?, ?, ?)", (key, json.dumps(value, default=tagged_json), pos))
+        for table in SQLITE_TABLES:
+            self._insert(table, config.get(table) or [])
+        self.db.executemany("INSERT INTO project_filters (name) VALUES (?)",
+                            ((name,) for name in config.get('project_filters') or []))
+
+    def export_config(self):
+        """Build the configuration document from the database"""
+        config = {}
+        for row in self.db.execute("SELECT key, value FROM meta ORDER BY pos"):
+            if row['value'] is not None:
+                config[row['key']] = json.loads(row['value'], object_hook=untag_json)
+            elif row['key'] == 'project_filters':
+                config['project_filters'] = [
+                    r['name'] for r in self.db.execute("SELECT name FROM project_filters ORDER BY id")
+                ]
+            else:
+                table = row['key']
+                config[table] = [
+                    self._row_to_record(table, r)
+                    for r in self.db.execute(f"SELECT * FROM {table} ORDER BY id")
+                ]
+        return config
+
+    def _data_version(self):
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self):
+        """Return the configuration, rebuilding it only after database changes"""
+        if self._pending is not None:
+            return self._data
+        version = self._data_version()
+        if self._data is None or version != self._version:
+            with span('load', path=self.path):
+                self._data = self.export_config()
+            self._version = version
+        else:
+            tally('load.cached')
+        return self._data
+
+    @property
+    def index(self):
+        """Hash indexes over the cached configuration document"""
+        config = self.get()
+        if self._index is None or self._index.config is not config:
+            self._index = ConfigIndex(config)
+        return self._index
+
+    def save(self, data):
+        """Save a whole configuration row by row, refusing if the database changed since it was loaded"""
+        check_before_write(self._index if self._index is not None and self._index.config is data
+                           else ConfigIndex(data))
+        with self.lock, self.db, span('save', path=self.path):
+            self.db.execute("BEGIN IMMEDIATE")
+            if self._version is not None and self._data_version() != self._version:
+                raise ConflictError([f"{self.path} was changed by someone else since it was loaded"])
+            self._sync(data)
+        self._data = data
+        self.compact()
+
+    def _sync(self, config):
+        """Bring the database to a parsed configuration with per-row statements
+
+        Rows are matched to records by their SQLITE_KEYS columns; only rows
+        whose values differ are updated and only unmatched ones deleted or
+        inserted, so saving a small edit does not rewrite every table.
+        """
+        meta = {}
+        for pos, (key, value) in enumerate(config.items()):
+            sectioned = key in SQLITE_TABLES or key == 'project_filters'
+            meta[key] = (None if sectioned else json.dumps(value, default=tagged_json), pos)
+        current = {row['key']: (row['value'], row['pos'])
+                   for row in self.db.execute("SELECT key, value, pos FROM meta")}
+        self.db.executemany("DELETE FROM meta WHERE key = ?",
+                            ((key,) for key in current.keys() - meta.keys()))
+        self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)",
+                            ((key, *row) for key, row in meta.items() if current.get(key) != row))
+
+        filters = list(config.get('project_filters') or [])
+        if filters != [row['name'] for row in
+                       self.db.execute("SELECT name FROM project_filters ORDER BY id")]:
+            self.db.execute("DELETE FROM project_filters")
+            self.db.executemany("INSERT INTO project_filters (name) VALUES (?)",
+                                ((name,) for name in filters))
+
+        for table, columns in SQLITE_TABLES.items():
+            columns = columns + ('extra',)
+            key_columns = [columns.index(c) for c in SQLITE_KEYS[table]]
+            # Rows sharing a key are matched in id order
+            rows = {}
+            for row in self.db.execute(f"SELECT * FROM {table} ORDER BY id"):
+                rows.setdefault(tuple(row[c] for c in SQLITE_KEYS[table]), deque()).append(row)
+            inserts, updates = [], []
+            for record in config.get(table) or []:
+                values = self._record_values(table, record)
+                matches = rows.get(tuple(values[i] for i in key_columns))
+                if not matches:
+                    inserts.append(record)
+                    continue
+                row = matches.popleft()
+                if values != [row[c] for c in columns]:
+                    updates.append(values + [row['id']])
+            deletes = [(row['id'],) for matches in rows.values() for row in matches]
+            tally('sqlite.rows', len(inserts) + len(updates) + len(deletes))
+            self.db.executemany(f"DELETE FROM {table} WHERE id = ?", deletes)
+            assignments = ', '.join(f"{c} = ?" for c in columns)
+            self.db.executemany(f"UPDATE {table} SET {assignments} WHERE id = ?", updates)
+            self._insert(table, inserts)
+
+    def compact(self):
+        """Export the database to the YAML file and the dashboard feed"""
+        config = self.get()
+        with span('save.dump'):
+            raw = yaml.dump(config, Dumper=RecordDumper, sort_keys=False).encode('utf-8')
+        write_atomic(self.yaml_path, raw)
+        write_dashboard(config)
+        self.dashboard_stale = False
+
+    def _discard(self):
+        self._data = self._index = None
+
+    # Single changes
+
+    def apply(self, op, **args):
+        """Apply a single change to the database and the cached document"""
+        # Indexes over the copy the user saw, not a reload: _write() checks for newer versions
+        index = None
+        if self._data is not None:
+            if self._index is None or self._index.config is not self._data:
+                self._index = ConfigIndex(self._data)
+            index = self._index
+        self._submit(index, op, args)
+
+    def _write(self, changes, batch=False):
+        """Run the SQL of the changes in one write transaction"""
+        if self._data is not None:
+            self._check(self._index, changes, batch)
+        applied, conflicts = [], []
+        with self.db, span('save', path=self.path, changes=len(changes)):
+            self.db.execute("BEGIN IMMEDIATE")
+            stale = self._data_version() != self._version
+            for change in changes:
+                op, args, _, base = change
+                if base is not None and stale:
+                    conflict = find_conflict(base, self._fetch_target(base[0]))
+                    if conflict:
+                        conflicts.append(conflict)
+                        continue
+                getattr(self, '_sql_' + op)(**args)
+                applied.append(change)
+        if stale or conflicts:
+            # The cached copy misses other writers' changes or holds rejected ones
+            self._data = self._index = None
+        if batch and applied:
+            self.compact()
+        elif applied:
+            self.dashboard_stale = True
+        self._settle(applied, conflicts)
+
+    def _fetch_target(self, target):
+        mapping, key, _ = target
+        table, where = SQLITE_TARGETS[mapping]
+        params = key if isinstance(key, tuple) else (key,)
+        row = self.db.execute(f"SELECT * FROM {table} WHERE {where} ORDER BY id LIMIT 1", params).fetchone()
+        return dict(self._row_to_record(table, row)) if row is not None else None
+
+    def _sql_add_project(self, project):
+        self._ensure_section('projects')
+        self._insert('projects', [project])
+
+    def _sql_edit_project(self, name, changes):
+        self._update('projects', "name = ?", (name,), changes)
+
+    def _sql_remove_projects(self, names):
+        self.db.executemany("DELETE FROM projects WHERE name = ?", ((n,) for n in names))
+
+    def _sql_add_request(self, request):
+        self._ensure_section('change_requests')
+        self._insert('change_requests', [request])
+
+    def _sql_edit_request(self, key, changes):
+        self._update('change_requests', "title = ? AND project IS ?", tuple(key), changes)
+
+    def _sql_change_request_state(self, key, state):
+        # Like the in-memory operation, only the first request with the key changes
+        self.db.execute("UPDATE change_requests SET state = ? WHERE id = (SELECT id FROM change_requests "
+                        "WHERE title = ? AND project IS ? ORDER BY id LIMIT 1)", (state, *key))
+
+    def _sql_set_integration(self, key, target, status, pver=None):
+        row = self.db.execute("SELECT * FROM change_requests WHERE title = ? AND project IS ? "
+                              "ORDER BY id LIMIT 1", tuple(key)).fetchone()
+        if row is None:
+            return
+        record = self._row_to_record('change_requests', row)
+        op_set_integration(ConfigIndex({'change_requests': [record]}), key, target, status, pver)
+        self._update('change_requests', "id = ?", (row['id'],), {'integration': record['integration']})
+
+    def _sql_remove_requests(self, keys):
+        self.db.executemany("DELETE FROM change_requests WHERE title = ? AND project IS ?",
+                            (tuple(k) for k in keys))
+
+    def _sql_add_divergence(self, divergence):
+        self._ensure_section('divergences')
+        self._insert('divergences', [divergence])
+
+    def _sql_edit_divergence(self, key, changes):
+        self._update('divergences', "project = ? AND reason = ? AND date IS ?", tuple(key), changes)
+
+    def _sql_remove_divergences(self, keys):
+        self.db.executemany("DELETE FROM divergences WHERE project = ? AND reason = ? AND date IS ?",
+                            (tuple(k) for k in keys))
+
+    def _ensure_section(self, key):
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES (?, NULL, "
+                        "(SELECT COALESCE(MAX(pos), -1) + 1 FROM meta))", (key,))
+
+    # Queries
+
+    def find_requests(self, selectors):
+        """Requests matching (title, project) selectors, looked up by the title index"""
+        for title, project in selectors:
+            if project is None:
+                rows = self.db.execute("SELECT * FROM change_requests WHERE title = ? ORDER BY id",
+                                       (title,))
+            else:
+                rows = self.db.execute("SELECT * FROM change_requests "
+                                       "WHERE title = ? AND project IS ? ORDER BY id", (title, project))
+            for row in rows.fetchall():
+                yield self._row_to_record('change_requests', row)
+
+    def query_requests(self, project=None, state=None):
+        """Return change requests matching an optional project and state"""
+        clauses, params = [], []
+        if project is not None:
+            clauses.append("project = ?")
+            params.append(project)
+        if state is not None:
+            clauses.append("state = ?")
+            params.append(str(state))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(f"SELECT * FROM change_requests {where} ORDER BY id", params)
+        return [self._row_to_record('change_requests', r) for r in rows]
+
+def open_store(backend):
+    """Create the configuration store for the selected backend"""
+    if backend == 'sqlite':
+        if not os.path.exists(DB_FILE):
+            console.print(f"[bold red]Error:[/bold red] Database {DB_FILE} not found! "
+                          f"Run 'mgr.py migrate-sqlite' first.", style="red")
+            sys.exit(1)
+        return SqliteStore(DB_FILE, CONFIG_FILE)
+    return ConfigStore(CONFIG_FILE)
+
+def migrate_to_sqlite(force=False):
+    """One-shot migration of config.yaml into the SQLite database"""
+    if os.path.exists(DB_FILE) and not force:
+        console.print(f"[bold red]Error:[/bold red] {DB_FILE} already exists, use --force to overwrite")
+        sys.exit(1)
+    config = ConfigStore(CONFIG_FILE).get()
+    SqliteStore(DB_FILE, CONFIG_FILE).import_config(config)
+    console.print(f"[bold green]✓ Migrated {len(config.get('change_requests', []))} "
+                  f"request(s) to {DB_FILE}[/bold green]")
+
+def export_sqlite_to_yaml():
+    """Write the SQLite database back to config.yaml"""
+    open_store('sqlite').compact()
+    console.print(f"[bold green]✓ Exported {DB_FILE} to {CONFIG_FILE}[/bold green]")
@@ -0,0 +1,493 @@
+"""YAML configuration store with a change journal, parse snapshot and writer lock"""
+import os
+import time
+import contextlib
+import hashlib
+import json
+import marshal
+import yaml
+import sys
+
+from .changes import (
+    CHANGE_OPS, ConfigIndex, ConflictError, match_requests, merge_changes, rename_conflict,
+    snapshot_target
+)
+from .dashboard import write_dashboard
+from .files import FileLock, write_atomic
+from .hints import generate_integration_hints, HINTS_FILE
+from .history import record_transition, StateHistory
+from .profiling import COUNTER_SOURCES, span, tally
+from .records import Record, RECORD_TYPES, tag_dates, tagged_json, untag_dates, untag_json
+from .terminal import console
+from .validation import check_before_write, ValidationError
+
+CONFIG_FILE = "config.yaml"
+
+# Pending changes are appended here and folded into CONFIG_FILE on compaction
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAX_ENTRIES = 200
+JOURNAL_MAX_BYTES = 256 * 1024
+
+# Writers hold an advisory lock on this file for the few milliseconds of a write
+LOCK_SUFFIX = ".lock"
+
+# Binary copy of the parsed YAML snapshot, valid while the YAML content hash matches
+SNAPSHOT_SUFFIX = ".cache"
+SNAPSHOT_VERSION = 1
+
+# Changes after which integration_hints.md is regenerated
+HINT_OPS = {'add_request', 'edit_request', 'change_request_state', 'set_integration',
+            'remove_requests'}
+
+# Binary log of request state transitions, request ids are kept in HISTORY_SUFFIX + ".keys"
+HISTORY_SUFFIX = ".history"
+
+# libyaml bindings are several times faster when PyYAML was built with them
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
+class RecordDumper(YAML_DUMPER):
+    """YAML_DUMPER that also writes records, as the mappings they were loaded from
+
+    A subclass, so yaml.dump() elsewhere in the process is left as it was.
+    """
+
+for _record_type in RECORD_TYPES.values():
+    RecordDumper.add_representer(_record_type, lambda dumper, record: dumper.represent_dict(record.to_dict()))
+
+class BatchSession:
+    """Transaction support shared by the configuration stores
+
+    Between begin() and commit() changes are applied in memory only and
+    written with a single save; rollback() drops them. Every change carries
+    a copy of the record it was based on so _write() can merge it into a
+    version written by someone else in the meantime.
+    """
+    _pending = None
+    # Written changes that dashboard.json does not show yet
+    dashboard_stale = False
+
+    @property
+    def pending(self):
+        """Number of uncommitted changes, None outside a session"""
+        return len(self._pending) if self._pending is not None else None
+
+    def begin(self):
+        """Start collecting changes in memory"""
+        if self._pending is None:
+            self.get()
+            self._pending = []
+
+    def _submit(self, index, op, args):
+        """Apply a change to the in-memory copy and write it unless a session holds it"""
+        base = None
+        if index is not None:
+            conflict = rename_conflict(index, op, args)
+            if conflict:
+                raise ConflictError([conflict])
+            base = snapshot_target(index, op, args)
+        change = (op, args, int(time.time()), base)
+        if index is not None:
+            CHANGE_OPS[op](index, **args)
+        if self._pending is not None:
+            self._pending.append(change)
+        else:
+            self._write([change])
+
+    def commit(self):
+        """Write all changes of the session at once, returning their count"""
+        pending, self._pending = self._pending, None
+        if pending:
+            try:
+                self._write(pending, batch=True)
+            except ValidationError:
+                # The session stays open, so the errors can be fixed before committing again
+                self._pending = pending
+                raise
+        return len(pending or ())
+
+    def rollback(self):
+        """Discard all changes of the session, returning their count"""
+        pending, self._pending = self._pending, None
+        if pending:
+            self._discard()
+        return len(pending or ())
+
+    def flush_dashboard(self):
+        """Rewrite dashboard.json if journaled changes are missing from it
+
+        Journal appends only mark the feed stale, since rebuilding it costs
+        as much as the whole configuration. The menus and the daemon flush it
+        between user actions.
+        """
+        if self.dashboard_stale and self._pending is None:
+            write_dashboard(self.get())
+            self.dashboard_stale = False
+
+    def _check(self, index, changes, batch):
+        """Validate what is about to be written, see check_before_write()"""
+        try:
+            check_before_write(index, changes)
+        except ValidationError:
+            if not batch:
+                self._discard()
+            raise
+
+    def _settle(self, applied, conflicts):
+        """Log the state transitions of written changes, refresh the hints and report the rest"""
+        with self.lock:
+            try:
+                for op, args, when, _ in applied:
+                    record_transition(self.history, op, args, when)
+            except OSError as error:
+                # The changes are written already, a lost log entry must not undo that
+                console.print(f"[bold yellow]Warning:[/bold yellow] State history not updated ({error})")
+        # Only written changes reach the hints, never those a session still holds
+        if any(op in HINT_OPS for op, _, _, _ in applied):
+            try:
+                generate_integration_hints(self.get())
+            except Exception as error:
+                # Like the history, a stale hints file must not hide the write or its conflicts
+                console.print(f"[bold yellow]Warning:[/bold yellow] {HINTS_FILE} not updated ({error})")
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Commit the changes of a with-block, or roll them back on error"""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+class ConfigStore(BatchSession):
+    """Parsed configuration kept in memory and reloaded only when the file changes
+
+    Single changes are appended to a journal next to the YAML file instead of
+    rewriting it; the journal is replayed on load and folded back into the
+    YAML snapshot once it grows past JOURNAL_MAX_ENTRIES or JOURNAL_MAX_BYTES.
+
+    Several processes may share the files. Reads take no lock. Writes hold
+    the lock file only while they write; if the files changed since they were
+    loaded, the changes are replayed on the new version record by record.
+    The 'revision' counter in the YAML file and the 'rev' of each journal
+    entry let readers skip entries that a concurrent compaction already
+    folded into the YAML file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.snapshot_path = path + SNAPSHOT_SUFFIX
+        self.lock = FileLock(path + LOCK_SUFFIX)
+        self._data = None
+        self._index = None
+        self._stamp = None
+        self._digest = None
+        self._journal_entries = 0
+        self._revision = 0
+        self._history = None
+
+    def _stat(self):
+        # The inode changes when another writer replaces a file
+        st = os.stat(self.path)
+        try:
+            jst = os.stat(self.journal_path)
+            journal = (jst.st_ino, jst.st_mtime_ns, jst.st_size)
+        except FileNotFoundError:
+            journal = None
+        return (st.st_ino, st.st_mtime_ns, st.st_size, journal)
+
+    def _read_journal(self):
+        try:
+            with open(self.journal_path, 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return b''
+
+    def get(self):
+        """Return the parsed configuration, re-parsing only if the file changed"""
+        # A session owns the in-memory copy until it is committed or rolled back
+        if self._pending is not None:
+            return self._data
+        try:
+            stamp = self._stat()
+        except FileNotFoundError:
+            console.print(f"[bold red]Error:[/bold red] Configuration file {self.path} not found!", style="red")
+            sys.exit(1)
+
+        if self._data is not None and stamp == self._stamp:
+            tally('load.cached')
+            return self._data
+
+        with span('load', path=self.path):
+            with open(self.path, 'rb') as file:
+                raw = file.read()
+            journal = self._read_journal()
+            snapshot_digest = hashlib.sha1(raw).hexdigest()
+            digest = (snapshot_digest, hashlib.sha1(journal).hexdigest())
+
+            # A touched but unchanged file only refreshes the stamp
+            if self._data is None or digest != self._digest:
+                with span('load.snapshot'):
+                    config = load_snapshot(self.snapshot_path, snapshot_digest, len(raw))
+                if config is None:
+                    with span('load.parse', bytes=len(raw)):
+                        config = yaml.load(raw, Loader=YAML_LOADER)
+                    write_snapshot(self.snapshot_path, snapshot_digest, len(raw), config)
+                with span('load.index'):
+                    self._index = ConfigIndex(config)
+                    self._journal_entries, self._revision = replay_journal(
+                        self._index, journal, config.get('revision', 0))
+                self._data = self._index.config
+                self._digest = digest
+            self._stamp = stamp
+        return self._data
+
+    def apply(self, op, **args):
+        """Apply a single change in memory and append it to the journal"""
+        # The copy the user saw, not a reload: _write() merges with newer versions
+        self._submit(self._index if self._data is not None else self.index, op, args)
+
+    def _write(self, changes, batch=False):
+        """Merge changes into the files under the writer lock"""
+        # The in-memory copy already holds the changes, so other writers need
+        # not wait for their validation, nor for the YAML dump of a session
+        self._check(self._index, changes, batch)
+        raw = self._dump(self._data) if batch else None
+        with self.lock:
+            if self._stat() == self._stamp:
+                # Nobody else wrote
+                applied, conflicts = changes, []
+            else:
+                self._data = None
+                applied, conflicts = merge_changes(self.index, changes)
+                # The dump no longer matches, _save() redoes it from the merged version
+                raw = None
+                if applied:
+                    # Merged into someone else's version, checked again on it
+                    self._check(self._index, applied, batch)
+
+            if batch:
+                if applied:
+                    raw = self._save(self._data, raw)
+            elif applied:
+                tally('journal.entries', len(applied))
+                lines = []
+                for op, args, _, _ in applied:
+                    self._revision += 1
+                    lines.append(json.dumps({'op': op, 'args': args, 'rev': self._revision},
+                                            default=tagged_json) + '\n')
+                with open(self.journal_path, 'a') as file:
+                    file.write(''.join(lines))
+                self._journal_entries += len(lines)
+                self.dashboard_stale = True
+                self._stamp = self._stat()
+                # Journal content is not hashed again, the stamp covers our own append
+                self._digest = None
+
+        if batch and applied:
+            self._publish(raw)
+        elif applied and (self._journal_entries >= JOURNAL_MAX_ENTRIES or
+                          self._stamp[3][2] >= JOURNAL_MAX_BYTES):
+            self.compact()
+        self._settle(applied, conflicts)
+
+    def compact(self):
+        """Fold pending journal entries into the YAML snapshot"""
+        if self._data is None:
+            return
+        # Also folds entries other writers appended since our last read
+        if self._pending is None:
+            self.get()
+        if not self._journal_entries:
+            return
+        raw = self._dump(self._data)
+        with self.lock:
+            if self._pending is None and self._stat() != self._stamp:
+                # Someone wrote since the dump, fold their entries too
+                self.get()
+                raw = None
+                if not self._journal_entries:
+                    return
+            raw = self._save(self._data, raw)
+        self._publish(raw)
+
+    def _discard(self):
+        self._data = self._index = self._digest = None
+
+    def save(self, data):
+        """Write the full configuration and drop the journal it supersedes"""
+        check_before_write(self._index if self._index is not None and self._index.config is data
+                           else ConfigIndex(data))
+        raw = self._dump(data)
+        with self.lock:
+            try:
+                stamp = self._stat()
+            except FileNotFoundError:
+                stamp = None
+            if self._stamp is not None and stamp != self._stamp:
+                raise ConflictError([f"{self.path} was changed by someone else since it was loaded"])
+            self._save(data, raw)
+        self._publish(raw)
+
+    def _dump(self, data):
+        """YAML file content of data as the next revision
+
+        Dumped before the writer lock is taken: at 20k requests this is the
+        bulk of a save.
+        """
+        data['revision'] = self._revision + 1
+        with span('save.dump'):
+            return yaml.dump(data, Dumper=RecordDumper, sort_keys=False).encode('utf-8')
+
+    def _save(self, data, raw=None):
+        """Replace the YAML file with data under the writer lock, returning its content
+
+        raw is the _dump() of data if nobody wrote since it was taken. The
+        snapshot and dashboard.json follow in _publish() after the lock.
+        """
+        with span('save', path=self.path):
+            if raw is None:
+                raw = self._dump(data)
+            self._revision = data['revision']
+            write_atomic(self.path, raw)
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+            self._data = data
+            self._digest = (hashlib.sha1(raw).hexdigest(), hashlib.sha1(b'').hexdigest())
+            self._journal_entries = 0
+            self._stamp = self._stat()
+            self.dashboard_stale = True
+        return raw
+
+    def _publish(self, raw):
+        """Write the parse snapshot and dashboard.json of a save, outside the writer lock"""
+        # The snapshot is keyed to the YAML content and the dashboard rebuilt
+        # from the current file, so a newer save by someone else is never
+        # mistaken for ours
+        write_snapshot(self.snapshot_path, self._digest[0], len(raw), self._data)
+        self.flush_dashboard()
+
+    @property
+    def history(self):
+        """State transition log kept next to the YAML file"""
+        if self._history is None:
+            self._history = StateHistory(self.path + HISTORY_SUFFIX)
+        return self._history
+
+    @property
+    def index(self):
+        """Hash indexes over the current configuration"""
+        config = self.get()
+        if self._index is None or self._index.config is not config:
+            self._index = ConfigIndex(config)
+        return self._index
+
+    def query_requests(self, project=None, state=None):
+        """Return change requests matching an optional project and state"""
+        return self.index.select(project, state)
+
+    def find_requests(self, selectors):
+        """Requests matching (title, project) selectors, project None matching any"""
+        index = self.index
+        return (req for key in match_requests(index, selectors) for req in index.requests[key])
+
+# Per-process counters, shown by --timing
+SNAPSHOT_STATS = {'hits': 0, 'misses': 0, 'stale': 0, 'errors': 0, 'load_ms': 0.0}
+COUNTER_SOURCES['snapshot'] = SNAPSHOT_STATS
+
+def load_snapshot(path, digest, size):
+    """Return the cached parse of a YAML file, or None if it is missing or stale"""
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as file:
+            header = marshal.load(file)
+            if header != (SNAPSHOT_VERSION, digest, size):
+                SNAPSHOT_STATS['stale'] += 1
+                return None
+            encoding = marshal.load(file)
+            config = marshal.load(file)
+        if encoding == 'tagged':
+            config = untag_dates(config)
+        elif encoding != 'marshal':
+            raise ValueError(f"unknown snapshot encoding {encoding!r}")
+    except FileNotFoundError:
+        SNAPSHOT_STATS['misses'] += 1
+        return None
+    except (EOFError, ValueError, TypeError):
+        SNAPSHOT_STATS['errors'] += 1
+        return None
+    SNAPSHOT_STATS['hits'] += 1
+    SNAPSHOT_STATS['load_ms'] += (time.perf_counter() - started) * 1000
+    return config
+
+def plain_config(config):
+    """Shallow copy of a configuration with its records as plain dicts"""
+    plain = dict(config)
+    for section in RECORD_TYPES:
+        records = plain.get(section)
+        if records:
+            plain[section] = [r.to_dict() if isinstance(r, Record) else r for r in records]
+    return plain
+
+def write_snapshot(path, digest, size, config):
+    """Store the parsed configuration next to its YAML file"""
+    # Records are stored as the dicts they load from, so the snapshot does not
+    # depend on the module that defines them
+    config = plain_config(config)
+    # Only marshal is used: unlike pickle, loading it cannot run code from a
+    # tampered cache file. Dates are tagged as strings; anything else marshal
+    # cannot store means no snapshot, and the next load parses the YAML.
+    try:
+        payload = (marshal.dumps('marshal'), marshal.dumps(config))
+    except ValueError:
+        try:
+            payload = (marshal.dumps('tagged'), marshal.dumps(tag_dates(config)))
+        except ValueError:
+            return
+    # Written outside the writer lock, so concurrent writers need their own file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(marshal.dumps((SNAPSHOT_VERSION, digest, size)))
+            file.write(payload[0])
+            file.write(payload[1])
+        os.replace(temp_path, path)
+    except OSError:
+        # The cache is an optimisation only, a read-only directory is fine
+        pass
+
+def replay_journal(index, journal, revision=0):
+    """Apply journal lines to a freshly loaded snapshot
+
+    Entries up to the snapshot revision were folded into it by a concurrent
+    compaction and are skipped. Returns the entry count and the revision.
+    """
+    count = 0
+    for line in journal.decode('utf-8').splitlines():
+        try:
+            entry = json.loads(line, object_hook=untag_json)
+        except ValueError:
+            # Partial line left behind by an interrupted write
+            continue
+        rev = entry.get('rev', revision + 1)
+        if rev <= revision:
+            continue
+        CHANGE_OPS[entry['op']](index, **entry['args'])
+        count += 1
+        revision = rev
+    return count, revision
+
+
+def query_config(config, path):
+    """Resolve a dotted path such as 'projects.0.name' in the configuration"""
+    value = config
+    for part in path.split('.') if path else []:
+        value = value[int(part)] if isinstance(value, list) else value[part]
+    return value
@@ -0,0 +1,27 @@
+"""Lazily imported terminal output shared by the CLI and the library modules"""
+import importlib
+
+class Lazy:
+    """Stand-in for a module or object that is only imported on first use
+
+    Keeps inquirer and rich out of non-interactive runs such as 'query'.
+    """
+    __slots__ = ('_loader', '_target')
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self._loader()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+# Initialize rich console
+console = Lazy(lambda: importlib.import_module('rich.console').Console())
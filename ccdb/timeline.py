@@ -0,0 +1,258 @@
+"""Project date windows in interval trees and NumPy timeline statistics"""
+import bisect
+import importlib
+from datetime import date
+
+from .records import State
+
+# ------------------ TIMELINE INDEX ------------------
+# Project dates are parsed once into day ordinals and kept in interval trees,
+# so point, range and overlap queries do not re-parse or scan every project.
+
+def date_ordinal(value):
+    """Day ordinal of a YYYY-MM-DD string"""
+    return date.fromisoformat(value).toordinal()
+
+class IntervalTree:
+    """Static centered interval tree over inclusive (start, end, value) intervals"""
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        self.left = self.right = None
+        if not intervals:
+            self.center = None
+            self.by_start = self.by_end = []
+            return
+
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        self.center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        if left:
+            self.left = IntervalTree(left)
+        if right:
+            self.right = IntervalTree(right)
+
+    def overlapping(self, start, end):
+        """Values of all intervals sharing at least one day with [start, end]"""
+        result = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.center is None:
+                continue
+            if end < node.center:
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    result.append(interval[2])
+                if node.left:
+                    stack.append(node.left)
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    result.append(interval[2])
+                if node.right:
+                    stack.append(node.right)
+            else:
+                result.extend(interval[2] for interval in node.by_start)
+                if node.left:
+                    stack.append(node.left)
+                if node.right:
+                    stack.append(node.right)
+        return result
+
+    def containing(self, point):
+        """Values of all intervals containing a single day"""
+        return self.overlapping(point, point)
+
+class ProjectTimeline:
+    """Interval indexes over project windows and freeze periods"""
+
+    def __init__(self, projects):
+        self.order = {}
+        windows, freezes, freeze_points = [], [], []
+        for position, project in enumerate(projects):
+            self.order[project['name']] = position
+            try:
+                start = date_ordinal(project['start_date'])
+                end = date_ordinal(project['end_date'])
+                freeze = date_ordinal(project['freeze_date']) if project.get('freeze_date') else None
+            except (KeyError, TypeError, ValueError):
+                # Incomplete dates are reported by validation, not indexed
+                continue
+            windows.append((start, end, project))
+            if freeze is not None:
+                freezes.append((freeze, max(freeze, end), project))
+                freeze_points.append((freeze, position, project))
+
+        self.windows = IntervalTree(windows)
+        self.freezes = IntervalTree(freezes)
+        self.freeze_points = sorted(freeze_points, key=lambda f: (f[0], f[1]))
+        self.spans = {project['name']: (start, end) for start, end, project in windows}
+
+    def _sorted(self, projects):
+        return sorted(projects, key=lambda p: self.order[p['name']])
+
+    def active_on(self, day):
+        """Projects whose start..end window contains the day"""
+        return self._sorted(self.windows.containing(date_ordinal(day)))
+
+    def frozen_on(self, day):
+        """Projects between their freeze date and end date on the day"""
+        return self._sorted(self.freezes.containing(date_ordinal(day)))
+
+    def overlapping(self, start, end):
+        """Projects whose window overlaps the date range"""
+        return self._sorted(self.windows.overlapping(date_ordinal(start), date_ordinal(end)))
+
+    def overlapping_project(self, name):
+        """Other projects whose window overlaps the named project's window"""
+        if name not in self.spans:
+            return []
+        start, end = self.spans[name]
+        return [p for p in self._sorted(self.windows.overlapping(start, end)) if p['name'] != name]
+
+    def past_freeze(self, day):
+        """Projects whose freeze date lies before the day"""
+        cut = bisect.bisect_left(self.freeze_points, (date_ordinal(day), -1))
+        return [project for _, _, project in self.freeze_points[:cut]]
+
+def freeze_conflicts(index, day):
+    """Open or in-progress requests targeting a project past its freeze date"""
+    positions = set()
+    for project in index.timeline.past_freeze(day):
+        for state in (State.OPEN, State.IN_PROGRESS):
+            positions.update(index.buckets.get((project['name'], state), ()))
+    return [index.records[position] for position in sorted(positions)]
+
+# ------------------ TIMELINE ENGINE ------------------
+# Batch week/duration/load computation over all projects with NumPy
+# datetime64 arrays. NumPy is optional: without it the analytics menu
+# reports the missing package. dashboard.json does not use the engine; its
+# weekly load comes from dashboard.weekly_load() and is the same either way.
+
+def load_numpy():
+    """Import NumPy if it is installed"""
+    try:
+        return importlib.import_module('numpy')
+    except ImportError:
+        return None
+
+class TimelineEngine:
+    """Vectorised timeline statistics for a list of projects"""
+
+    def __init__(self, np, projects):
+        self.np = np
+        rows = []
+        for project in projects:
+            try:
+                start = np.datetime64(project['start_date'], 'D')
+                end = np.datetime64(project['end_date'], 'D')
+                freeze = np.datetime64(project.get('freeze_date') or 'NaT', 'D')
+            except (KeyError, TypeError, ValueError):
+                continue
+            if end >= start:
+                rows.append((project['name'], start, end, freeze))
+
+        self.names = [row[0] for row in rows]
+        self.start = np.array([row[1] for row in rows], dtype='datetime64[D]')
+        self.end = np.array([row[2] for row in rows], dtype='datetime64[D]')
+        self.freeze = np.array([row[3] for row in rows], dtype='datetime64[D]')
+
+    @classmethod
+    def create(cls, projects):
+        """Engine for the projects, or None when NumPy is not installed"""
+        np = load_numpy()
+        return cls(np, projects) if np is not None else None
+
+    def iso_weeks(self, days):
+        """ISO calendar (year, week) arrays for datetime64[D] values"""
+        ordinal = days.astype('int64')
+        # ISO weeks belong to the year of their Thursday; 1970-01-01 was a Thursday
+        thursday = ordinal - (ordinal + 3) % 7 + 3
+        year = thursday.astype('datetime64[D]').astype('datetime64[Y]')
+        week = (thursday - year.astype('datetime64[D]').astype('int64')) // 7 + 1
+        return year.astype('int64') + 1970, week
+
+    def project_stats(self):
+        """Per-project weeks, durations, freeze gaps and overlap counts"""
+        np = self.np
+        if not self.names:
+            return []
+        has_freeze = ~np.isnat(self.freeze)
+        _, start_week = self.iso_weeks(self.start)
+        _, end_week = self.iso_weeks(self.end)
+        _, freeze_week = self.iso_weeks(np.where(has_freeze, self.freeze, self.start))
+        duration = (self.end - self.start).astype('int64')
+        freeze_gap = (self.end - np.where(has_freeze, self.freeze, self.end)).astype('int64')
+
+        overlaps = ((self.start[:, None] <= self.end[None, :]) &
+                    (self.end[:, None] >= self.start[None, :]))
+        np.fill_diagonal(overlaps, False)
+        overlap_counts = overlaps.sum(axis=1)
+
+        return [
+            {
+                'name': name,
+                'start_week': int(start_week[i]),
+                'end_week': int(end_week[i]),
+                'freeze_week': int(freeze_week[i]) if has_freeze[i] else None,
+                'duration_days': int(duration[i]),
+                'duration_weeks': int(np.round(duration[i] / 7)),
+                'freeze_to_end_days': int(freeze_gap[i]) if has_freeze[i] else None,
+                'overlaps': int(overlap_counts[i])
+            }
+            for i, name in enumerate(self.names)
+        ]
+
+    def weekly_load(self, origin=None, count=None):
+        """Number of active and frozen projects per week
+
+        Weeks start at origin (default: the Monday before the first project
+        start) and run for count weeks (default: until the last project end).
+        """
+        np = self.np
+        if not self.names:
+            return []
+        if origin is None:
+            first = self.start.min()
+            origin = first - (first.astype('int64') + 3) % 7
+        origin = np.datetime64(origin, 'D')
+        if count is None:
+            count = int((self.end.max() - origin).astype('int64') // 7) + 1
+
+        week_start = origin + 7 * np.arange(count)
+        week_end = week_start + 6
+
+        # Windows have end >= start, so active = started by week end - ended before week start
+        starts, ends = np.sort(self.start), np.sort(self.end)
+        active = np.searchsorted(starts, week_end, 'right') - np.searchsorted(ends, week_start, 'left')
+
+        has_freeze = ~np.isnat(self.freeze)
+        freezes = np.sort(self.freeze[has_freeze])
+        frozen_ends = np.sort(np.maximum(self.end, self.freeze)[has_freeze])
+        frozen = (np.searchsorted(freezes, week_end, 'right') -
+                  np.searchsorted(frozen_ends, week_start, 'left'))
+
+        years, weeks = self.iso_weeks(week_start)
+        return [
+            {
+                'week_start': str(week_start[i]),
+                'iso_week': f"{years[i]}-W{weeks[i]:02d}",
+                'active': int(active[i]),
+                'frozen': int(frozen[i])
+            }
+            for i in range(count)
+        ]
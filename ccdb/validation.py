@@ -0,0 +1,435 @@
+"""Validation rules and the check run before every write"""
+import os
+import itertools
+import marshal
+import operator
+from datetime import date
+
+from .changes import CHANGE_RENAMES, ConflictError
+from .profiling import span, tally
+from .records import (
+    as_record, ChangeRequest, Divergence, divergence_key, INTEGRATION_STATES, Project,
+    RECORD_TYPES, request_key, REQUEST_STATES, tag_dates
+)
+from .terminal import console
+
+# ------------------ VALIDATION ------------------
+# Whole-configuration checks for files edited by hand, beyond the date
+# validation of the prompts. Record rules look at one record at a time and
+# their results are cached by record content, so after an edit only changed
+# records are checked again; big uncached files are checked by forked worker
+# processes. Reference and duplicate rules span records and run over the
+# indexes every time.
+
+VALIDATION_MODES = ['off', 'warn', 'strict']
+VALIDATION_MODE = os.environ.get('CCDB_VALIDATE', 'warn')
+VALIDATION_WORKERS = max(1, int(os.environ.get('CCDB_VALIDATE_WORKERS', os.cpu_count() or 1)))
+VALIDATION_PARALLEL_MIN = 20000   # unchecked records below this are checked in-process
+VALIDATION_CHUNK = 5000
+VALIDATION_REPORT_LIMIT = 5       # new errors printed after a write in warn mode
+SECTION_LABELS = {'projects': 'project', 'change_requests': 'request', 'divergences': 'divergence'}
+# Records being checked, inherited by the forked workers instead of pickled
+VALIDATION_PENDING = None
+
+class ValidationError(ConflictError):
+    """Changes refused in strict mode because the result has validation errors"""
+
+def checked_date(value):
+    """date of a YYYY-MM-DD value, None if it is malformed"""
+    if isinstance(value, str) and len(value) == 10 and value[4] == value[7] == '-':
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return None
+
+def check_dates(record, fields, required):
+    """Issues of the date fields of a record and their parsed values"""
+    issues = []
+    dates = {}
+    for field in fields:
+        value = record.get(field)
+        if value is None:
+            if required:
+                issues.append(('error', 'required', f"Missing {field}"))
+            continue
+        dates[field] = checked_date(value)
+        if dates[field] is None:
+            issues.append(('error', 'date', f"Invalid {field} '{value}', expected YYYY-MM-DD"))
+    return issues, dates
+
+def check_project(project):
+    """Name, date window and freeze date of a project"""
+    issues, dates = check_dates(project, ('start_date', 'end_date', 'freeze_date'), True)
+    if not project.get('name'):
+        issues.append(('error', 'required', "Project without a name"))
+    start, end, freeze = dates.get('start_date'), dates.get('end_date'), dates.get('freeze_date')
+    if start and end and start > end:
+        issues.append(('error', 'date', f"start_date {start} is after end_date {end}"))
+    if freeze and ((start and freeze < start) or (end and freeze > end)):
+        issues.append(('error', 'freeze', f"freeze_date {freeze} is outside {start} .. {end}"))
+    if project.get('commonconfig') not in (None, 'true', 'false'):
+        issues.append(('warning', 'flag', f"commonconfig is '{project.get('commonconfig')}', "
+                                          "expected 'true' or 'false'"))
+    return issues
+
+def check_request(req):
+    """Required fields, state and dates of a change request"""
+    issues, _ = check_dates(req, ('created',), False)
+    for field in ('title', 'project'):
+        if not req.get(field):
+            issues.append(('error', 'required', f"Request without a {field}"))
+    if req.get('state') not in REQUEST_STATES:
+        issues.append(('error', 'state', f"Unknown state '{req.get('state')}'"))
+    targets = (req.get('integration') or {}).get('targets') or {}
+    for target, status in targets.items():
+        if (status or {}).get('status') not in INTEGRATION_STATES:
+            issues.append(('error', 'state', f"Unknown integration status "
+                                             f"'{(status or {}).get('status')}' for {target}"))
+    return issues
+
+def check_divergence(div):
+    """Required fields and date of a divergence"""
+    issues, _ = check_dates(div, ('date',), True)
+    if not div.get('project'):
+        issues.append(('error', 'required', "Divergence without a project"))
+    if not div.get('reason'):
+        issues.append(('warning', 'required', "Divergence without a reason"))
+    return issues
+
+RECORD_RULES = {'projects': check_project, 'change_requests': check_request, 'divergences': check_divergence}
+
+FIELD_GETTERS = {record_type: operator.attrgetter(*record_type.FIELDS)
+                 for record_type in RECORD_TYPES.values()}
+
+def record_fingerprint(record):
+    """Hashable content of a record, the key of its cached results"""
+    try:
+        values = FIELD_GETTERS[type(record)](record)
+    except AttributeError:
+        # An optional field is not set
+        values = tuple([getattr(record, name, None) for name in record.FIELDS])
+    extra = record.extra
+    # marshal has no date type, YAML dates in extra fields go in as tags
+    return (values, marshal.dumps(tag_dates(extra), 2)) if extra else values
+
+def check_pending(start, stop):
+    """Worker: issues of a slice of VALIDATION_PENDING, only for records that have some"""
+    found = []
+    for offset, (section, record) in enumerate(VALIDATION_PENDING[start:stop], start):
+        issues = RECORD_RULES[section](record)
+        if issues:
+            found.append((offset, issues))
+    return found
+
+def check_records(pending, workers):
+    """Issues of each (section, record) pair, in a process pool for many records"""
+    global VALIDATION_PENDING
+    import multiprocessing
+    if (workers < 2 or len(pending) < VALIDATION_PARALLEL_MIN or
+            'fork' not in multiprocessing.get_all_start_methods()):
+        return [RECORD_RULES[section](record) for section, record in pending]
+
+    from concurrent.futures import ProcessPoolExecutor
+    results = [[] for _ in pending]
+    starts = range(0, len(pending), VALIDATION_CHUNK)
+    VALIDATION_PENDING = pending
+    try:
+        with ProcessPoolExecutor(min(workers, len(starts)),
+                                 mp_context=multiprocessing.get_context('fork')) as pool:
+            chunks = [pool.submit(check_pending, start, start + VALIDATION_CHUNK) for start in starts]
+            for chunk in chunks:
+                for offset, issues in chunk.result():
+                    results[offset] = issues
+    finally:
+        VALIDATION_PENDING = None
+    return results
+
+def record_label(section, record):
+    """How an issue names its record"""
+    if section == 'projects':
+        return str(record.get('name'))
+    elif section == 'change_requests':
+        return f"{record.get('title')} ({record.get('project')})"
+    return f"{record.get('project')} - {str(record.get('reason'))[:30]} ({record.get('date')})"
+
+def unknown_project(config, name):
+    """Issue of a reference to a project that does not exist"""
+    if name in (config.get('project_filters') or ()):
+        return ('warning', 'reference', f"Project '{name}' is a project filter but not a project")
+    return ('error', 'reference', f"Unknown project '{name}'")
+
+def integration_targets(config):
+    return {t.get('name') for t in (config.get('integration') or {}).get('targets') or []}
+
+def check_references(index):
+    """Issues spanning records: unknown projects and targets, duplicate keys"""
+    config = index.config
+    projects = index.projects
+    targets = integration_targets(config)
+
+    if len(projects) != len(config.get('projects') or []):
+        for same in projects.values():
+            for project in same[1:]:
+                yield 'projects', project, ('error', 'duplicate',
+                                            f"Duplicate project name '{project.get('name')}'")
+
+    requests = config.get('change_requests') or []
+    if len(index.requests) != len(requests):
+        for same in index.requests.values():
+            for req in same[1:]:
+                yield 'change_requests', req, ('error', 'duplicate',
+                                               "Duplicate request, the (title, project) key is taken")
+    # Buckets are per (project, state), so unknown projects cost one lookup each
+    for project, state in list(index.buckets):
+        if project and project not in projects:
+            issue = unknown_project(config, project)
+            for position in sorted(index.buckets[(project, state)]):
+                yield 'change_requests', index.records[position], issue
+    for req in requests:
+        if req.extra and 'integration' in req.extra:
+            for target in (req.extra['integration'] or {}).get('targets') or {}:
+                if target not in targets:
+                    yield 'change_requests', req, ('error', 'reference',
+                                                   f"Unknown integration target '{target}'")
+
+    for divs in index.divergences.values():
+        for div in divs:
+            project = div.get('project')
+            if project and project not in projects:
+                yield 'divergences', div, unknown_project(config, project)
+        for div in divs[1:]:
+            yield 'divergences', div, ('warning', 'duplicate', "Duplicate divergence")
+
+WRITTEN_RECORDS = {
+    'add_project': ('projects', Project, 'project'),
+    'edit_project': ('projects', Project, None),
+    'add_request': ('change_requests', ChangeRequest, 'request'),
+    'edit_request': ('change_requests', ChangeRequest, None),
+    'change_request_state': ('change_requests', ChangeRequest, None),
+    'set_integration': ('change_requests', ChangeRequest, None),
+    'add_divergence': ('divergences', Divergence, 'divergence'),
+    'edit_divergence': ('divergences', Divergence, None),
+}
+
+def written_record(index, op, args, base):
+    """The record a change wrote and whether its key was already taken"""
+    section, record_type, added = WRITTEN_RECORDS[op]
+    if added:
+        # An add whose key existed when it was made is not indexed
+        return as_record(record_type, args[added]), base is not None and base[1] is not None
+    if base is None or base[1] is None:
+        return None, False
+    (mapping, key, _), before = base
+    changes = args.get('changes') or {}
+    if op == 'change_request_state':
+        changes = {'state': args['state']}
+    record = as_record(record_type, {**before, **changes})
+    if op == 'set_integration':
+        return index.request(key), False
+    new_key = {'projects': lambda r: r.get('name'), 'change_requests': request_key,
+               'divergences': divergence_key}[section](record)
+    current = getattr(index, mapping).get(new_key) or []
+    matching = [r for r in current if all(r.get(f) == v for f, v in changes.items())]
+    if not matching:
+        return record, True
+    # A rename onto a taken key leaves the other record listed under it too
+    return matching[-1], new_key != key and len(current) > 1
+
+# Removals and the (index mapping, keys) of the records they drop
+REMOVED_RECORDS = {
+    'remove_projects': lambda a: ('projects', a['names']),
+    'remove_requests': lambda a: ('requests', [tuple(k) for k in a['keys']]),
+    'remove_divergences': lambda a: ('divergences', [tuple(k) for k in a['keys']]),
+}
+
+def written_records(index, changes):
+    """Records a list of applied changes wrote, as (section, record, key taken, before)
+
+    Several changes to one record, as a session makes them, count once with
+    the record as the last of them left it; before is the record as the
+    first found it, None for added records. Also returns the project names
+    the changes removed or renamed away. Removed records cannot break
+    anything and are left out.
+    """
+    # (index mapping, key) -> first and last change of the record
+    touched = {}
+    dropped = set()
+    # Slots of changes that carry no key, unique even as removals shrink touched
+    unkeyed = itertools.count()
+    for change in changes:
+        op, args, _, base = change
+        if op in REMOVED_RECORDS:
+            mapping, keys = REMOVED_RECORDS[op](args)
+            for key in keys:
+                touched.pop((mapping, key), None)
+            if op == 'remove_projects':
+                dropped.update(args['names'])
+            continue
+        if op not in WRITTEN_RECORDS:
+            continue
+        if op == 'edit_project' and args['changes'].get('name', args['name']) != args['name']:
+            dropped.add(args['name'])
+        if base is not None:
+            slot = base[0][:2]
+        elif op == 'add_divergence':
+            slot = ('divergences', divergence_key(args['divergence']))
+        else:
+            slot = (op, next(unkeyed))
+        first, _ = touched.pop(slot, (change, None))
+        if op in CHANGE_RENAMES:
+            slot = CHANGE_RENAMES[op](args)[::2]
+        touched[slot] = (first, change)
+
+    written = []
+    for first, (op, args, _, base) in touched.values():
+        record, taken = written_record(index, op, args, base)
+        if record is None:
+            continue
+        section, record_type, added = WRITTEN_RECORDS[first[0]]
+        if added:
+            # The key of an added record was taken when it was added
+            taken = taken or written_record(index, first[0], first[1], first[3])[1]
+        before = None if added or first[3][1] is None else as_record(record_type, first[3][1])
+        written.append((section, record, taken, before))
+    return written, dropped - index.projects.keys()
+
+def record_issues(index, section, record):
+    """Rule and reference issues of one record, duplicate keys aside"""
+    yield from RECORD_RULES[section](record)
+    if section == 'projects':
+        return
+    project = record.get('project')
+    if project and project not in index.projects:
+        yield unknown_project(index.config, project)
+    if section == 'change_requests':
+        targets = integration_targets(index.config)
+        for target in (record.get('integration') or {}).get('targets') or {}:
+            if target not in targets:
+                yield ('error', 'reference', f"Unknown integration target '{target}'")
+
+def check_written(index, changes, new_only=False):
+    """Issues of the records changes wrote and of references to projects they dropped
+
+    With new_only, issues an edited record already had before the change
+    are left out.
+    """
+    config = index.config
+    written, dropped = written_records(index, changes)
+    for section, record, taken, before in written:
+        known = set(record_issues(index, section, before)) if new_only and before is not None else ()
+        for issue in record_issues(index, section, record):
+            if issue not in known:
+                yield section, record, issue
+        if taken and section == 'projects':
+            yield section, record, ('error', 'duplicate',
+                                    f"Duplicate project name '{record.get('name')}'")
+        elif taken:
+            yield section, record, ('error', 'duplicate',
+                                    "Duplicate request, the (title, project) key is taken")
+
+    # Records still pointing at a removed or renamed project
+    for project, state in list(index.buckets):
+        if project in dropped:
+            for position in sorted(index.buckets[(project, state)]):
+                yield 'change_requests', index.records[position], unknown_project(config, project)
+    if dropped:
+        for div in config.get('divergences') or []:
+            if div.get('project') in dropped:
+                yield 'divergences', div, unknown_project(config, div.get('project'))
+
+class ConfigValidator:
+    """Runs the rule set over a configuration, reusing results of unchanged records"""
+
+    def __init__(self, workers=VALIDATION_WORKERS):
+        self.workers = workers
+        # section -> {record fingerprint: issues}, only for the records of the last run
+        self.cache = {section: {} for section in RECORD_RULES}
+        self.reported = set()
+
+    def validate(self, index, errors_only=False):
+        """Issues as dicts with severity, rule, section, record and message"""
+        config = index.config
+        with span('validate'):
+            fingerprints = {}
+            pending = []
+            for section in RECORD_RULES:
+                known = self.cache[section]
+                fingerprints[section] = keys = [record_fingerprint(record)
+                                                for record in config.get(section) or []]
+                pending += [(section, record, key)
+                            for record, key in zip(config.get(section) or [], keys) if key not in known]
+            tally('validate.checked', len(pending))
+            if pending:
+                with span('validate.records', records=len(pending)):
+                    checked = check_records([(section, record) for section, record, _ in pending],
+                                            self.workers)
+                for (section, _, key), issues in zip(pending, checked):
+                    self.cache[section][key] = issues
+
+            found = []
+            for section, keys in fingerprints.items():
+                # Results of records that are gone are dropped
+                known = self.cache[section]
+                cache = self.cache[section] = {}
+                for record, key in zip(config.get(section) or [], keys):
+                    issues = cache[key] = known[key]
+                    if issues:
+                        found.extend((section, record, issue) for issue in issues)
+
+            with span('validate.references'):
+                found.extend(check_references(index))
+        return self._issues(found, errors_only)
+
+    def validate_changes(self, index, changes, errors_only=False, new_only=False):
+        """Issues of what applied changes wrote, without a pass over all records"""
+        with span('validate.changes', changes=len(changes)):
+            found = list(check_written(index, changes, new_only))
+        return self._issues(found, errors_only)
+
+    def _issues(self, found, errors_only):
+        if errors_only:
+            found = [item for item in found if item[2][0] == 'error']
+        order = {section: n for n, section in enumerate(RECORD_RULES)}
+        found.sort(key=lambda item: (order[item[0]], item[2][0] != 'error'))
+        return [{'severity': severity, 'rule': rule, 'section': section,
+                 'record': record_label(section, record), 'message': message}
+                for section, record, (severity, rule, message) in found]
+
+    def unreported(self, issues):
+        """Issues not returned by an earlier call, so each is reported once"""
+        new = []
+        for issue in issues:
+            identity = (issue['section'], issue['record'], issue['message'])
+            if identity not in self.reported:
+                self.reported.add(identity)
+                new.append(issue)
+        return new
+
+VALIDATOR = ConfigValidator()
+
+def describe_issue(issue):
+    return f"{SECTION_LABELS[issue['section']]} {issue['record']}: {issue['message']}"
+
+def check_before_write(index, changes=None):
+    """Pre-save hook: refuse errors in strict mode, otherwise report new ones
+
+    With the changes of a write or commit only the records they touched are
+    checked, and only for errors the changes introduced, so journal appends
+    stay cheap and errors already in the file do not block unrelated edits.
+    Full saves of a whole configuration check everything.
+    """
+    if VALIDATION_MODE == 'off' or index is None:
+        return
+    if changes is None:
+        errors = VALIDATOR.validate(index, errors_only=True)
+    else:
+        errors = VALIDATOR.validate_changes(index, changes, errors_only=True, new_only=True)
+    if errors and VALIDATION_MODE == 'strict':
+        raise ValidationError([describe_issue(issue) for issue in errors])
+    new = VALIDATOR.unreported(errors)
+    for issue in new[:VALIDATION_REPORT_LIMIT]:
+        console.print(f"[bold yellow]Warning:[/bold yellow] {describe_issue(issue)}")
+    if len(new) > VALIDATION_REPORT_LIMIT:
+        console.print(f"[yellow]... and {len(new) - VALIDATION_REPORT_LIMIT} more, "
+                      "see 'mgr.py validate'[/yellow]")
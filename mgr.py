@@ -1,33 +1,64 @@
 #!/usr/bin/env python3
+import time
+_START_TIME = time.perf_counter()
+
 import os
+import argparse
+import importlib
+import json
 import yaml
 import sys
 from datetime import datetime
-import inquirer
-from rich.console import Console
-from rich.table import Table
-from rich import box
 
-CONFIG_FILE = "config.yaml"
+from ccdb import validation
+from ccdb.changes import ConflictError
+from ccdb.daemon import call_daemon, DAEMON_COMMANDS, DAEMON_SOCKET, DaemonError, serve
+from ccdb.dashboard import DASHBOARD_FILE, write_dashboard
+from ccdb.hints import generate_integration_hints, HINTS_FILE
+from ccdb.history import HistoryAnalytics
+from ccdb.profiling import enable_profiling, ProfiledPrompts, span
+from ccdb.records import (
+    divergence_key, INTEGRATION_STATES, Record, record_json, request_key, REQUEST_STATES,
+    State, STATE_NAMES
+)
+from ccdb.reports import (
+    export_available, EXPORT_COLUMNS, export_format, EXPORT_FORMATS, export_report
+)
+from ccdb.search import PICKER_FALLBACK_LIMIT, PICKER_TOP_K
+from ccdb.sqlite_store import DB_FILE, export_sqlite_to_yaml, migrate_to_sqlite, open_store
+from ccdb.store import (
+    CONFIG_FILE, ConfigStore, query_config, RecordDumper, SNAPSHOT_STATS, YAML_LOADER
+)
+from ccdb.terminal import console, Lazy
+from ccdb.timeline import freeze_conflicts, TimelineEngine
+from ccdb.validation import (
+    ConfigValidator, SECTION_LABELS, VALIDATION_MODES, VALIDATION_WORKERS, ValidationError,
+    VALIDATOR
+)
+
+# Rows shown per table page, override with CCDB_PAGE_SIZE
+PAGE_SIZE = max(1, int(os.environ.get('CCDB_PAGE_SIZE', '25')))
 
-# Initialize rich console
-console = Console()
+inquirer = Lazy(lambda: importlib.import_module('inquirer'))
+Table = Lazy(lambda: importlib.import_module('rich.table').Table)
+box = Lazy(lambda: importlib.import_module('rich.box'))
 
 # ------------------ UTILITY FUNCTIONS ------------------
 
 def load_config():
-    """Load YAML configuration file"""
-    try:
-        with open(CONFIG_FILE, 'r') as file:
-            return yaml.safe_load(file)
-    except FileNotFoundError:
-        console.print(f"[bold red]Error:[/bold red] Configuration file {CONFIG_FILE} not found!", style="red")
-        sys.exit(1)
+    """Load the configuration including pending journal entries
+
+    Goes through the module-level store, so repeated calls reuse the parse
+    until the files change.
+    """
+    return store.get()
 
 def save_config(data):
     """Save configuration to YAML file"""
-    with open(CONFIG_FILE, 'w') as file:
-        yaml.dump(data, file, sort_keys=False)
+    store.save(data)
+
+# Shared configuration cache used by all menus
+store = ConfigStore(CONFIG_FILE)
 
 def display_header(title):
     """Display a styled header"""
@@ -35,6 +66,83 @@ def display_header(title):
     console.print(f"[bold bright_yellow]{title.center(50)}[/bold bright_yellow]")
     console.print(f"[bold bright_cyan]{'=' * 50}[/bold bright_cyan]\n")
 
+def show_paged(title, columns, records, build_row):
+    """Display records as a table one page at a time
+
+    columns holds (header, add_column options, pager width) tuples and
+    build_row(record, markup) returns the cells of one record. Rows are
+    only built for the page being shown.
+    """
+    total = len(records)
+    pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    page = 0
+
+    while True:
+        start = page * PAGE_SIZE
+        caption = f"Page {page + 1}/{pages} - {total} row(s)" if pages > 1 else None
+        with span('list.build', title=title, rows=total):
+            table = Table(title=f"\n{title}", caption=caption, box=box.ROUNDED, header_style="bold magenta")
+            for header, options, _ in columns:
+                table.add_column(header, **options)
+            for record in records[start:start + PAGE_SIZE]:
+                table.add_row(*build_row(record, True))
+        with span('list.render', title=title):
+            console.print(table)
+
+        if pages <= 1:
+            return
+
+        choices = []
+        if page + 1 < pages:
+            choices.append(('Next page', 'next'))
+        if page > 0:
+            choices.append(('Previous page', 'previous'))
+        choices += [('Open all rows in pager', 'pager'), ('Done', 'done')]
+
+        questions = [
+            inquirer.List('page',
+                          message="Navigate",
+                          choices=choices)
+        ]
+        action = inquirer.prompt(questions)['page']
+
+        if action == 'next':
+            page += 1
+        elif action == 'previous':
+            page -= 1
+        elif action == 'pager':
+            stream_to_pager(title, columns, records, build_row)
+            return
+        else:
+            return
+
+def stream_to_pager(title, columns, records, build_row):
+    """Pipe all records as plain text lines into $PAGER
+
+    Lines are written one at a time, so memory stays constant and the pager
+    shows the first rows immediately.
+    """
+    import shlex
+    import subprocess
+    command = shlex.split(os.environ.get('PAGER', 'less -S'))
+    with subprocess.Popen(command, stdin=subprocess.PIPE, text=True, encoding='utf-8') as pager:
+        try:
+            pager.stdin.write(f"{title}\n\n")
+            pager.stdin.write('  '.join(h[:w].ljust(w) for h, _, w in columns) + '\n')
+            pager.stdin.write('  '.join('-' * w for _, _, w in columns) + '\n')
+            for record in records:
+                cells = build_row(record, False)
+                pager.stdin.write('  '.join(
+                    str(cell)[:w].ljust(w) for cell, (_, _, w) in zip(cells, columns)) + '\n')
+        except BrokenPipeError:
+            # The user quit the pager before reading everything
+            pass
+        finally:
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+
 def validate_date(_, date):
     """Validate date format (YYYY-MM-DD)"""
     try:
@@ -43,12 +151,118 @@ def validate_date(_, date):
     except ValueError:
         return "Invalid date format. Please use YYYY-MM-DD"
 
+def request_label(req):
+    return f"{req['title']} ({req['project']})"
+
+def divergence_label(div):
+    return f"{div['project']} - {div['reason'][:30]}..."
+
+def pick_records(message, picker, label, multi=False):
+    """Type-ahead selection of one record, or of several with multi
+
+    Returns the record (None if canceled) or, with multi, a list of records.
+    label(record) is only called for the matches on screen.
+    """
+    try:
+        readchar = importlib.import_module('readchar')
+    except ImportError:
+        readchar = None
+    if readchar is None or not sys.stdin.isatty():
+        return pick_records_prompt(message, picker, label, multi)
+
+    Live = importlib.import_module('rich.live').Live
+    Text = importlib.import_module('rich.text').Text
+    keys = readchar.key
+    query = ''
+    cursor = 0
+    chosen = {}
+    matches = picker.search(query, PICKER_TOP_K)
+
+    def render():
+        text = Text()
+        text.append(f"? {message}: ", style="bold")
+        text.append(query + "▏", style="bold cyan")
+        help_text = ("↑↓ move, Tab mark, Enter confirm, Esc cancel" if multi
+                     else "↑↓ move, Enter select, Esc cancel")
+        text.append(f"  {help_text}\n", style="dim")
+        if not matches:
+            text.append("  no matches\n", style="italic yellow")
+        for row, item_id in enumerate(matches):
+            line = "❯ " if row == cursor else "  "
+            if multi:
+                line += "◉ " if item_id in chosen else "◯ "
+            text.append(line + label(picker.records[item_id]) + "\n",
+                        style="bold magenta" if row == cursor else None)
+        if multi and chosen:
+            text.append(f"  {len(chosen)} marked\n", style="green")
+        return text
+
+    with Live(render(), console=console, auto_refresh=False, transient=True) as live:
+        while True:
+            try:
+                key = readchar.readkey()
+            except KeyboardInterrupt:
+                key = keys.CTRL_C
+            if key in ('\r', '\n'):
+                if multi:
+                    # Without marks Enter takes the highlighted match
+                    if chosen:
+                        return list(chosen.values())
+                    return [picker.records[matches[cursor]]] if matches else []
+                if matches:
+                    return picker.records[matches[cursor]]
+            elif key in (keys.ESC, keys.CTRL_C):
+                return [] if multi else None
+            elif key == keys.UP:
+                cursor = max(0, cursor - 1)
+            elif key == keys.DOWN:
+                cursor = max(0, min(len(matches) - 1, cursor + 1))
+            elif key == keys.TAB and multi and matches:
+                item_id = matches[cursor]
+                if chosen.pop(item_id, None) is None:
+                    chosen[item_id] = picker.records[item_id]
+            elif key in (keys.BACKSPACE, '\x08'):
+                query = query[:-1]
+                matches, cursor = picker.search(query, PICKER_TOP_K), 0
+            elif len(key) == 1 and key.isprintable():
+                query += key
+                matches, cursor = picker.search(query, PICKER_TOP_K), 0
+            live.update(render(), refresh=True)
+
+def pick_records_prompt(message, picker, label, multi=False):
+    """pick_records without a raw terminal: a search text, then the best matches"""
+    questions = [
+        inquirer.Text('query', message=f"{message} - search (empty for the first {PICKER_FALLBACK_LIMIT})")
+    ]
+    matches = picker.search(inquirer.prompt(questions)['query'], PICKER_FALLBACK_LIMIT)
+    if not matches:
+        console.print("[italic yellow]No matches[/italic yellow]")
+        return [] if multi else None
+    choices = [(label(picker.records[item_id]), picker.records[item_id]) for item_id in matches]
+    if multi:
+        questions = [inquirer.Checkbox('records', message=message, choices=choices)]
+        return inquirer.prompt(questions)['records']
+    questions = [inquirer.List('record', message=message, choices=choices)]
+    return inquirer.prompt(questions)['record']
+
 # ------------------ DIVERGENCE MANAGEMENT ------------------
 
+def report_conflicts(error):
+    """Show the changes that were not saved because someone else edited the same data"""
+    if isinstance(error, ValidationError):
+        for problem in error.conflicts:
+            console.print(f"[bold red]Invalid:[/bold red] {problem}")
+        console.print("[yellow]These changes were not saved (--validate-mode strict)[/yellow]")
+        return
+    for conflict in error.conflicts:
+        console.print(f"[bold red]Conflict:[/bold red] {conflict}")
+    console.print("[yellow]These changes were not saved, menus now show the latest version[/yellow]")
+
 def manage_divergences():
     """Main menu for divergence management"""
     while True:
-        config = load_config()
+        store.flush_dashboard()
+        config = store.get()
         divergences = config.get('divergences', [])
         projects = [p['name'] for p in config.get('projects', [])]
         
@@ -71,14 +285,18 @@ def manage_divergences():
         
         if action == 'back':
             return
-        elif action == 'list':
-            list_divergences(divergences)
-        elif action == 'add':
-            add_divergence(config, projects)
-        elif action == 'edit':
-            edit_divergence(config, divergences, projects)
-        elif action == 'remove':
-            remove_divergence(config, divergences)
+
+        try:
+            if action == 'list':
+                list_divergences(divergences)
+            elif action == 'add':
+                add_divergence(config, projects)
+            elif action == 'edit':
+                edit_divergence(config, divergences, projects)
+            elif action == 'remove':
+                remove_divergence(config, divergences)
+        except ConflictError as error:
+            report_conflicts(error)
 
 def list_divergences(divergences):
     """Display divergences in a formatted table"""
@@ -86,19 +304,20 @@ def list_divergences(divergences):
         console.print("[italic]No divergences found[/italic]")
         return
 
-    table = Table(title="\nDIVERGENCES", box=box.ROUNDED, header_style="bold magenta")
-    table.add_column("Project", style="cyan", no_wrap=True)
-    table.add_column("Reason", style="green")
-    table.add_column("Date", style="yellow")
+    columns = [
+        ("Project", {'style': "cyan", 'no_wrap': True}, 18),
+        ("Reason", {'style': "green"}, 60),
+        ("Date", {'style': "yellow"}, 10)
+    ]
 
-    for div in divergences:
-        table.add_row(
+    def build_row(div, markup):
+        return (
             div['project'],
             div['reason'],
             div.get('date', 'N/A')
         )
     
-    console.print(table)
+    show_paged("DIVERGENCES", columns, divergences, build_row)
 
 def add_divergence(config, projects):
     """Add a new divergence"""
@@ -129,11 +348,7 @@ def add_divergence(config, projects):
             'date': answers['date']
         }
         
-        if 'divergences' not in config:
-            config['divergences'] = []
-            
-        config['divergences'].append(new_divergence)
-        save_config(config)
+        store.apply('add_divergence', divergence=new_divergence)
         console.print(f"[bold green]✓ Divergence for '{answers['project']}' added successfully![/bold green]")
     else:
         console.print("[yellow]Divergence creation canceled[/yellow]")
@@ -144,14 +359,11 @@ def edit_divergence(config, divergences, projects):
         console.print("[italic yellow]No divergences to edit[/italic yellow]")
         return
         
-    divergence_choices = [(f"{d['project']} - {d['reason'][:30]}...", d) for d in divergences]
-    
-    questions = [
-        inquirer.List('divergence', 
-                      message="Select divergence to edit",
-                      choices=divergence_choices)
-    ]
-    selected = inquirer.prompt(questions)['divergence']
+    selected = pick_records("Select divergence to edit", store.index.record_picker('divergences'),
+                            divergence_label)
+    if selected is None:
+        console.print("[yellow]Divergence edit canceled[/yellow]")
+        return
     
     display_header(f"EDIT DIVERGENCE: {selected['project']}")
     
@@ -174,19 +386,12 @@ def edit_divergence(config, divergences, projects):
     
     if answers['confirm']:
         # Update divergence in config
-        for div in config['divergences']:
-            if (div['project'] == selected['project'] and 
-                div['reason'] == selected['reason'] and
-                div.get('date') == selected.get('date')):
-                div.update({
-                    'project': answers['project'],
-                    'reason': answers['reason'],
-                    'date': answers['date']
-                })
-                break
-        
-        save_config(config)
-        console.print(f"[bold green]✓ Divergence updated![/bold green]")
+        store.apply('edit_divergence', key=divergence_key(selected), changes={
+            'project': answers['project'],
+            'reason': answers['reason'],
+            'date': answers['date']
+        })
+        console.print("[bold green]✓ Divergence updated![/bold green]")
     else:
         console.print("[yellow]Divergence update canceled[/yellow]")
 
@@ -196,30 +401,18 @@ def remove_divergence(config, divergences):
         console.print("[italic yellow]No divergences to remove[/italic yellow]")
         return
         
-    divergence_choices = [(f"{d['project']} - {d['reason'][:30]}...", d) for d in divergences]
+    selected = pick_records("Select divergences to remove", store.index.record_picker('divergences'),
+                            divergence_label, multi=True)
     
     questions = [
-        inquirer.Checkbox('divergences', 
-                          message="Select divergences to remove",
-                          choices=divergence_choices),
-        inquirer.Confirm('confirm', message="Confirm deletion?", default=False)
+        inquirer.Confirm('confirm', message=f"Remove {len(selected)} divergence(s)?", default=False)
     ]
     
-    answers = inquirer.prompt(questions)
-    
-    if answers['confirm'] and answers['divergences']:
+    if selected and inquirer.prompt(questions)['confirm']:
         # Create list of identifiers for removal
-        to_remove = []
-        for div in answers['divergences']:
-            to_remove.append((div['project'], div['reason'], div.get('date')))
-        
-        # Filter out removed divergences
-        config['divergences'] = [
-            d for d in config['divergences'] 
-            if (d['project'], d['reason'], d.get('date')) not in to_remove
-        ]
+        to_remove = [divergence_key(div) for div in selected]
         
-        save_config(config)
+        store.apply('remove_divergences', keys=to_remove)
         console.print(f"[bold green]✓ Removed {len(to_remove)} divergence(s)[/bold green]")
     else:
         console.print("[yellow]Divergence removal canceled[/yellow]")
@@ -229,7 +422,8 @@ def remove_divergence(config, divergences):
 def manage_projects():
     """Main menu for project management"""
     while True:
-        config = load_config()
+        store.flush_dashboard()
+        config = store.get()
         projects = config.get('projects', [])
         
         display_header("PROJECT MANAGEMENT")
@@ -239,6 +433,8 @@ def manage_projects():
             ('Add new project', 'add'),
             ('Edit existing project', 'edit'),
             ('Remove project', 'remove'),
+            ('Timeline queries', 'timeline'),
+            ('Timeline analytics', 'analytics'),
             ('Return to main menu', 'back')
         ]
         
@@ -251,14 +447,22 @@ def manage_projects():
         
         if action == 'back':
             return
-        elif action == 'list':
-            list_projects(projects)
-        elif action == 'add':
-            add_project(config)
-        elif action == 'edit':
-            edit_project(config, projects)
-        elif action == 'remove':
-            remove_project(config, projects)
+
+        try:
+            if action == 'list':
+                list_projects(projects)
+            elif action == 'add':
+                add_project(config)
+            elif action == 'edit':
+                edit_project(config, projects)
+            elif action == 'remove':
+                remove_project(config, projects)
+            elif action == 'timeline':
+                timeline_queries(projects)
+            elif action == 'analytics':
+                timeline_analytics(projects)
+        except ConflictError as error:
+            report_conflicts(error)
 
 def list_projects(projects):
     """Display projects in a formatted table"""
@@ -266,16 +470,17 @@ def list_projects(projects):
         console.print("[italic]No projects found[/italic]")
         return
 
-    table = Table(title="\nPROJECTS", box=box.ROUNDED, header_style="bold magenta")
-    table.add_column("Name", style="cyan", no_wrap=True)
-    table.add_column("Start Date", style="green")
-    table.add_column("End Date", style="yellow")
-    table.add_column("Freeze Date", style="bright_red")
-    table.add_column("CommonConfig", justify="center")
+    columns = [
+        ("Name", {'style': "cyan", 'no_wrap': True}, 20),
+        ("Start Date", {'style': "green"}, 10),
+        ("End Date", {'style': "yellow"}, 10),
+        ("Freeze Date", {'style': "bright_red"}, 11),
+        ("CommonConfig", {'justify': "center"}, 12)
+    ]
 
-    for project in projects:
+    def build_row(project, markup):
         cc_flag = "✓" if project.get('commonconfig') == "true" else ""
-        table.add_row(
+        return (
             project['name'],
             project.get('start_date', 'N/A'),
             project.get('end_date', 'N/A'),
@@ -283,7 +488,103 @@ def list_projects(projects):
             cc_flag
         )
     
-    console.print(table)
+    show_paged("PROJECTS", columns, projects, build_row)
+
+def timeline_queries(projects):
+    """Answer date questions about projects from the timeline index"""
+    display_header("TIMELINE QUERIES")
+
+    choices = [
+        ('Active projects on date', 'active'),
+        ('Frozen projects on date', 'frozen'),
+        ('Projects overlapping a date range', 'range'),
+        ('Projects overlapping another project', 'overlap'),
+        ('Freeze conflicts (open requests past freeze)', 'conflicts')
+    ]
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    questions = [
+        inquirer.List('query', message="Select query", choices=choices),
+        inquirer.Text('date', message="Date (YYYY-MM-DD)", default=today, validate=validate_date,
+                      ignore=lambda a: a['query'] in ('range', 'overlap')),
+        inquirer.Text('start', message="From (YYYY-MM-DD)", default=today, validate=validate_date,
+                      ignore=lambda a: a['query'] != 'range'),
+        inquirer.Text('end', message="To (YYYY-MM-DD)", default=today, validate=validate_date,
+                      ignore=lambda a: a['query'] != 'range'),
+        inquirer.List('project', message="Project", choices=[p['name'] for p in projects] or [''],
+                      ignore=lambda a: a['query'] != 'overlap')
+    ]
+    answers = inquirer.prompt(questions)
+    timeline = store.index.timeline
+
+    if answers['query'] == 'active':
+        list_projects(timeline.active_on(answers['date']))
+    elif answers['query'] == 'frozen':
+        list_projects(timeline.frozen_on(answers['date']))
+    elif answers['query'] == 'range':
+        list_projects(timeline.overlapping(answers['start'], answers['end']))
+    elif answers['query'] == 'overlap':
+        list_projects(timeline.overlapping_project(answers['project']))
+    else:
+        list_requests(freeze_conflicts(store.index, answers['date']),
+                      f"FREEZE CONFLICTS ON {answers['date']}")
+
+def timeline_analytics(projects):
+    """Show per-project week statistics and weekly project load"""
+    engine = TimelineEngine.create(projects)
+    if engine is None:
+        console.print("[bold red]Error:[/bold red] Timeline analytics need NumPy (pip install numpy)")
+        return
+
+    stats = engine.project_stats()
+    if not stats:
+        console.print("[italic]No projects with valid dates found[/italic]")
+        return
+
+    columns = [
+        ("Project", {'style': "cyan", 'no_wrap': True}, 20),
+        ("Start CW", {'style': "green", 'justify': "right"}, 8),
+        ("End CW", {'style': "yellow", 'justify': "right"}, 8),
+        ("Freeze CW", {'style': "bright_red", 'justify': "right"}, 9),
+        ("Weeks", {'justify': "right"}, 6),
+        ("Freeze->End (days)", {'justify': "right"}, 18),
+        ("Overlaps", {'justify': "right"}, 8)
+    ]
+
+    def build_stats_row(row, markup):
+        return (
+            row['name'],
+            str(row['start_week']),
+            str(row['end_week']),
+            str(row['freeze_week'] or 'N/A'),
+            str(row['duration_weeks']),
+            str(row['freeze_to_end_days'] if row['freeze_to_end_days'] is not None else 'N/A'),
+            str(row['overlaps'])
+        )
+
+    show_paged("PROJECT TIMELINE", columns, stats, build_stats_row)
+
+    load_columns = [
+        ("Week", {'style': "cyan", 'no_wrap': True}, 8),
+        ("Monday", {'style': "green"}, 10),
+        ("Active", {'justify': "right"}, 6),
+        ("Frozen", {'style': "bright_red", 'justify': "right"}, 6),
+        ("Load", {}, 40)
+    ]
+
+    def build_load_row(week, markup):
+        bar = '█' * week['active']
+        if markup and week['frozen']:
+            bar = f"{'█' * (week['active'] - week['frozen'])}[bright_red]{'█' * week['frozen']}[/bright_red]"
+        return (
+            week['iso_week'],
+            week['week_start'],
+            str(week['active']),
+            str(week['frozen']),
+            bar
+        )
+
+    show_paged("WEEKLY PROJECT LOAD", load_columns, engine.weekly_load(), build_load_row)
 
 def add_project(config):
     """Add a new project"""
@@ -309,8 +610,7 @@ def add_project(config):
             'commonconfig': "true" if answers['commonconfig'] else "false"
         }
         
-        config['projects'].append(new_project)
-        save_config(config)
+        store.apply('add_project', project=new_project)
         console.print(f"[bold green]✓ Project '{answers['name']}' created successfully![/bold green]")
     else:
         console.print("[yellow]Project creation canceled[/yellow]")
@@ -321,14 +621,11 @@ def edit_project(config, projects):
         console.print("[italic yellow]No projects to edit[/italic yellow]")
         return
         
-    project_choices = [(f"{p['name']} (Start: {p.get('start_date', 'N/A')})", p) for p in projects]
-    
-    questions = [
-        inquirer.List('project', 
-                      message="Select project to edit",
-                      choices=project_choices)
-    ]
-    selected = inquirer.prompt(questions)['project']
+    selected = pick_records("Select project to edit", store.index.record_picker('projects'),
+                            lambda p: f"{p['name']} (Start: {p.get('start_date', 'N/A')})")
+    if selected is None:
+        console.print("[yellow]Project edit canceled[/yellow]")
+        return
     
     display_header(f"EDIT PROJECT: {selected['name']}")
     
@@ -350,18 +647,13 @@ def edit_project(config, projects):
     
     if answers['confirm']:
         # Update project in config
-        for project in config['projects']:
-            if project['name'] == selected['name']:
-                project.update({
-                    'name': answers['name'],
-                    'start_date': answers['start_date'],
-                    'end_date': answers['end_date'],
-                    'freeze_date': answers['freeze_date'],
-                    'commonconfig': "true" if answers['commonconfig'] else "false"
-                })
-                break
-        
-        save_config(config)
+        store.apply('edit_project', name=selected['name'], changes={
+            'name': answers['name'],
+            'start_date': answers['start_date'],
+            'end_date': answers['end_date'],
+            'freeze_date': answers['freeze_date'],
+            'commonconfig': "true" if answers['commonconfig'] else "false"
+        })
         console.print(f"[bold green]✓ Project '{answers['name']}' updated![/bold green]")
     else:
         console.print("[yellow]Project update canceled[/yellow]")
@@ -372,25 +664,18 @@ def remove_project(config, projects):
         console.print("[italic yellow]No projects to remove[/italic yellow]")
         return
         
-    project_choices = [(p['name'], p) for p in projects]
+    selected = pick_records("Select projects to remove", store.index.record_picker('projects'),
+                            lambda p: p['name'], multi=True)
     
     questions = [
-        inquirer.Checkbox('projects', 
-                          message="Select projects to remove",
-                          choices=project_choices),
-        inquirer.Confirm('confirm', message="Confirm deletion?", default=False)
+        inquirer.Confirm('confirm', message=f"Remove {len(selected)} project(s)?", default=False)
     ]
     
-    answers = inquirer.prompt(questions)
-    
-    if answers['confirm'] and answers['projects']:
+    if selected and inquirer.prompt(questions)['confirm']:
         # Create list of names to remove
-        to_remove = [p['name'] for p in answers['projects']]
+        to_remove = [p['name'] for p in selected]
         
-        # Filter out removed projects
-        config['projects'] = [p for p in config['projects'] if p['name'] not in to_remove]
-        
-        save_config(config)
+        store.apply('remove_projects', names=to_remove)
         console.print(f"[bold green]✓ Removed {len(to_remove)} project(s)[/bold green]")
     else:
         console.print("[yellow]Project removal canceled[/yellow]")
@@ -400,7 +685,8 @@ def remove_project(config, projects):
 def manage_change_requests():
     """Main menu for change request management"""
     while True:
-        config = load_config()
+        store.flush_dashboard()
+        config = store.get()
         requests = config.get('change_requests', [])
         filters = config.get('project_filters', [])
         
@@ -409,9 +695,12 @@ def manage_change_requests():
         choices = [
             ('List all requests', 'list'),
             ('Filter requests', 'filter'),
+            ('Search requests', 'search'),
             ('Add new request', 'add'),
             ('Edit existing request', 'edit'),
             ('Change request state', 'state'),
+            ('Update integration status', 'integration'),
+            ('State history analytics', 'history'),
             ('Remove request', 'remove'),
             ('Return to main menu', 'back')
         ]
@@ -425,18 +714,28 @@ def manage_change_requests():
         
         if action == 'back':
             return
-        elif action == 'list':
-            list_requests(requests)
-        elif action == 'filter':
-            filter_requests(requests, filters)
-        elif action == 'add':
-            add_request(config, filters)
-        elif action == 'edit':
-            edit_request(config, requests, filters)
-        elif action == 'state':
-            change_request_state(config, requests)
-        elif action == 'remove':
-            remove_request(config, requests)
+
+        try:
+            if action == 'list':
+                list_requests(requests)
+            elif action == 'filter':
+                filter_requests(filters)
+            elif action == 'search':
+                search_requests()
+            elif action == 'add':
+                add_request(config, filters)
+            elif action == 'edit':
+                edit_request(config, requests, filters)
+            elif action == 'state':
+                change_request_state(config, requests)
+            elif action == 'integration':
+                update_integration(config, requests)
+            elif action == 'history':
+                history_analytics(filters)
+            elif action == 'remove':
+                remove_request(config, requests)
+        except ConflictError as error:
+            report_conflicts(error)
 
 def list_requests(requests, title="ALL CHANGE REQUESTS"):
     """Display change requests in a formatted table"""
@@ -444,45 +743,57 @@ def list_requests(requests, title="ALL CHANGE REQUESTS"):
         console.print("[italic]No change requests found[/italic]")
         return
 
-    table = Table(title=f"\n{title}", box=box.ROUNDED, header_style="bold magenta")
-    table.add_column("Title", style="cyan", no_wrap=True)
-    table.add_column("Project", style="green")
-    table.add_column("State", style="yellow")
-    table.add_column("Created", style="bright_blue")
-    table.add_column("Body Preview", style="white")
+    columns = [
+        ("Title", {'style': "cyan", 'no_wrap': True}, 16),
+        ("Project", {'style': "green"}, 18),
+        ("State", {'style': "yellow"}, 16),
+        ("Created", {'style': "bright_blue"}, 10),
+        ("Body Preview", {'style': "white"}, 60)
+    ]
 
-    for req in requests:
-        # Truncate body for display
-        body_preview = req['body'][:30] + '...' if len(req['body']) > 30 else req['body']
-        
-        # State styling with new fulfilled_prio state
-        state_style = {
-            'open': 'bright_red',
-            'in_progress': 'bright_yellow',
-            'integrated': 'bright_green',
-            'fulfilled_prio': 'bright_magenta'  # NEW STATE STYLE
-        }.get(req['state'], 'white')
+    # State styling with new fulfilled_prio state
+    state_styles = {
+        'open': 'bright_red',
+        'in_progress': 'bright_yellow',
+        'integrated': 'bright_green',
+        'fulfilled_prio': 'bright_magenta'  # NEW STATE STYLE
+    }
+
+    def build_row(req, markup):
+        # Truncate body for display, the pager has room for a longer preview
+        limit = 30 if markup else 60
+        body_preview = req['body'][:limit] + '...' if len(req['body']) > limit else req['body']
         
         # Display text for new state
         display_state = "fulfilled (prio)" if req['state'] == 'fulfilled_prio' else req['state']
+        if markup:
+            state_style = state_styles.get(req['state'], 'white')
+            display_state = f'[{state_style}]{display_state}[/{state_style}]'
         
-        table.add_row(
+        return (
             req['title'],
             req.get('project', 'N/A'),
-            f'[{state_style}]{display_state}[/{state_style}]',
+            display_state,
             req.get('created', 'N/A'),
             body_preview
         )
     
-    console.print(table)
+    show_paged(title, columns, requests, build_row)
 
-def filter_requests(requests, filters):
+def filter_requests(filters):
     """Filter requests by project and state"""
     display_header("FILTER REQUESTS")
     
-    # Add new state to choices
-    state_choices = ['open', 'in_progress', 'integrated', 'fulfilled_prio', 'all']
-    filter_choices = filters + ['all']
+    # Counts come from the (project, state) buckets without scanning requests
+    index = store.index
+    filter_choices = [(f"{p} ({index.count(project=p)})", p) for p in filters]
+    filter_choices.append((f"all ({index.count()})", 'all'))
+
+    def state_choices(answers):
+        project = None if answers['project'] == 'all' else answers['project']
+        choices = [(f"{s} ({index.count(project, s)})", s) for s in State]
+        choices.append((f"all ({index.count(project)})", 'all'))
+        return choices
     
     questions = [
         inquirer.List('project', 
@@ -494,25 +805,36 @@ def filter_requests(requests, filters):
     ]
     
     filters = inquirer.prompt(questions)
-    filtered = requests.copy()
-    
-    # Apply project filter
-    if filters['project'] != 'all':
-        filtered = [r for r in filtered if r.get('project') == filters['project']]
     
-    # Apply state filter
-    if filters['state'] != 'all':
-        filtered = [r for r in filtered if r.get('state') == filters['state']]
+    # Apply project and state filters in the storage backend
+    filtered = store.query_requests(
+        project=None if filters['project'] == 'all' else filters['project'],
+        state=None if filters['state'] == 'all' else filters['state']
+    )
     
     # Format title with state display name
     state_display = {
-        'fulfilled_prio': 'fulfilled (prio)',
-        'in_progress': 'in progress'
-    }.get(filters['state'], filters['state'])
+        State.FULFILLED_PRIO: 'fulfilled (prio)',
+        State.IN_PROGRESS: 'in progress'
+    }.get(filters['state'], str(filters['state']))
     
     title = f"REQUESTS: {filters['project'].upper()} | {state_display.upper()}"
     list_requests(filtered, title)
 
+def search_requests():
+    """Search requests by words, BCC components, tickets and references"""
+    display_header("SEARCH REQUESTS")
+    console.print("[italic]Examples: 'bcc:EbOs', 'ticket:RQONE04630550', "
+                  "'ref:RQONE04617456_IOSRV_MG1CS311_DMA', 'dma config'[/italic]\n")
+
+    questions = [
+        inquirer.Text('query', message="Search")
+    ]
+    query = inquirer.prompt(questions)['query']
+
+    results = store.index.search_requests(query)
+    list_requests(results, f"SEARCH: {query.upper()}")
+
 def add_request(config, filters):
     """Add a new change request"""
     display_header("ADD CHANGE REQUEST")
@@ -547,8 +869,7 @@ def add_request(config, filters):
             'created': answers['created']
         }
         
-        config['change_requests'].append(new_request)
-        save_config(config)
+        store.apply('add_request', request=new_request)
         console.print(f"[bold green]✓ Request '{answers['title']}' created![/bold green]")
     else:
         console.print("[yellow]Request creation canceled[/yellow]")
@@ -559,14 +880,10 @@ def edit_request(config, requests, filters):
         console.print("[italic yellow]No change requests to edit[/italic yellow]")
         return
         
-    request_choices = [(f"{r['title']} ({r['project']})", r) for r in requests]
-    
-    questions = [
-        inquirer.List('request', 
-                      message="Select request to edit",
-                      choices=request_choices)
-    ]
-    selected = inquirer.prompt(questions)['request']
+    selected = pick_records("Select request to edit", store.index.picker, request_label)
+    if selected is None:
+        console.print("[yellow]Request edit canceled[/yellow]")
+        return
     
     display_header(f"EDIT REQUEST: {selected['title']}")
     
@@ -588,17 +905,12 @@ def edit_request(config, requests, filters):
     
     if answers['confirm']:
         # Update request in config
-        for req in config['change_requests']:
-            if req['title'] == selected['title'] and req.get('project') == selected.get('project'):
-                req.update({
-                    'title': answers['title'],
-                    'body': answers['body'],
-                    'project': answers['project'],
-                    'created': answers['created']
-                })
-                break
-        
-        save_config(config)
+        store.apply('edit_request', key=request_key(selected), changes={
+            'title': answers['title'],
+            'body': answers['body'],
+            'project': answers['project'],
+            'created': answers['created']
+        })
         console.print(f"[bold green]✓ Request '{answers['title']}' updated![/bold green]")
     else:
         console.print("[yellow]Request update canceled[/yellow]")
@@ -609,15 +921,16 @@ def change_request_state(config, requests):
         console.print("[italic yellow]No change requests to modify[/italic yellow]")
         return
         
-    request_choices = [(f"{r['title']} ({r['project']} - {r['state']})", r) for r in requests]
+    selected = pick_records("Select request", store.index.picker,
+                            lambda r: f"{r['title']} ({r['project']} - {r['state']})")
+    if selected is None:
+        console.print("[yellow]State change canceled[/yellow]")
+        return
     
     # Add new state to choices
-    state_choices = ['open', 'in_progress', 'integrated', 'fulfilled_prio']
+    state_choices = [(str(s), s) for s in State]
     
     questions = [
-        inquirer.List('request', 
-                      message="Select request",
-                      choices=request_choices),
         inquirer.List('state', 
                       message="New state",
                       choices=state_choices),
@@ -628,77 +941,637 @@ def change_request_state(config, requests):
     
     if answers['confirm']:
         # Update request state in config
-        selected = answers['request']
-        for req in config['change_requests']:
-            if req['title'] == selected['title'] and req.get('project') == selected.get('project'):
-                old_state = req['state']
-                req['state'] = answers['state']
-                break
-        
-        save_config(config)
+        old_state, new_state = selected.state, answers['state']
         
         # Display friendly state names
-        state_names = {
-            'fulfilled_prio': 'fulfilled (in prio version)',
-            'in_progress': 'in progress'
-        }
-        old_display = state_names.get(old_state, old_state)
-        new_display = state_names.get(answers['state'], answers['state'])
+        old_display = STATE_NAMES.get(old_state, str(old_state))
+        new_display = STATE_NAMES.get(new_state, str(new_state))
+
+        if new_state == old_state:
+            console.print(f"[yellow]Request is already {old_display}[/yellow]")
+            return
+
+        store.apply('change_request_state', key=request_key(selected), state=str(new_state))
         
         console.print(f"[bold green]✓ State changed from {old_display} to {new_display}![/bold green]")
     else:
         console.print("[yellow]State change canceled[/yellow]")
 
+def update_integration(config, requests):
+    """Record the integration status of a request on one target branch"""
+    targets = [t['name'] for t in (config.get('integration') or {}).get('targets') or []]
+    if not requests or not targets:
+        console.print("[italic yellow]No requests or integration targets configured[/italic yellow]")
+        return
+
+    selected = pick_records("Select request", store.index.picker, request_label)
+    if selected is None:
+        console.print("[yellow]Integration update canceled[/yellow]")
+        return
+
+    questions = [
+        inquirer.List('target', 
+                      message="Integration target",
+                      choices=targets),
+        inquirer.List('status', 
+                      message="Status",
+                      choices=INTEGRATION_STATES),
+        inquirer.Text('pver', 
+                      message="PVER (optional)",
+                      ignore=lambda a: a['status'] != 'integrated'),
+        inquirer.Confirm('confirm', message="Save integration status?", default=True)
+    ]
+    
+    answers = inquirer.prompt(questions)
+    
+    if answers['confirm']:
+        store.apply('set_integration', key=request_key(selected), target=answers['target'],
+                    status=answers['status'], pver=answers.get('pver') or None)
+        console.print(f"[bold green]✓ {selected['title']} on {answers['target']}: "
+                      f"{answers['status']}[/bold green]")
+    else:
+        console.print("[yellow]Integration update canceled[/yellow]")
+
+def history_analytics(filters):
+    """Show cycle times per project and weekly WIP and throughput"""
+    analytics = HistoryAnalytics.create(store.history, store.get().get('change_requests', []))
+    if analytics is None:
+        console.print("[bold red]Error:[/bold red] History analytics need NumPy (pip install numpy)")
+        return
+    if not len(analytics.ids):
+        console.print("[italic]No state changes recorded yet[/italic]")
+        return
+
+    columns = [
+        ("Project", {'style': "cyan", 'no_wrap': True}, 20),
+        ("Completed", {'justify': "right"}, 9),
+        ("Mean (days)", {'style': "green", 'justify': "right"}, 11),
+        ("Median (days)", {'justify': "right"}, 13),
+        ("90th pct (days)", {'style': "yellow", 'justify': "right"}, 15)
+    ]
+
+    def build_cycle_row(row, markup):
+        return (
+            row['project'] or 'N/A',
+            str(row['completed']),
+            str(row['mean_days']),
+            str(row['p50_days']),
+            str(row['p90_days'])
+        )
+
+    show_paged("CYCLE TIME (FIRST STATE -> INTEGRATED/FULFILLED)", columns,
+               analytics.cycle_times(), build_cycle_row)
+
+    questions = [
+        inquirer.List('project',
+                      message="Weekly flow for project",
+                      choices=[('All projects', None)] + [(f, f) for f in filters])
+    ]
+    project = inquirer.prompt(questions)['project']
+
+    weekly_columns = [
+        ("Week", {'style': "cyan", 'no_wrap': True}, 8),
+        ("Monday", {'style': "green"}, 10),
+        ("Open", {'justify': "right"}, 6),
+        ("In progress", {'style': "yellow", 'justify': "right"}, 11),
+        ("Completed", {'style': "bright_green", 'justify': "right"}, 9)
+    ]
+
+    def build_weekly_row(week, markup):
+        return (
+            week['iso_week'],
+            week['week_start'],
+            str(week['open']),
+            str(week['in_progress']),
+            str(week['completed'])
+        )
+
+    show_paged(f"WEEKLY FLOW: {project or 'ALL PROJECTS'}", weekly_columns,
+               analytics.weekly(project), build_weekly_row)
+
 def remove_request(config, requests):
     """Remove change requests"""
     if not requests:
         console.print("[italic yellow]No change requests to remove[/italic yellow]")
         return
         
-    request_choices = [(f"{r['title']} ({r['project']})", r) for r in requests]
+    selected = pick_records("Select requests to remove", store.index.picker, request_label,
+                            multi=True)
     
     questions = [
-        inquirer.Checkbox('requests', 
-                          message="Select requests to remove",
-                          choices=request_choices),
-        inquirer.Confirm('confirm', message="Confirm deletion?", default=False)
+        inquirer.Confirm('confirm', message=f"Remove {len(selected)} request(s)?", default=False)
     ]
     
-    answers = inquirer.prompt(questions)
-    
-    if answers['confirm'] and answers['requests']:
+    if selected and inquirer.prompt(questions)['confirm']:
         # Create list of identifiers for removal
-        to_remove = []
-        for req in answers['requests']:
-            to_remove.append((req['title'], req.get('project')))
-        
-        # Filter out removed requests
-        config['change_requests'] = [
-            r for r in config['change_requests'] 
-            if (r['title'], r.get('project')) not in to_remove
-        ]
+        to_remove = [request_key(req) for req in selected]
         
-        save_config(config)
+        store.apply('remove_requests', keys=to_remove)
         console.print(f"[bold green]✓ Removed {len(to_remove)} request(s)[/bold green]")
     else:
         console.print("[yellow]Request removal canceled[/yellow]")
 
+# ------------------ BULK COMMANDS ------------------
+# Non-interactive commands: input is streamed line by line into a batch
+# session, whose commit writes all changes at once.
+
+def open_input(path):
+    """Open a file argument, '-' meaning stdin"""
+    return sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+
+def read_jsonl(stream):
+    """Yield one JSON object per non-empty line"""
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            console.print(f"[bold red]Error:[/bold red] line {lineno}: {e}", style="red")
+            sys.exit(1)
+
+def read_selectors(titles, project, path):
+    """Yield (title, project) selectors, project None matching any project"""
+    for title in titles:
+        yield (title, project)
+    if path:
+        with open_input(path) as stream:
+            for record in read_jsonl(stream):
+                yield (record['title'], record.get('project', project))
+
+def import_requests(session, records, today):
+    """Add new requests to a batch session, skipping (title, project) keys already present"""
+    index = session.index
+    added = skipped = 0
+
+    for record in records:
+        request = {
+            'title': record['title'],
+            'body': record.get('body', ''),
+            'project': record.get('project'),
+            'state': record.get('state', 'open'),
+            'created': record.get('created', today)
+        }
+        if request['state'] not in REQUEST_STATES:
+            console.print(f"[bold red]Error:[/bold red] Unknown state '{request['state']}' "
+                          f"for {request['title']}", style="red")
+            sys.exit(1)
+
+        if request_key(request) in index.requests:
+            skipped += 1
+            continue
+        session.apply('add_request', request=request)
+        added += 1
+    return added, skipped
+
+def set_requests_state(session, selectors, state):
+    """Set the state of all requests matching the selectors in a batch session"""
+    changed = set()
+    for req in session.find_requests(selectors):
+        key = request_key(req)
+        if req.state != State.parse(state) and key not in changed:
+            session.apply('change_request_state', key=list(key), state=state)
+            changed.add(key)
+    return len(changed)
+
+def remove_requests(session, selectors):
+    """Remove all requests matching the selectors with a single change"""
+    keys = {request_key(req): None for req in session.find_requests(selectors)}
+    if keys:
+        session.apply('remove_requests', keys=[list(key) for key in keys])
+    return len(keys)
+
+def export_requests(requests, stream):
+    """Write requests as JSONL, one line at a time"""
+    count = 0
+    for req in requests:
+        stream.write(json.dumps(req, ensure_ascii=False, default=record_json) + '\n')
+        count += 1
+    return count
+
+def run_timeline_query(args):
+    """Print the result of a timeline query as JSONL"""
+    index = store.index
+    day = args.target or datetime.now().strftime('%Y-%m-%d')
+
+    if args.query in ('stats', 'load'):
+        engine = TimelineEngine.create(index.config.get('projects') or [])
+        if engine is None:
+            console.print("[bold red]Error:[/bold red] Timeline analytics need NumPy (pip install numpy)", style="red")
+            sys.exit(1)
+        export_requests(engine.project_stats() if args.query == 'stats' else engine.weekly_load(), sys.stdout)
+        return
+
+    try:
+        if args.query == 'active':
+            result = index.timeline.active_on(day)
+        elif args.query == 'frozen':
+            result = index.timeline.frozen_on(day)
+        elif args.query == 'overlap' and args.to:
+            result = index.timeline.overlapping(day, args.to)
+        elif args.query == 'overlap':
+            if args.target not in index.projects:
+                console.print(f"[bold red]Error:[/bold red] Unknown project '{args.target}'", style="red")
+                sys.exit(1)
+            result = index.timeline.overlapping_project(args.target)
+        else:
+            result = freeze_conflicts(index, day)
+    except ValueError:
+        console.print("[bold red]Error:[/bold red] Invalid date format. Please use YYYY-MM-DD", style="red")
+        sys.exit(1)
+    export_requests(result, sys.stdout)
+
+def run_bulk_command(args):
+    """Execute one of the non-interactive request commands"""
+    if args.command == 'search':
+        export_requests(store.index.search_requests(' '.join(args.query)), sys.stdout)
+        return
+    elif args.command == 'timeline':
+        run_timeline_query(args)
+        return
+    elif args.command == 'history':
+        analytics = HistoryAnalytics.create(store.history, store.get().get('change_requests', []))
+        if analytics is None:
+            console.print("[bold red]Error:[/bold red] History analytics need NumPy (pip install numpy)", style="red")
+            sys.exit(1)
+        if args.report == 'cycle-time':
+            export_requests(analytics.cycle_times(), sys.stdout)
+        else:
+            export_requests(analytics.weekly(args.project), sys.stdout)
+        return
+    elif args.command == 'export':
+        columns = args.columns.split(',') if args.columns else None
+        try:
+            count = export_report(store, args.dataset, args.output, export_format(args.output, args.format),
+                                  columns, args.project, args.state)
+        except ValueError as error:
+            console.print(f"[bold red]Error:[/bold red] {error}", style="red")
+            sys.exit(1)
+        if args.output != '-':
+            console.print(f"[bold green]✓ Exported {count} row(s) to {args.output}[/bold green]")
+        return
+    elif args.command == 'validate':
+        issues = ConfigValidator(args.workers).validate(store.index)
+        if args.output == '-':
+            export_requests(issues, sys.stdout)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as stream:
+                export_requests(issues, stream)
+        errors = sum(1 for issue in issues if issue['severity'] == 'error')
+        if args.output != '-':
+            console.print(f"[bold]{errors} error(s), {len(issues) - errors} warning(s)[/bold] "
+                          f"written to {args.output}")
+        if errors:
+            sys.exit(1)
+        return
+    elif args.command == 'export-requests':
+        requests = store.query_requests(project=args.project, state=args.state)
+        if args.output == '-':
+            export_requests(requests, sys.stdout)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as stream:
+                count = export_requests(requests, stream)
+            console.print(f"[bold green]✓ Exported {count} request(s) to {args.output}[/bold green]")
+        return
+
+    # Input is streamed into a batch session; only its commit takes the lock
+    try:
+        with store.transaction():
+            if args.command == 'import-requests':
+                with open_input(args.file) as stream:
+                    changed, skipped = import_requests(store, read_jsonl(stream),
+                                                       datetime.now().strftime('%Y-%m-%d'))
+                message = f"Imported {changed} request(s), skipped {skipped} duplicate(s)"
+            elif args.command == 'set-state':
+                changed = set_requests_state(store, read_selectors(args.titles, args.project, args.input),
+                                             args.state)
+                message = f"Set {changed} request(s) to {args.state}"
+            elif args.command == 'remove':
+                changed = remove_requests(store, read_selectors(args.titles, args.project, args.input))
+                message = f"Removed {changed} request(s)"
+    except ValidationError as error:
+        console.print(f"[bold red]Error:[/bold red] {error}, nothing was changed", style="red")
+        sys.exit(1)
+    except ConflictError as error:
+        # Changes to records nobody else touched were saved
+        console.print(f"[bold red]Error:[/bold red] {error}", style="red")
+        sys.exit(1)
+
+    console.print(f"[bold green]✓ {message}[/bold green]")
+
+def run_client(args):
+    """Send a 'call' command to the daemon and print the result"""
+    request = {'cmd': args.cmd}
+    for param in args.params:
+        name, sep, value = param.partition('=')
+        if not sep:
+            print(f"Error: expected NAME=VALUE, got '{param}'", file=sys.stderr)
+            sys.exit(2)
+        try:
+            request[name] = json.loads(value)
+        except ValueError:
+            request[name] = value
+    try:
+        result = call_daemon(request)
+    except OSError as error:
+        print(f"Error: no daemon on {DAEMON_SOCKET} ({error}), start one with 'mgr.py serve'",
+              file=sys.stderr)
+        sys.exit(1)
+    except DaemonError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    if isinstance(result, list):
+        export_requests(result, sys.stdout)
+    elif isinstance(result, dict):
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print(result)
+
+# ------------------ QUERY MODE ------------------
+# Fast non-interactive reads: only the YAML loader is imported.
+def run_query(args):
+    """Print one value of the configuration without starting the UI"""
+    try:
+        value = query_config(store.get(), args.path)
+    except (KeyError, IndexError, ValueError, TypeError):
+        print(f"Error: '{args.path}' not found in {CONFIG_FILE}", file=sys.stderr)
+        sys.exit(1)
+
+    if isinstance(value, (dict, list, Record)):
+        if args.format == 'yaml':
+            print(yaml.dump(value, Dumper=RecordDumper, sort_keys=False), end='')
+        else:
+            print(json.dumps(value, indent=2, ensure_ascii=False, default=record_json))
+    else:
+        print(value)
+
+def print_timing_report(marks):
+    """Print how long each startup phase took to stderr"""
+    previous = _START_TIME
+    for label, moment in marks:
+        print(f"{label:<12} {(moment - previous) * 1000:8.2f} ms", file=sys.stderr)
+        previous = moment
+    print(f"{'total':<12} {(previous - _START_TIME) * 1000:8.2f} ms", file=sys.stderr)
+
+    heavy = [name for name in ('inquirer', 'rich', 'sqlite3') if name in sys.modules]
+    print(f"yaml loader  {YAML_LOADER.__name__}", file=sys.stderr)
+    print(f"ui modules   {', '.join(heavy) or 'none'}", file=sys.stderr)
+    print("snapshot     " + ", ".join(
+        f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+        for name, value in SNAPSHOT_STATS.items()), file=sys.stderr)
+
 # ------------------ MAIN FUNCTION ------------------
 
 def print_welcome():
     """Display welcome message and background text"""
-    config = load_config()
+    config = store.get()
     bg_text = config.get('background_text', 'CommonConfig Management System')
     
     console.print(f"\n[bold bright_cyan]{'=' * 60}[/bold bright_cyan]")
-    console.print(f"[bold bright_yellow]COMMONCONFIG MANAGEMENT SYSTEM[/bold bright_yellow]".center(60))
+    console.print("[bold bright_yellow]COMMONCONFIG MANAGEMENT SYSTEM[/bold bright_yellow]".center(60))
     console.print(f"[bold bright_cyan]{'=' * 60}[/bold bright_cyan]")
     console.print(f"\n[italic bright_white]{bg_text}[/italic bright_white]\n")
 
+def validate_config():
+    """Check the whole configuration and list the issues found"""
+    issues = VALIDATOR.validate(store.index)
+    # Listed here, so the pre-save hook does not repeat them
+    VALIDATOR.unreported(issues)
+    if not issues:
+        console.print("[bold green]✓ No validation issues found[/bold green]")
+        return
+
+    columns = [
+        ("Severity", {'no_wrap': True}, 8),
+        ("Rule", {'style': "cyan"}, 10),
+        ("Record", {'style': "green"}, 40),
+        ("Message", {'style': "white"}, 60)
+    ]
+
+    def build_row(issue, markup):
+        severity = issue['severity']
+        if markup:
+            style = 'bright_red' if severity == 'error' else 'bright_yellow'
+            severity = f'[{style}]{severity}[/{style}]'
+        return (
+            severity,
+            issue['rule'],
+            f"{SECTION_LABELS[issue['section']]} {issue['record']}",
+            issue['message']
+        )
+
+    errors = sum(1 for issue in issues if issue['severity'] == 'error')
+    show_paged(f"VALIDATION: {errors} ERROR(S), {len(issues) - errors} WARNING(S)",
+               columns, issues, build_row)
+
+def export_reports():
+    """Write a dataset to a file for reporting"""
+    display_header("EXPORT REPORTS")
+    config = store.get()
+    projects = list(dict.fromkeys([p['name'] for p in config.get('projects') or []] +
+                                  (config.get('project_filters') or [])))
+
+    choices = [
+        ('Change requests', 'requests'),
+        ('Project timelines', 'timelines'),
+        ('Divergences', 'divergences'),
+        ('State history', 'history')
+    ]
+
+    questions = [
+        inquirer.List('dataset', message="Export", choices=choices),
+        inquirer.List('format', message="Format",
+                      choices=[fmt for fmt in EXPORT_FORMATS if export_available(fmt)]),
+        inquirer.List('project', message="Filter by project", choices=projects + ['all']),
+        inquirer.List('state', message="Filter by state", choices=REQUEST_STATES + ['all'],
+                      ignore=lambda a: a['dataset'] not in ('requests', 'history')),
+        inquirer.Text('path', message="Output file",
+                      default=lambda a: f"{a['dataset']}.{a['format']}")
+    ]
+    answers = inquirer.prompt(questions)
+
+    try:
+        count = export_report(store, answers['dataset'], answers['path'], answers['format'],
+                              project=None if answers['project'] == 'all' else answers['project'],
+                              state=None if answers['state'] in (None, 'all') else answers['state'])
+    except ValueError as error:
+        console.print(f"[bold red]Error:[/bold red] {error}", style="red")
+        return
+    console.print(f"[bold green]✓ Exported {count} row(s) to {answers['path']}[/bold green]")
+
+def commit_session():
+    """Write the changes of the batch session, False if some were refused"""
+    try:
+        count = store.commit()
+    except ConflictError as error:
+        report_conflicts(error)
+        return False
+    console.print(f"[bold green]✓ Committed {count} change(s)[/bold green]")
+    return True
+
+def rollback_session():
+    """Discard the changes of the batch session"""
+    count = store.rollback()
+    console.print(f"[yellow]Rolled back {count} change(s)[/yellow]")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="CommonConfig management system")
+    parser.add_argument('--backend', choices=['yaml', 'sqlite'],
+                        default=os.environ.get('CCDB_BACKEND', 'yaml'),
+                        help="storage backend (default: yaml, or $CCDB_BACKEND)")
+    parser.add_argument('--no-tui', action='store_true',
+                        help="never start the interactive menus, fail if no command is given")
+    parser.add_argument('--timing', action='store_true',
+                        help="print a startup timing report to stderr")
+    parser.add_argument('--validate-mode', choices=VALIDATION_MODES, default=validation.VALIDATION_MODE,
+                        help="validation before each write: off, warn about new errors, or strict "
+                             "to refuse writes with errors (default: warn, or $CCDB_VALIDATE)")
+    parser.add_argument('--profile', action='store_true',
+                        default=os.environ.get('CCDB_PROFILE', '') not in ('', '0'),
+                        help="time loads, saves, tables and prompts and print a summary at exit "
+                             "(or $CCDB_PROFILE=1)")
+    parser.add_argument('--profile-export', metavar='FILE',
+                        default=os.environ.get('CCDB_PROFILE_EXPORT'),
+                        help="also write the spans to FILE, implies --profile (or $CCDB_PROFILE_EXPORT)")
+    parser.add_argument('--profile-format', choices=['chrome', 'speedscope'], default='chrome',
+                        help="export format: Chrome trace event JSON or speedscope (default: chrome)")
+    commands = parser.add_subparsers(dest='command')
+
+    query = commands.add_parser('query', help="print a configuration value without starting the UI")
+    query.add_argument('path', nargs='?', default='',
+                       help="dotted path such as 'common_config_version' or 'projects.0.name'")
+    query.add_argument('--format', choices=['json', 'yaml'], default='json',
+                       help="output format for lists and mappings (default: json)")
+
+    migrate = commands.add_parser('migrate-sqlite', help=f"copy {CONFIG_FILE} into {DB_FILE}")
+    migrate.add_argument('--force', action='store_true', help="overwrite an existing database")
+    commands.add_parser('export-yaml', help=f"write {DB_FILE} back to {CONFIG_FILE}")
+    commands.add_parser('export-dashboard', help=f"write {DASHBOARD_FILE} for index.html")
+    commands.add_parser('generate-hints', help=f"regenerate changed sections of {HINTS_FILE}")
+
+    importer = commands.add_parser('import-requests', help="add change requests from a JSONL file")
+    importer.add_argument('file', help="JSONL file with title/body/project/state/created, '-' for stdin")
+
+    exporter = commands.add_parser('export-requests', help="write change requests as JSONL")
+    exporter.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    exporter.add_argument('--project', help="only requests of this project")
+    exporter.add_argument('--state', choices=REQUEST_STATES, help="only requests in this state")
+
+    validate = commands.add_parser('validate', help="check dates, states, references and duplicate "
+                                                    "keys, exit 1 on errors")
+    validate.add_argument('-o', '--output', default='-', help="JSONL issue file (default: stdout)")
+    validate.add_argument('--workers', type=int, default=VALIDATION_WORKERS,
+                          help="processes for big files (default: CPU count, or $CCDB_VALIDATE_WORKERS)")
+
+    report = commands.add_parser('export', help="stream requests, project timelines, divergences or "
+                                                "the state history into CSV, JSONL, Parquet, Arrow or Excel")
+    report.add_argument('dataset', choices=list(EXPORT_COLUMNS))
+    report.add_argument('-o', '--output', default='-',
+                        help="output file, its extension picks the format (default: CSV on stdout)")
+    report.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="parquet and arrow need pyarrow, xlsx needs openpyxl")
+    report.add_argument('--columns', help="comma-separated columns in output order (default: all)")
+    report.add_argument('--project', help="only rows of this project")
+    report.add_argument('--state', choices=REQUEST_STATES,
+                        help="only requests in this state, or history transitions into it")
+
+    search = commands.add_parser('search', help="print change requests matching a search query")
+    search.add_argument('query', nargs='+',
+                        help="words and bcc:/ticket:/ref: terms, all must match")
+
+    timeline = commands.add_parser('timeline', help="date queries over projects")
+    timeline.add_argument('query', choices=['active', 'frozen', 'overlap', 'freeze-conflicts', 'stats', 'load'])
+    timeline.add_argument('target', nargs='?',
+                          help="date (YYYY-MM-DD, default today) or, for overlap, a project name")
+    timeline.add_argument('--to', help="end of the date range for overlap")
+
+    history = commands.add_parser('history', help="analytics over the request state history")
+    history.add_argument('report', choices=['cycle-time', 'weekly'],
+                         help="cycle days per project, or open/in-progress/completed counts per week")
+    history.add_argument('--project', help="only requests of this project (weekly)")
+
+    commands.add_parser('serve', help=f"keep the configuration in memory and answer requests on {DAEMON_SOCKET}")
+    dashboard = commands.add_parser('dashboard', help="serve index.html with live updates over HTTP")
+    dashboard.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    dashboard.add_argument('--port', type=int, default=8000, help="port to listen on (default: 8000)")
+    client = commands.add_parser('call', help="send one request to a running 'mgr.py serve'")
+    client.add_argument('cmd', choices=list(DAEMON_COMMANDS))
+    client.add_argument('params', nargs='*',
+                        help="NAME=VALUE arguments, values are parsed as JSON when possible "
+                             "(e.g. state=open titles='[\"RQONE04617456\"]')")
+
+    for name, help_text in (('set-state', "change the state of change requests"),
+                            ('remove', "remove change requests")):
+        command = commands.add_parser(name, help=help_text)
+        if name == 'set-state':
+            command.add_argument('state', choices=REQUEST_STATES)
+        command.add_argument('titles', nargs='*', help="request titles")
+        command.add_argument('--project', help="only match requests of this project")
+        command.add_argument('--input', help="JSONL file with title/project selectors, '-' for stdin")
+
+    return parser.parse_args(argv)
+
 def main():
+    global store, inquirer
+    marks = [('imports', time.perf_counter())]
+    args = parse_args()
+    validation.VALIDATION_MODE = args.validate_mode
+    if args.profile or args.profile_export:
+        enable_profiling(_START_TIME, args.profile_export, args.profile_format)
+        inquirer = ProfiledPrompts(inquirer)
+
+    if args.command == 'call':
+        run_client(args)
+        return
+    elif args.command == 'query':
+        store = open_store(args.backend)
+        store.get()
+        marks.append(('load config', time.perf_counter()))
+        run_query(args)
+        marks.append(('query', time.perf_counter()))
+        if args.timing:
+            print_timing_report(marks)
+        return
+    elif args.no_tui and args.command is None:
+        print("Error: --no-tui needs a command, see 'mgr.py --help'", file=sys.stderr)
+        sys.exit(2)
+
+    if args.command == 'migrate-sqlite':
+        migrate_to_sqlite(args.force)
+        return
+    elif args.command == 'export-yaml':
+        export_sqlite_to_yaml()
+        return
+
+    store = open_store(args.backend)
+
+    if args.command == 'serve':
+        serve(store, args.backend)
+        return
+    elif args.command == 'dashboard':
+        from ccdb.dashboard_server import serve_dashboard
+        serve_dashboard(store, args.backend, args.host, args.port)
+        return
+    elif args.command in ('import-requests', 'export-requests', 'search', 'timeline', 'history',
+                        'set-state', 'remove', 'validate', 'export'):
+        run_bulk_command(args)
+        return
+    elif args.command == 'export-dashboard':
+        write_dashboard(store.get())
+        console.print(f"[bold green]✓ Wrote {DASHBOARD_FILE}[/bold green]")
+        return
+    elif args.command == 'generate-hints':
+        changed = generate_integration_hints(store.get())
+        console.print(f"[bold green]✓ {changed} section(s) of {HINTS_FILE} regenerated[/bold green]")
+        return
+
     print_welcome()
     
     while True:
+        store.flush_dashboard()
         display_header("MAIN MENU")
         
         choices = [
@@ -706,8 +1579,15 @@ def main():
             ('Manage Change Requests', 'requests'),
             ('Manage Divergences', 'divergences'),
             ('View Full Configuration', 'view'),
-            ('Exit', 'exit')
+            ('Validate Configuration', 'validate'),
+            ('Export Reports', 'export')
         ]
+        if store.pending is None:
+            choices.append(('Start batch session', 'begin'))
+        else:
+            choices.append((f'Commit batch session ({store.pending} change(s))', 'commit'))
+            choices.append(('Rollback batch session', 'rollback'))
+        choices.append(('Exit', 'exit'))
         
         questions = [
             inquirer.List('action',
@@ -717,6 +1597,22 @@ def main():
         action = inquirer.prompt(questions)['action']
         
         if action == 'exit':
+            if store.pending:
+                questions = [
+                    inquirer.Confirm('commit',
+                                     message=f"Commit {store.pending} pending change(s)?",
+                                     default=True)
+                ]
+                if inquirer.prompt(questions)['commit']:
+                    if not commit_session():
+                        # Refused changes stay in the session or were dropped as conflicts
+                        continue
+                else:
+                    rollback_session()
+            elif store.pending == 0:
+                # Closes a session without changes
+                store.rollback()
+            store.compact()
             console.print("\n[bold bright_green]Goodbye![/bold bright_green]\n")
             break
         elif action == 'projects':
@@ -726,8 +1622,20 @@ def main():
         elif action == 'divergences':
             manage_divergences()
         elif action == 'view':
-            config = load_config()
+            config = store.get()
             console.print(config)
+        elif action == 'validate':
+            validate_config()
+        elif action == 'export':
+            export_reports()
+        elif action == 'begin':
+            store.begin()
+            console.print("[bold green]✓ Batch session started, changes are kept in memory "
+                          "until you commit[/bold green]")
+        elif action == 'commit':
+            commit_session()
+        elif action == 'rollback':
+            rollback_session()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ccdb import validation  # noqa: E402
+from ccdb.store import CONFIG_FILE, ConfigStore  # noqa: E402
+
+def sample_config():
+    """Small configuration in the shape of config.yaml"""
+    return {
+        'common_config_version': '2.4.0',
+        'projects': [
+            {'name': 'mHEV', 'start_date': '2025-07-04', 'end_date': '2025-10-17',
+             'freeze_date': '2025-09-05', 'commonconfig': 'false'},
+            {'name': 'pHEV', 'start_date': '2025-05-14', 'end_date': '2025-08-27',
+             'freeze_date': '2025-07-16', 'commonconfig': 'false'},
+        ],
+        'change_requests': [
+            {'title': 'RQ1', 'body': 'DMA load calculation', 'project': 'mHEV',
+             'state': 'open', 'created': '2025-07-09'},
+            {'title': 'RQ2', 'body': 'Feedback signals', 'project': 'pHEV',
+             'state': 'in_progress', 'created': '2025-07-10'},
+            {'title': 'RQ3', 'body': 'Signal rename', 'project': 'mHEV',
+             'state': 'integrated', 'created': '2025-07-11'},
+        ],
+        'divergences': [
+            {'project': 'pHEV', 'reason': 'Signal renamed', 'date': '2025-07-12'},
+        ],
+        'project_filters': ['mHEV', 'pHEV'],
+    }
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Empty working directory; the stores keep their files relative to it"""
+    monkeypatch.chdir(tmp_path)
+    # Validation warnings go through rich, which the tests do not need
+    monkeypatch.setattr(validation, 'VALIDATION_MODE', 'off')
+    return tmp_path
+
+@pytest.fixture
+def config_file(workdir):
+    """config.yaml holding sample_config()"""
+    with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(sample_config(), file, sort_keys=False, allow_unicode=True)
+    return workdir / CONFIG_FILE
+
+@pytest.fixture
+def store(config_file):
+    """ConfigStore over the sample configuration"""
+    return ConfigStore(CONFIG_FILE)
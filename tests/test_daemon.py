@@ -0,0 +1,75 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from ccdb import daemon
+from ccdb.daemon import ConfigDaemon, handle_daemon_request
+
+def test_answers_requests(store):
+    assert handle_daemon_request(store, '{"cmd": "ping"}') == {'ok': True, 'result': 'pong'}
+    response = handle_daemon_request(store, '{"cmd": "list", "state": "open"}')
+    assert [r['title'] for r in response['result']] == ['RQ1']
+
+@pytest.mark.parametrize('line, error', [
+    (b'{"cmd": "nope"}', 'unknown command'),
+    (b'not json', 'Expecting value'),
+    (b'"\xff"', 'utf-8'),
+    (b'{"cmd": "list", "state": "parked"}', "Unknown state 'parked'"),
+    (b'{"cmd": "get", "path": "projects.9"}', 'list index out of range'),
+])
+def test_request_errors(store, line, error):
+    response = handle_daemon_request(store, line)
+    assert response['ok'] is False
+    assert error in response['error']
+
+def test_unexpected_errors_fail_only_the_request(store, monkeypatch, capsys):
+    def unreadable():
+        raise OSError(13, 'Permission denied')
+
+    monkeypatch.setattr(store, 'get', unreadable)
+    response = handle_daemon_request(store, '{"cmd": "get"}')
+    assert response == {'ok': False, 'error': 'PermissionError: [Errno 13] Permission denied'}
+
+    def gone():
+        raise SystemExit(1)
+
+    monkeypatch.setattr(store, 'get', gone)
+    assert handle_daemon_request(store, '{"cmd": "get"}')['error'].startswith('SystemExit')
+    assert 'Traceback' in capsys.readouterr().err
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix sockets")
+def test_slow_reader_does_not_block_other_clients(store, workdir, monkeypatch):
+    monkeypatch.setattr(ConfigDaemon, 'OUTBOX_LIMIT', 4096)
+    path = str(workdir / 'mgr.sock')
+    server = ConfigDaemon(store, path, [store.path])
+    server.listen()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # Pipelines far more answers than the socket buffers hold, without reading them
+    slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    slow.connect(path)
+    slow.sendall(b'{"cmd": "get"}\n' * 2000)
+    assert daemon.call_daemon({'cmd': 'ping'}, path) == 'pong'
+
+    # The slow client still gets every answer once it reads
+    answers = 0
+    with slow.makefile('rb') as stream:
+        while answers < 2000:
+            assert json.loads(stream.readline())['ok']
+            answers += 1
+    slow.close()
+    os.remove(path)
+
+def test_cli_start_leaves_the_servers_unimported():
+    code = "import sys, mgr; print(' '.join(m for m in ('socket', 'selectors', 'subprocess', " \
+           "'http.server', 'ccdb.dashboard_server') if m in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from ccdb import dashboard_server
+from ccdb.dashboard import build_dashboard, build_timeline, dashboard_json, DASHBOARD_FILE
+from ccdb.timeline import TimelineEngine
+
+PROJECTS = [
+    {'name': 'mHEV', 'start_date': '2025-01-06', 'end_date': '2025-06-30', 'freeze_date': '2025-05-05'},
+    {'name': 'pHEV', 'start_date': '2025-03-03', 'end_date': '2025-09-29'},
+]
+
+def test_build_timeline_layout():
+    timeline = build_timeline(PROJECTS)
+    assert timeline['min_date'] == '2025-01-06'
+    assert timeline['max_date'] == '2025-09-29'
+    assert [p['name'] for p in timeline['projects']] == ['mHEV', 'pHEV']
+    assert timeline['projects'][0]['left'] == 0
+    assert timeline['order']['freeze_date'] == [0, 1]
+
+def test_weekly_load_is_built_without_numpy():
+    load = build_timeline(PROJECTS)['load']
+    assert len(load) == 39
+    assert load[0] == {'active': 1, 'frozen': 0}
+    assert load[17] == {'active': 2, 'frozen': 1}
+    assert load[-1] == {'active': 1, 'frozen': 0}
+    np = pytest.importorskip('numpy')
+    expected = TimelineEngine(np, PROJECTS).weekly_load('2025-01-06', 39)
+    assert load == [{'active': w['active'], 'frozen': w['frozen']} for w in expected]
+
+def test_build_timeline_skips_malformed_dates():
+    projects = PROJECTS + [
+        {'name': 'bad-start', 'start_date': '2025-13-01', 'end_date': '2025-06-30'},
+        {'name': 'bad-end', 'start_date': '2025-01-06', 'end_date': 'soon'},
+        {'name': 'no-end', 'start_date': '2025-01-06'},
+        {'name': 'bad-freeze', 'start_date': '2025-02-03', 'end_date': '2025-04-28',
+         'freeze_date': '2025-02-30'},
+    ]
+    timeline = build_timeline(projects)
+    rows = {p['name']: p for p in timeline['projects']}
+    assert set(rows) == {'mHEV', 'pHEV', 'bad-freeze'}
+    assert rows['bad-freeze']['freeze_date'] is None
+    assert rows['bad-freeze']['freeze_left'] is None
+    assert timeline['max_date'] == '2025-09-29'
+
+def test_dashboard_json_with_malformed_project_date():
+    config = {'projects': [{'name': 'X', 'start_date': '2025/01/06', 'end_date': '2025-02-03'}],
+              'change_requests': [{'title': 'RQ1', 'project': 'X', 'state': 'open'}]}
+    assert build_dashboard(config)['timeline']['projects'] == []
+    assert b'"RQ1"' in dashboard_json(config)
+
+def test_journaled_changes_reach_the_dashboard_on_flush(store):
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='integrated')
+    assert store.dashboard_stale
+    store.flush_dashboard()
+    with open(DASHBOARD_FILE, encoding='utf-8') as file:
+        assert json.load(file)['state_counts']['integrated'] == 2
+    assert not store.dashboard_stale
+
+def test_dashboard_watcher_survives_failing_refreshes(monkeypatch, capsys):
+    class Stop(BaseException):
+        pass
+
+    failures = [OSError(13, 'Permission denied'), SystemExit(1), Stop()]
+
+    class Feed:
+        def refresh(self):
+            raise failures.pop(0)
+
+    monkeypatch.setattr(dashboard_server, 'watch_files', lambda paths: None)
+    monkeypatch.setattr(dashboard_server, 'DASHBOARD_POLL_SECONDS', 0)
+    with pytest.raises(Stop):
+        dashboard_server.watch_dashboard(Feed(), ['config.yaml'])
+    assert capsys.readouterr().err.count('Traceback') == 2
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from ccdb.history import HISTORY_RECORD, HistoryAnalytics, REMOVED_CODE, StateHistory
+from ccdb.records import State
+from ccdb.reports import history_rows
+
+def test_record_skips_unknown_states(tmp_path):
+    history = StateHistory(str(tmp_path / 'config.yaml.history'))
+    history.record([(('RQ1', 'mHEV'), 'open'), (('RQ2', 'mHEV'), 'parked'),
+                    (('RQ1', 'mHEV'), State.INTEGRATED)], when=100)
+    np = pytest.importorskip('numpy')
+    ids, states, times = history.columns(np)
+    assert list(states) == [0, 2]
+    assert list(times) == [100, 100]
+    assert history.keys() == [('RQ1', 'mHEV')]
+
+def test_unknown_state_does_not_fail_after_write(store):
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='parked')
+    store.apply('change_request_state', key=['RQ2', 'pHEV'], state='integrated')
+    reread = type(store)(store.path)
+    assert str(reread.index.request(('RQ1', 'mHEV')).state) == 'parked'
+    assert str(reread.index.request(('RQ2', 'pHEV')).state) == 'integrated'
+
+def test_removal_logs_a_tombstone(store):
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='in_progress')
+    store.apply('remove_requests', keys=[['RQ1', 'mHEV'], ['RQ9', 'mHEV']])
+    with open(store.history.path, 'rb') as file:
+        codes = [code for _, code, _ in HISTORY_RECORD.iter_unpack(file.read())]
+    assert codes == [1, REMOVED_CODE]
+    assert [row['state'] for row in history_rows(store.history)] == ['in_progress', 'removed']
+
+def test_removed_requests_leave_the_weekly_counts(tmp_path):
+    np = pytest.importorskip('numpy')
+    history = StateHistory(str(tmp_path / 'config.yaml.history'))
+    start = int(time.time()) - 3 * 7 * 86400
+    history.record([(('RQ1', 'mHEV'), 'in_progress'), (('RQ2', 'mHEV'), 'in_progress')], when=start)
+    history.remove([('RQ1', 'mHEV')], when=start + 7 * 86400)
+    weeks = HistoryAnalytics(np, history).weekly()
+    assert [week['in_progress'] for week in weeks][-1] == 1
+
+def test_cycle_time_starts_at_created_without_earlier_rows(tmp_path):
+    np = pytest.importorskip('numpy')
+    history = StateHistory(str(tmp_path / 'config.yaml.history'))
+    history.record([(('RQ1', 'mHEV'), 'integrated')], when=20 * 86400)
+    requests = [{'title': 'RQ1', 'project': 'mHEV', 'state': 'integrated', 'created': '1970-01-11'}]
+    assert HistoryAnalytics(np, history).cycle_times() == []
+    stats = HistoryAnalytics(np, history, requests).cycle_times()
+    assert [(s['project'], s['completed'], s['mean_days']) for s in stats] == [('mHEV', 1, 10.0)]
@@ -0,0 +1,123 @@
+from datetime import date
+
+import pytest
+
+from ccdb.changes import (
+    CHANGE_OPS, ConfigIndex, ConflictError, op_add_divergence, op_add_project,
+    op_edit_divergence, op_edit_project, op_edit_request, op_remove_divergences,
+    op_remove_projects, op_remove_requests, snapshot_target
+)
+from ccdb.timeline import freeze_conflicts
+from ccdb.validation import ConfigValidator, written_records
+from tests.conftest import sample_config
+
+def duplicate_config():
+    config = sample_config()
+    config['change_requests'].append({'title': 'RQ1', 'body': 'Second copy', 'project': 'mHEV',
+                                      'state': 'open', 'created': '2025-07-12'})
+    return config
+
+def test_duplicate_requests_stay_listed():
+    index = ConfigIndex(duplicate_config())
+    assert index.count() == 4
+    assert index.count('mHEV', 'open') == 2
+    assert [r['body'] for r in index.select('mHEV', 'open')] == ['DMA load calculation', 'Second copy']
+    assert [r['body'] for r in index.search_requests('copy')] == ['Second copy']
+    assert len(index.requests[('RQ1', 'mHEV')]) == 2
+
+def test_validation_reports_the_second_duplicate():
+    config = duplicate_config()
+    config['projects'].append(dict(config['projects'][0]))
+    issues = ConfigValidator(1).validate(ConfigIndex(config))
+    assert [(i['rule'], i['record']) for i in issues] == [('duplicate', 'mHEV'),
+                                                          ('duplicate', 'RQ1 (mHEV)')]
+
+def test_validation_of_dates_in_extra_fields():
+    config = sample_config()
+    config['integration'] = {'targets': [{'name': 'PHEV'}]}
+    targets = {'PHEV': {'status': 'integrated', 'date': date(2025, 3, 1)}}
+    config['change_requests'][0]['integration'] = {'targets': targets}
+    validator = ConfigValidator(1)
+    assert validator.validate(ConfigIndex(config)) == []
+    targets['BEV'] = {'status': 'pending', 'date': date(2025, 3, 2)}
+    issues = validator.validate(ConfigIndex(config))
+    assert [(i['rule'], i['message']) for i in issues] == [('reference', "Unknown integration target 'BEV'")]
+
+def test_written_records_keep_unkeyed_changes_apart():
+    index = ConfigIndex(sample_config())
+    edit = {'key': ['RQ1', 'mHEV'], 'changes': {'body': 'Reworded'}}
+    changes = [('edit_request', edit, 0, snapshot_target(index, 'edit_request', edit)),
+               ('add_project', {'project': {'name': 'xEV'}}, 0, None),
+               ('remove_requests', {'keys': [['RQ1', 'mHEV']]}, 0, None),
+               ('add_project', {'project': {'name': 'yEV'}}, 0, None)]
+    for op, args, _, _ in changes:
+        CHANGE_OPS[op](index, **args)
+    written, _ = written_records(index, changes)
+    assert [record['name'] for _, record, _, _ in written] == ['xEV', 'yEV']
+
+def test_edit_applies_to_first_duplicate():
+    index = ConfigIndex(duplicate_config())
+    op_edit_request(index, ['RQ1', 'mHEV'], {'state': 'integrated'})
+    assert [r['body'] for r in index.select('mHEV', 'open')] == ['Second copy']
+    assert index.request(('RQ1', 'mHEV'))['state'] == 'integrated'
+    # A rename moves the first record and leaves the other under the old key
+    op_edit_request(index, ['RQ1', 'mHEV'], {'title': 'RQ9'})
+    assert index.request(('RQ9', 'mHEV'))['body'] == 'DMA load calculation'
+    assert index.request(('RQ1', 'mHEV'))['body'] == 'Second copy'
+    assert index.count() == 4
+
+def test_remove_drops_every_duplicate():
+    index = ConfigIndex(duplicate_config())
+    op_remove_requests(index, [['RQ1', 'mHEV']])
+    assert index.count() == 2
+    assert ('RQ1', 'mHEV') not in index.requests
+    assert [r['title'] for r in index.config['change_requests']] == ['RQ2', 'RQ3']
+
+def test_duplicate_projects_stay_indexed():
+    config = sample_config()
+    config['projects'].append({'name': 'mHEV', 'start_date': '2025-01-01', 'end_date': '2025-02-01'})
+    index = ConfigIndex(config)
+    assert len(index.projects['mHEV']) == 2
+    op_edit_project(index, 'mHEV', {'name': 'mHEV2'})
+    assert [p['start_date'] for p in index.projects['mHEV']] == ['2025-01-01']
+    assert [p['start_date'] for p in index.projects['mHEV2']] == ['2025-07-04']
+
+def test_freeze_conflicts_list_open_work_past_freeze():
+    index = ConfigIndex(sample_config())
+    assert [r['title'] for r in freeze_conflicts(index, '2025-09-10')] == ['RQ1', 'RQ2']
+    assert [r['title'] for r in freeze_conflicts(index, '2025-08-01')] == ['RQ2']
+
+def picked(picker, query=''):
+    return [picker.records[item_id] for item_id in picker.search(query, 10)]
+
+def test_project_picker_follows_changes():
+    index = ConfigIndex(sample_config())
+    picker = index.record_picker('projects')
+    assert [p['name'] for p in picked(picker)] == ['mHEV', 'pHEV']
+    op_add_project(index, {'name': 'BEV', 'start_date': '2026-01-05', 'end_date': '2026-03-06'})
+    op_edit_project(index, 'mHEV', {'name': 'mHEV2'})
+    assert [p['name'] for p in picked(picker)] == ['mHEV2', 'pHEV', 'BEV']
+    assert picked(picker, 'mhev') == [index.projects['mHEV2'][0]]
+    op_remove_projects(index, ['pHEV'])
+    assert [p['name'] for p in picked(picker)] == ['mHEV2', 'BEV']
+    assert index.record_picker('projects') is picker
+
+def test_divergence_picker_follows_changes():
+    index = ConfigIndex(sample_config())
+    picker = index.record_picker('divergences')
+    op_add_divergence(index, {'project': 'mHEV', 'reason': 'Calibration moved', 'date': '2025-08-01'})
+    op_edit_divergence(index, ['pHEV', 'Signal renamed', '2025-07-12'], {'reason': 'Signal dropped'})
+    assert [d['reason'] for d in picked(picker)] == ['Signal dropped', 'Calibration moved']
+    assert picked(picker, 'renamed') == []
+    op_remove_divergences(index, [['mHEV', 'Calibration moved', '2025-08-01']])
+    assert [d['reason'] for d in picked(picker)] == ['Signal dropped']
+
+def test_rename_onto_taken_key_is_refused(store):
+    with pytest.raises(ConflictError, match="already exists"):
+        store.apply('edit_request', key=['RQ1', 'mHEV'], changes={'title': 'RQ3'})
+    with pytest.raises(ConflictError, match="already exists"):
+        store.apply('edit_project', name='mHEV', changes={'name': 'pHEV'})
+    reread = type(store)(store.path)
+    assert reread.index.request(('RQ1', 'mHEV'))['body'] == 'DMA load calculation'
+    assert reread.index.request(('RQ3', 'mHEV'))['body'] == 'Signal rename'
+    assert set(reread.index.projects) == {'mHEV', 'pHEV'}
@@ -0,0 +1,29 @@
+import sys
+import time
+
+import inquirer
+import readchar
+
+from ccdb import profiling
+
+def slow_user():
+    time.sleep(0.2)
+    return readchar.key.ENTER
+
+def timed_prompt(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILER', profiling.Profiler(time.perf_counter()))
+    monkeypatch.setattr(readchar, 'readkey', slow_user)
+    prompts = profiling.ProfiledPrompts(inquirer)
+    answers = prompts.prompt([inquirer.List('action', message="Pick", choices=['a', 'b'])])
+    assert answers == {'action': 'a'}
+
+    name, _, duration, _, args = profiling.PROFILER.events[-1]
+    assert (name, args) == ('prompt.action', {'choices': 2})
+    return duration
+
+def test_prompt_span_leaves_out_the_answer_time(monkeypatch, capsys):
+    assert timed_prompt(monkeypatch) < 0.2e9
+
+def test_prompt_is_timed_whole_without_the_inquirer_internals(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, 'inquirer.events', None)
+    assert timed_prompt(monkeypatch) >= 0.2e9
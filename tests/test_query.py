@@ -0,0 +1,14 @@
+import argparse
+import json
+from datetime import date
+
+import mgr
+from ccdb.store import CONFIG_FILE, ConfigStore
+
+def test_query_writes_dates_in_extra_fields(store, monkeypatch, capsys):
+    store.apply('edit_request', key=['RQ1', 'mHEV'], changes={'due': date(2025, 1, 1)})
+    # Read back through the journal
+    monkeypatch.setattr(mgr, 'store', ConfigStore(CONFIG_FILE))
+    assert type(mgr.store.get()['change_requests'][0]['due']) is date
+    mgr.run_query(argparse.Namespace(path='change_requests', format='json'))
+    assert json.loads(capsys.readouterr().out)[0]['due'] == '2025-01-01'
@@ -0,0 +1,115 @@
+import os
+from datetime import date
+
+import pytest
+
+import mgr
+from ccdb import store as store_module, validation
+from ccdb.hints import HINTS_FILE
+
+def integration(store):
+    store.apply('set_integration', key=['RQ1', 'mHEV'], target='PHEV', status='integrated')
+
+def test_hints_follow_single_writes(store):
+    integration(store)
+    with open(HINTS_FILE, encoding='utf-8') as file:
+        assert 'RQ1' in file.read()
+
+def test_hints_follow_dates_in_integration_data(store):
+    integration = {'summary': 'Load split', 'targets': {'PHEV': {'status': 'integrated',
+                                                                 'date': date(2025, 3, 1)}}}
+    store.apply('edit_request', key=['RQ1', 'mHEV'], changes={'integration': integration})
+    with open(HINTS_FILE, encoding='utf-8') as file:
+        assert 'Load split' in file.read()
+
+def test_failing_hints_do_not_hide_the_write(store, monkeypatch, capsys):
+    def broken(config):
+        raise TypeError("broken template")
+
+    monkeypatch.setattr(store_module, 'generate_integration_hints', broken)
+    integration(store)
+    assert 'not updated (broken template)' in capsys.readouterr().out
+    assert type(store)(store.path).index.request(('RQ1', 'mHEV'))['integration']
+
+def test_session_hints_wait_for_commit(store):
+    store.begin()
+    integration(store)
+    assert not os.path.exists(HINTS_FILE)
+    assert store.commit() == 1
+    with open(HINTS_FILE, encoding='utf-8') as file:
+        assert 'RQ1' in file.read()
+
+def test_rolled_back_session_leaves_no_hints(store):
+    store.begin()
+    integration(store)
+    assert store.rollback() == 1
+    assert not os.path.exists(HINTS_FILE)
+
+def test_bulk_set_state_goes_through_a_session(store):
+    selectors = [('RQ1', None), ('RQ2', 'pHEV')]
+    with store.transaction():
+        assert mgr.set_requests_state(store, selectors, 'integrated') == 2
+        assert store.pending == 2
+    with store.transaction():
+        assert mgr.set_requests_state(store, selectors, 'integrated') == 0
+    reread = type(store)(store.path)
+    assert reread.index.request(('RQ1', 'mHEV'))['state'] == 'integrated'
+
+def test_saves_hold_the_lock_only_to_replace_the_file(store, monkeypatch):
+    store.get()
+    calls = []
+
+    def watch(module, name):
+        function = getattr(module, name)
+
+        def watched(*args, **kwargs):
+            calls.append((name, store.lock._depth))
+            return function(*args, **kwargs)
+        monkeypatch.setattr(module, name, watched)
+
+    for name in ('write_atomic', 'write_snapshot', 'write_dashboard', 'generate_integration_hints'):
+        watch(store_module, name)
+    watch(store_module.yaml, 'dump')
+    with store.transaction():
+        integration(store)
+    assert calls == [('dump', 0), ('write_atomic', 1), ('write_snapshot', 0),
+                     ('write_dashboard', 0), ('generate_integration_hints', 0)]
+
+    calls.clear()
+    monkeypatch.setattr(store_module, 'JOURNAL_MAX_ENTRIES', 1)
+    store.apply('change_request_state', key=['RQ2', 'pHEV'], state='integrated')
+    assert calls == [('dump', 0), ('write_atomic', 1), ('write_snapshot', 0),
+                     ('write_dashboard', 0), ('generate_integration_hints', 0)]
+
+def test_refused_commit_keeps_the_session(store, monkeypatch):
+    monkeypatch.setattr(validation, 'VALIDATION_MODE', 'strict')
+    store.begin()
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='parked')
+    with pytest.raises(validation.ValidationError):
+        store.commit()
+    assert store.pending == 1
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='integrated')
+    assert store.commit() == 2
+    assert str(type(store)(store.path).index.request(('RQ1', 'mHEV')).state) == 'integrated'
+
+def test_strict_mode_blocks_only_new_errors(store, monkeypatch):
+    config = store.get()
+    config['change_requests'][0]['created'] = '2025-13-01'
+    store.save(config)
+    monkeypatch.setattr(validation, 'VALIDATION_MODE', 'strict')
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='integrated')
+    with pytest.raises(validation.ValidationError, match="Invalid created"):
+        store.apply('edit_request', key=['RQ2', 'pHEV'], changes={'created': '2025-13-01'})
+
+def test_writes_are_validated_outside_the_lock(store, monkeypatch):
+    checked = []
+
+    def check(index, changes=None):
+        checked.append(store.lock._depth)
+
+    monkeypatch.setattr(store_module, 'check_before_write', check)
+    store.apply('change_request_state', key=['RQ1', 'mHEV'], state='integrated')
+    with store.transaction():
+        store.apply('change_request_state', key=['RQ2', 'pHEV'], state='integrated')
+    store.save(store.get())
+    assert checked == [0, 0, 0]
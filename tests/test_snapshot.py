@@ -0,0 +1,60 @@
+import marshal
+import pickle
+from datetime import date, datetime
+
+import yaml
+
+from ccdb.records import ChangeRequest
+from ccdb.sqlite_store import SqliteStore
+from ccdb.store import (
+    load_snapshot, RecordDumper, SNAPSHOT_STATS, SNAPSHOT_VERSION, write_snapshot, YAML_DUMPER
+)
+
+def test_marshal_round_trip(tmp_path):
+    path = str(tmp_path / 'config.yaml.cache')
+    config = {'common_config_version': '2.4.0', 'projects': [{'name': 'mHEV'}]}
+    write_snapshot(path, 'digest', 10, config)
+    assert load_snapshot(path, 'digest', 10) == config
+
+def test_dates_are_tagged_and_restored(tmp_path):
+    path = str(tmp_path / 'config.yaml.cache')
+    config = {'projects': [{'name': 'mHEV', 'start_date': date(2025, 7, 4)}],
+              'stamp': datetime(2025, 7, 4, 12, 30)}
+    write_snapshot(path, 'digest', 10, config)
+    loaded = load_snapshot(path, 'digest', 10)
+    assert loaded == config
+    assert type(loaded['projects'][0]['start_date']) is date
+
+def test_unencodable_config_writes_no_snapshot(tmp_path):
+    path = tmp_path / 'config.yaml.cache'
+    write_snapshot(str(path), 'digest', 10, {'odd': {date(2025, 7, 4): 'date as a key'}})
+    assert not path.exists()
+
+def test_pickled_snapshot_is_not_loaded(tmp_path):
+    path = tmp_path / 'config.yaml.cache'
+
+    class Boom:
+        def __reduce__(self):
+            return (exec, ("raise SystemExit('unpickled')",))
+
+    path.write_bytes(marshal.dumps((SNAPSHOT_VERSION, 'digest', 10)) + marshal.dumps('pickle')
+                     + pickle.dumps(Boom()))
+    errors = SNAPSHOT_STATS['errors']
+    assert load_snapshot(str(path), 'digest', 10) is None
+    assert SNAPSHOT_STATS['errors'] == errors + 1
+
+def test_records_dump_only_through_the_record_dumper():
+    req = ChangeRequest({'title': 'RQ1', 'project': 'mHEV', 'state': 'open'})
+    assert yaml.dump([req], Dumper=RecordDumper, sort_keys=False) == "- title: RQ1\n  project: mHEV\n  state: open\n"
+    assert ChangeRequest not in YAML_DUMPER.yaml_representers
+    assert ChangeRequest not in yaml.Dumper.yaml_representers
+
+def test_sqlite_rows_keep_dates_in_extra_fields(store, workdir):
+    config = store.get()
+    config['change_requests'][0]['due'] = date(2025, 1, 1)
+    config['stamp'] = datetime(2025, 7, 4, 12, 30)
+    db = SqliteStore(str(workdir / 'config.db'), store.path)
+    db.import_config(config)
+    exported = db.export_config()
+    assert exported['change_requests'][0]['due'] == date(2025, 1, 1)
+    assert exported['stamp'] == datetime(2025, 7, 4, 12, 30)